@@ -0,0 +1,102 @@
+"""
+Persistent CV Analysis Cache
+
+``CVAnalyzer.analyze_cv`` makes one LLM call per CV. Re-running the analyzer
+over a folder would repeat those calls for every CV, even ones analyzed
+before with the same prompt and model. This module stores the structured
+analysis results in SQLite, keyed by a hash of the CV text, the candidate
+name, the analysis prompt (template and version) and the model name, so a
+result is only reused when every input to the LLM call is unchanged.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANALYSIS_CACHE_PATH = ".cv_cache/analysis.sqlite"
+
+
+class AnalysisCache:
+    """
+    SQLite-backed store of CV analysis results.
+    """
+
+    def __init__(self, path: str = DEFAULT_ANALYSIS_CACHE_PATH):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = Path(path)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            " key TEXT PRIMARY KEY,"
+            " result TEXT NOT NULL,"
+            " created REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(cv_text: str, candidate_name: str, prompt: str, prompt_version: str, model: str) -> str:
+        """
+        Build the cache key of an analysis.
+
+        Args:
+            cv_text: Extracted CV text
+            candidate_name: Candidate name passed to the prompt
+            prompt: Analysis prompt template
+            prompt_version: Version of the analysis prompt
+            model: LLM model name
+        """
+        digest = hashlib.sha256()
+        for part in (cv_text, candidate_name, prompt, prompt_version, model):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached analysis for a key, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM analyses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, result: dict):
+        """Store an analysis result."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses (key, result, created) VALUES (?, ?, ?)",
+                (key, json.dumps(result), time.time())
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size."""
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,157 @@
+"""
+Semantic Answer Cache
+
+Recruiters ask the same questions over and over with small variations in
+wording. This cache sits in front of the RAG query path and returns a
+previous answer when a question is either identical after normalization
+(exact-match fast path, no embedding needed) or its embedding is within a
+cosine-similarity threshold of a cached question.
+
+Entries expire after a TTL and the least recently used entry is evicted when
+the cache is full. The owner must call ``invalidate()`` whenever the index
+contents change, because cached answers are only valid for the documents they
+were generated from.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+import numpy as np
+
+
+def normalize_question(question: str) -> str:
+    """Normalize a question for exact matching (case, whitespace, trailing punctuation)."""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip("?!. ")
+
+
+class SemanticAnswerCache:
+    """
+    LRU + TTL cache of answers keyed by question text and question embedding.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: Optional[float] = 3600,
+        similarity_threshold: float = 0.95,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of cached answers
+            ttl_seconds: Seconds an answer stays valid. None disables expiry.
+            similarity_threshold: Minimum cosine similarity for a semantic hit
+            clock: Time source (injectable for tests)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.clock = clock
+        self._entries = OrderedDict()  # normalized question -> (unit vector, answer, created)
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl_seconds is not None and self.clock() - created > self.ttl_seconds
+
+    def _purge_expired(self):
+        for key in [key for key, (_, _, created) in self._entries.items() if self._expired(created)]:
+            del self._entries[key]
+
+    def get_exact(self, question: str) -> Optional[str]:
+        """
+        Return the cached answer for an identical (normalized) question.
+
+        Does not count a miss, since the semantic lookup usually follows.
+        """
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[2]):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry[1]
+
+    def get_similar(self, embedding: List[float]) -> Optional[str]:
+        """
+        Return the answer of the most similar cached question above the threshold.
+
+        Args:
+            embedding: Query embedding of the new question
+        """
+        with self._lock:
+            self._purge_expired()
+            # Entries cached without an embedding only serve exact matches
+            keys = [key for key, entry in self._entries.items() if entry[0] is not None]
+            if not keys:
+                self.misses += 1
+                return None
+
+            query = self._unit(embedding)
+            matrix = np.stack([self._entries[key][0] for key in keys])
+            similarities = matrix @ query
+            best = int(np.argmax(similarities))
+
+            if similarities[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(keys[best])
+            self.semantic_hits += 1
+            return self._entries[keys[best]][1]
+
+    def put(self, question: str, embedding: Optional[List[float]], answer: str):
+        """
+        Cache an answer.
+
+        Args:
+            question: The question as asked
+            embedding: Query embedding of the question. None caches the answer
+                for exact matches only.
+            answer: The generated answer
+        """
+        if self.max_entries <= 0:
+            return
+        key = normalize_question(question)
+        vector = self._unit(embedding) if embedding is not None else None
+        with self._lock:
+            self._entries[key] = (vector, answer, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Drop all cached answers (call whenever the index changes)."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size."""
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+        }
+
+    @staticmethod
+    def _unit(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
@@ -0,0 +1,386 @@
+"""
+Offline Benchmark Suite
+
+Measures the ingestion and query hot paths of CVRAGAgent on a synthetic CV
+corpus, without network access or API keys:
+
+- CVs are generated as ``.docx`` files (written directly, no extra
+  dependency) with deterministic content for a given seed.
+- Embeddings come from the local ``hashing`` backend.
+- Answers come from LangChain's ``FakeListChatModel``, so ``query_simple``
+  timings show retrieval and prompt assembly, not LLM latency.
+
+For every corpus scale the suite times ``load_documents`` (cold, then served
+from the conversion cache), ``chunk_documents``, ``create_vector_store``,
+``save_vector_store``, the streaming build, ``load_vector_store`` (memory and
+mmap) and ``query_simple``/retrieval latency percentiles over a question
+set. Results are written as JSON; passing an earlier result file as
+``--baseline`` reports stages that got slower and exits with status 1::
+
+    python benchmark.py --scales 10 100 1000 --output bench.json
+    python benchmark.py --scales 10 100 --baseline bench.json --tolerance 0.25
+"""
+
+import argparse
+import json
+import logging
+import platform
+import random
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+FIRST_NAMES = ["Alex", "Maria", "Chen", "Fatima", "John", "Priya", "Lucas", "Aisha", "Kenji", "Sofia",
+               "Omar", "Elena", "David", "Mei", "Carlos", "Nina"]
+LAST_NAMES = ["Smith", "Garcia", "Wang", "Khan", "Muller", "Patel", "Silva", "Okafor", "Tanaka", "Rossi",
+              "Haddad", "Novak", "Cohen", "Lin", "Lopez", "Berg"]
+ROLES = {
+    "Software Engineer": ["Python", "Django", "PostgreSQL", "Docker", "Kubernetes", "AWS", "React", "TypeScript"],
+    "Data Scientist": ["Python", "pandas", "scikit-learn", "PyTorch", "SQL", "Spark", "statistics", "Tableau"],
+    "DevOps Engineer": ["Kubernetes", "Terraform", "AWS", "Azure", "CI/CD", "Linux", "Prometheus", "Ansible"],
+    "Accountant": ["IFRS", "SAP", "Excel", "auditing", "tax reporting", "budgeting", "QuickBooks", "payroll"],
+    "Registered Nurse": ["patient care", "ICU", "triage", "EHR", "medication administration", "BLS", "ACLS",
+                         "wound care"],
+    "Project Manager": ["PMP", "Agile", "Scrum", "Jira", "stakeholder management", "risk management",
+                        "budgeting", "MS Project"],
+}
+COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella Health", "Stark Industries", "Wayne Enterprises",
+             "Hooli", "Vandelay Industries", "Cyberdyne", "Soylent Foods"]
+UNIVERSITIES = ["MIT", "ETH Zurich", "University of Toronto", "National University of Singapore",
+                "University of Cape Town", "Sorbonne University", "University of Melbourne"]
+CERTIFICATIONS = ["AWS Solutions Architect", "PMP", "CPA", "CKA", "Google Data Analytics", "ACLS", "Scrum Master"]
+
+QUESTIONS = [
+    "Which candidates have experience with Kubernetes?",
+    "Who has the most years of experience?",
+    "Summarize the educational background of the candidates",
+    "Which candidates know Python and SQL?",
+    "Who holds a PMP certification?",
+    "List candidates with ICU or patient care experience",
+    "Which candidates worked at Acme Corp?",
+    "Who has experience with SAP and IFRS?",
+    "What cloud platforms are mentioned?",
+    "Which candidates led teams or managed projects?",
+]
+
+_DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+_DOCX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+
+
+def write_docx(path: Path, paragraphs: List[str]):
+    """Write a minimal ``.docx`` file with one paragraph per string."""
+    body = "".join(
+        f'<w:p><w:r><w:t xml:space="preserve">{escape(paragraph)}</w:t></w:r></w:p>'
+        for paragraph in paragraphs
+    )
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f'<w:body>{body}</w:body></w:document>'
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr("[Content_Types].xml", _DOCX_CONTENT_TYPES)
+        docx.writestr("_rels/.rels", _DOCX_RELS)
+        docx.writestr("word/document.xml", document)
+
+
+def synthetic_cv(rng: random.Random) -> List[str]:
+    """Return the paragraphs of one synthetic CV."""
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    role, skills = rng.choice(list(ROLES.items()))
+    years = rng.randint(1, 25)
+    paragraphs = [
+        name,
+        f"{role} | {name.split()[0].lower()}@example.com | +1 555 {rng.randint(1000000, 9999999)}",
+        "PROFESSIONAL SUMMARY",
+        f"{role} with {years} years of experience delivering results in fast-paced teams. "
+        f"Specialized in {', '.join(rng.sample(skills, 3))}.",
+        "SKILLS",
+        ", ".join(rng.sample(skills, rng.randint(4, len(skills)))),
+        "PROFESSIONAL EXPERIENCE",
+    ]
+    for position in range(rng.randint(2, 5)):
+        company = rng.choice(COMPANIES)
+        start = 2024 - years + position * max(1, years // 5)
+        paragraphs.append(f"{role} at {company} ({start} - {start + rng.randint(1, 4)})")
+        for _ in range(rng.randint(2, 4)):
+            paragraphs.append(
+                f"- {rng.choice(['Led', 'Built', 'Improved', 'Managed', 'Designed', 'Automated'])} "
+                f"{rng.choice(['a team of', 'the migration of', 'reporting for', 'operations for'])} "
+                f"{rng.choice(skills)} projects, improving {rng.choice(['throughput', 'quality', 'costs', 'uptime'])} "
+                f"by {rng.randint(5, 60)}% across {rng.randint(2, 12)} departments."
+            )
+    paragraphs += [
+        "EDUCATION",
+        f"{rng.choice(['BSc', 'MSc', 'BA', 'PhD'])} from {rng.choice(UNIVERSITIES)} ({2024 - years - rng.randint(0, 4)})",
+        "CERTIFICATIONS",
+        ", ".join(rng.sample(CERTIFICATIONS, rng.randint(0, 3))) or "None",
+    ]
+    return paragraphs
+
+
+def generate_corpus(folder: Path, n_cvs: int, seed: int = 0) -> List[Path]:
+    """
+    Write a deterministic synthetic CV corpus.
+
+    Args:
+        folder: Output folder (created if needed)
+        n_cvs: Number of CVs
+        seed: Random seed; the same seed always yields the same corpus
+
+    Returns:
+        Paths of the written ``.docx`` files
+    """
+    folder.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(n_cvs):
+        path = folder / f"cv_{i:06d}.docx"
+        write_docx(path, synthetic_cv(random.Random(seed * 1_000_003 + i)))
+        paths.append(path)
+    return paths
+
+
+def summarize(samples_ms: List[float]) -> dict:
+    """Latency statistics of a list of samples in milliseconds."""
+    samples = np.array(samples_ms, dtype=np.float64)
+    return {
+        "runs": len(samples),
+        "mean_ms": round(float(samples.mean()), 3),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p90_ms": round(float(np.percentile(samples, 90)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+        "min_ms": round(float(samples.min()), 3),
+        "max_ms": round(float(samples.max()), 3),
+    }
+
+
+def _timed(fn: Callable, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def _fake_llm():
+    from langchain_core.language_models import FakeListChatModel
+    return FakeListChatModel(responses=["Based on the retrieved CVs, the matching candidates are listed above."])
+
+
+def benchmark_scale(
+    workdir: Path,
+    n_cvs: int,
+    n_queries: int = 50,
+    seed: int = 0,
+    dimension: int = 768,
+    conversion_workers: int = 1
+) -> List[dict]:
+    """
+    Run every measurement for one corpus size.
+
+    Args:
+        workdir: Empty folder for the corpus, caches and vector stores
+        n_cvs: Number of synthetic CVs
+        n_queries: Number of timed questions (cycled from QUESTIONS)
+        seed: Corpus seed
+        dimension: Hashing embedding dimension
+        conversion_workers: Processes used to convert documents
+
+    Returns:
+        One result row per stage
+    """
+    from rag_agent import CVRAGAgent
+
+    cv_folder = workdir / "cv"
+    generate_corpus(cv_folder, n_cvs, seed)
+
+    def make_agent(store: str, **kwargs) -> CVRAGAgent:
+        return CVRAGAgent(
+            cv_folder=str(cv_folder),
+            vector_store_path=str(workdir / store),
+            conversion_cache_dir=str(workdir / "markdown"),
+            conversion_workers=conversion_workers,
+            embedding_cache_path=None,
+            embedding_backend="hashing",
+            embedding_dimension=dimension,
+            answer_cache_size=0,
+            **kwargs
+        )
+
+    timings: Dict[str, List[float]] = {}
+    agent = make_agent("store")
+    # Trigger lazy imports so they are not charged to the first timed stage
+    agent.md_converter, agent.text_splitter
+    from langchain_community.vectorstores import FAISS  # noqa: F401
+
+    documents, timings["load_documents_cold"] = _timed(agent.load_documents)
+    documents, timings["load_documents_cached"] = _timed(agent.load_documents)
+    chunks, timings["chunk_documents"] = _timed(agent.chunk_documents, documents)
+    _, timings["create_vector_store"] = _timed(agent.create_vector_store, chunks)
+    _, timings["save_vector_store"] = _timed(agent.save_vector_store)
+    _, timings["build_vector_store_streaming"] = _timed(make_agent("streamed").build_vector_store_streaming)
+
+    for load_mode in ("memory", "mmap"):
+        loaded = make_agent("store", load_mode=load_mode)
+        ok, timings[f"load_vector_store_{load_mode}"] = _timed(loaded.load_vector_store)
+        if not ok:
+            raise RuntimeError(f"Could not load the benchmark store in {load_mode} mode")
+
+    loaded.llm = _fake_llm()
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(n_queries)]
+    loaded.query_simple(questions[0])  # warm-up: metadata index, lazy imports
+    timings["retrieve"] = [_timed(loaded._retrieve, question)[1] for question in questions]
+    timings["query_simple"] = [_timed(loaded.query_simple, question)[1] for question in questions]
+
+    rows = []
+    for stage, samples in timings.items():
+        samples = samples if isinstance(samples, list) else [samples]
+        rows.append({"scale": n_cvs, "stage": stage, **summarize(samples)})
+    rows.append({"scale": n_cvs, "stage": "corpus", "documents": len(documents), "chunks": len(chunks)})
+    return rows
+
+
+def run_benchmark(
+    scales: List[int],
+    n_queries: int = 50,
+    seed: int = 0,
+    dimension: int = 768,
+    conversion_workers: int = 1
+) -> dict:
+    """
+    Run the suite at every scale.
+
+    Args:
+        scales: Corpus sizes (number of CVs)
+        n_queries: Timed questions per scale
+        seed: Corpus seed
+        dimension: Hashing embedding dimension
+        conversion_workers: Processes used to convert documents
+
+    Returns:
+        JSON-serializable report with run metadata and result rows
+    """
+    results = []
+    for n_cvs in scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            results += benchmark_scale(Path(tmp), n_cvs, n_queries, seed, dimension, conversion_workers)
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scales": scales,
+            "queries": n_queries,
+            "seed": seed,
+            "dimension": dimension,
+            "conversion_workers": conversion_workers,
+        },
+        "results": results,
+    }
+
+
+def compare(
+    baseline: dict,
+    current: dict,
+    tolerance: float = 0.25,
+    metric: str = "p50_ms",
+    min_delta_ms: float = 1.0
+) -> List[dict]:
+    """
+    Find stages that got slower than in a baseline report.
+
+    Args:
+        baseline: Earlier report from run_benchmark
+        current: New report
+        tolerance: Allowed relative slowdown (0.25 = 25%)
+        metric: Statistic compared
+        min_delta_ms: Slowdowns smaller than this are ignored as noise
+
+    Returns:
+        One row per regressed (scale, stage)
+    """
+    before = {(row["scale"], row["stage"]): row for row in baseline["results"] if metric in row}
+    regressions = []
+    for row in current["results"]:
+        old = before.get((row["scale"], row["stage"]))
+        if old is None or metric not in row:
+            continue
+        delta = row[metric] - old[metric]
+        if delta > min_delta_ms and row[metric] > old[metric] * (1 + tolerance):
+            regressions.append({
+                "scale": row["scale"],
+                "stage": row["stage"],
+                "baseline": old[metric],
+                "current": row[metric],
+                "ratio": round(row[metric] / old[metric], 2) if old[metric] else None,
+            })
+    return regressions
+
+
+def print_report(report: dict):
+    """Print the result rows as a table."""
+    print(f"{'scale':>7} {'stage':<30} {'runs':>5} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10}")
+    for row in report["results"]:
+        if "p50_ms" not in row:
+            print(f"{row['scale']:>7} {row['stage']:<30} {row['documents']} documents, {row['chunks']} chunks")
+            continue
+        print(
+            f"{row['scale']:>7} {row['stage']:<30} {row['runs']:>5} "
+            f"{row['p50_ms']:>10.2f} {row['p90_ms']:>10.2f} {row['p99_ms']:>10.2f}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline ingestion and query benchmark")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100], help="Corpus sizes (CVs)")
+    parser.add_argument("--queries", type=int, default=50, help="Timed questions per scale")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus seed")
+    parser.add_argument("--dimension", type=int, default=768, help="Hashing embedding dimension")
+    parser.add_argument("--workers", type=int, default=1, help="Document conversion processes")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Earlier JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    report = run_benchmark(args.scales, args.queries, args.seed, args.dimension, args.workers)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressions (p50 more than {args.tolerance:.0%} slower):")
+            for row in regressions:
+                print(f"  {row['scale']:>7} {row['stage']:<30} {row['baseline']:.2f} -> {row['current']:.2f} ms")
+            return 1
+        print("\nNo regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+"""
+Two-Stage Candidate Ranking
+
+Sending every candidate analysis (including the full CV text) to the LLM in
+one prompt stops working beyond a few dozen CVs: it exceeds the context
+window and costs tokens proportional to the whole pool. Ranking is therefore
+done in two stages:
+
+1. Every candidate is scored locally against the job requirements, with no
+   API call: embedding similarity between the requirements and the
+   candidate's profile, plus structured fields (skill overlap, years of
+   experience against the years asked for, and the analysis strength score).
+2. Only the top-K candidates are sent to the LLM, as compact summaries, for
+   the final ordering. When K is larger than one prompt should hold, groups
+   are ranked separately and their winners merged in a final round
+   (tournament).
+"""
+
+import json
+import logging
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from embedding_backends import HashingEmbeddings
+
+logger = logging.getLogger(__name__)
+
+RANKING_PROMPT = """You are an expert HR recruiter. Rank the following shortlisted candidates based on their qualifications.
+
+Job Requirements:
+{job_requirements}
+
+Candidates (one JSON object per line):
+{candidates_data}
+
+Provide a ranking in JSON format with:
+1. rank (1, 2, 3, etc.)
+2. candidate_name (exactly as given)
+3. match_score (0-100)
+4. key_strengths (list of 3-4 points)
+5. recommendation (hire/maybe/not_recommended)
+6. reasoning (1-2 sentences)
+
+Return ONLY valid JSON array format, sorted by rank."""
+
+# Relative weight of each local signal in the stage-one score
+LOCAL_SCORE_WEIGHTS = {
+    "similarity": 0.5,
+    "skills": 0.25,
+    "experience": 0.15,
+    "strength": 0.1,
+}
+
+SUMMARY_TEXT_LIMIT = 300
+
+# Words of a job requirements text that do not name a skill
+REQUIREMENT_STOPWORDS = frozenset("""
+a about an and any are as at be by for from has have in including is it of on or our plus
+the to we with within you your
+ability able candidate developer engineer excellent experience experienced good knowledge
+looking must nice preferred proficiency proficient required requirements role senior skills
+strong understanding work working year years yrs
+""".split())
+
+
+def _normalize_key(key: str) -> str:
+    return re.sub(r"[^a-z]+", " ", key.lower()).strip()
+
+
+def get_field(analysis: Dict[str, Any], *keywords: str) -> Any:
+    """
+    Return the first field whose name contains all keywords.
+
+    LLM-generated analyses name fields inconsistently ("Top 5 Key Skills",
+    "key_skills", "Skills"), so fields are matched by keywords.
+    """
+    for key, value in analysis.items():
+        normalized = _normalize_key(key)
+        if all(keyword in normalized for keyword in keywords):
+            return value
+    return None
+
+
+def _as_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return "; ".join(f"{key}: {_as_text(item)}" for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return "; ".join(_as_text(item) for item in value)
+    return str(value)
+
+
+def _first_number(value: Any) -> Optional[float]:
+    match = re.search(r"\d+(?:\.\d+)?", _as_text(value))
+    return float(match.group()) if match else None
+
+
+def _terms(text: str) -> set:
+    return set(re.findall(r"\w[\w+#]*", text.lower()))
+
+
+def _required_skill_terms(job_requirements: str) -> set:
+    """Return the terms of the requirements that can name a skill."""
+    return {
+        term for term in _terms(job_requirements)
+        if term not in REQUIREMENT_STOPWORDS and not term.isdigit()
+    }
+
+
+def candidate_name(analysis: Dict[str, Any]) -> str:
+    """Return the candidate's name from an analysis."""
+    return _as_text(
+        analysis.get("candidate_name") or get_field(analysis, "full", "name") or get_field(analysis, "name")
+    ) or "Unknown"
+
+
+def candidate_summary(analysis: Dict[str, Any], local_score: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Build the compact summary of a candidate sent to the LLM.
+
+    The CV text and long free-text fields are left out or truncated.
+    """
+    summary = {
+        "candidate_name": candidate_name(analysis),
+        "years_experience": _first_number(get_field(analysis, "years")),
+        "skills": _as_text(get_field(analysis, "skill"))[:SUMMARY_TEXT_LIMIT],
+        "education": _as_text(get_field(analysis, "education"))[:SUMMARY_TEXT_LIMIT],
+        "experience": _as_text(get_field(analysis, "professional", "experience"))[:SUMMARY_TEXT_LIMIT],
+        "certifications": _as_text(get_field(analysis, "certification"))[:SUMMARY_TEXT_LIMIT],
+        "strengths": _as_text(get_field(analysis, "strengths"))[:SUMMARY_TEXT_LIMIT],
+    }
+    if local_score is not None:
+        summary["local_score"] = round(local_score, 3)
+    return summary
+
+
+def parse_json(text: str) -> Any:
+    """Parse JSON from an LLM reply, tolerating Markdown code fences."""
+    text = text.strip()
+    fenced = re.match(r"^```(?:json)?\s*(.*?)\s*```$", text, re.DOTALL)
+    return json.loads(fenced.group(1) if fenced else text)
+
+
+class CandidateRanker:
+    """
+    Ranks candidate analyses against job requirements in two stages.
+    """
+
+    def __init__(
+        self,
+        rank_with_llm: Optional[Callable[[str, str], str]] = None,
+        embeddings: Optional[Embeddings] = None,
+        top_k: int = 10,
+        group_size: int = 10
+    ):
+        """
+        Initialize the ranker.
+
+        Args:
+            rank_with_llm: Function (job_requirements, candidates_data) -> LLM
+                reply text. None ranks by local score only.
+            embeddings: Embeddings used for similarity (local hashing
+                embeddings by default, so stage one needs no API call)
+            top_k: Number of candidates shortlisted for the LLM
+            group_size: Maximum candidates per LLM prompt; larger shortlists
+                are ranked as a tournament
+        """
+        self.rank_with_llm = rank_with_llm
+        self.embeddings = embeddings or HashingEmbeddings()
+        self.top_k = top_k
+        self.group_size = max(2, group_size)
+
+    def local_scores(self, candidates: List[Dict[str, Any]], job_requirements: str) -> List[float]:
+        """
+        Score every candidate against the requirements without calling the LLM.
+
+        Args:
+            candidates: Candidate analyses
+            job_requirements: Job requirements text
+
+        Returns:
+            One score in [0, 1] per candidate
+        """
+        profiles = [
+            " ".join(_as_text(value) for key, value in analysis.items() if key != "cv_text")
+            for analysis in candidates
+        ]
+        vectors = np.array(self.embeddings.embed_documents(profiles), dtype=np.float32)
+        query = np.array(self.embeddings.embed_query(job_requirements), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query) or 1.0)
+        similarities = np.clip(vectors @ query / np.where(norms == 0, 1.0, norms), 0.0, 1.0)
+
+        required_terms = _required_skill_terms(job_requirements)
+        years_match = re.search(r"(\d+)\+?\s*(?:years|yrs)", job_requirements.lower())
+        required_years = float(years_match.group(1)) if years_match else None
+
+        scores = []
+        for analysis, similarity in zip(candidates, similarities):
+            skills = _terms(_as_text(get_field(analysis, "skill")))
+            # Share of the required skills the candidate has, so listing few
+            # skills is not rewarded over covering the requirements
+            skill_overlap = len(skills & required_terms) / len(required_terms) if required_terms else 0.0
+
+            years = _first_number(get_field(analysis, "years"))
+            if required_years:
+                experience = min(1.0, (years or 0.0) / required_years)
+            else:
+                experience = min(1.0, (years or 0.0) / 10)
+
+            strength = min(1.0, (_first_number(get_field(analysis, "strength", "score")) or 0.0) / 10)
+
+            scores.append(
+                LOCAL_SCORE_WEIGHTS["similarity"] * float(similarity)
+                + LOCAL_SCORE_WEIGHTS["skills"] * skill_overlap
+                + LOCAL_SCORE_WEIGHTS["experience"] * experience
+                + LOCAL_SCORE_WEIGHTS["strength"] * strength
+            )
+        return scores
+
+    def rank(self, candidates: List[Dict[str, Any]], job_requirements: str) -> List[Dict[str, Any]]:
+        """
+        Rank candidates: local scoring of all, then LLM ordering of the top-K.
+
+        Args:
+            candidates: Candidate analyses
+            job_requirements: Job requirements text
+
+        Returns:
+            Rankings of the shortlisted candidates (rank, candidate_name,
+            match_score, key_strengths, recommendation, reasoning,
+            local_score), best first
+        """
+        if not candidates:
+            return []
+
+        scores = self.local_scores(candidates, job_requirements)
+        order = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)
+        shortlist = [candidate_summary(candidates[i], scores[i]) for i in order[:self.top_k]]
+        # Names identify candidates in LLM replies, so they must be unique
+        seen = {}
+        for summary in shortlist:
+            name = summary["candidate_name"]
+            seen[name] = seen.get(name, 0) + 1
+            if seen[name] > 1:
+                summary["candidate_name"] = f"{name} ({seen[name]})"
+        logger.info(f"Shortlisted {len(shortlist)} of {len(candidates)} candidates by local score")
+
+        rankings = self._tournament(shortlist, job_requirements) if self.rank_with_llm else []
+        return self._finalize(rankings, shortlist)
+
+    def _tournament(self, summaries: List[Dict[str, Any]], job_requirements: str) -> List[Dict[str, Any]]:
+        """Rank summaries with the LLM, in groups when they do not fit one prompt."""
+        if len(summaries) <= self.group_size:
+            return self._rank_group(summaries, job_requirements)
+
+        groups = [summaries[i:i + self.group_size] for i in range(0, len(summaries), self.group_size)]
+        advance = max(1, self.group_size // len(groups))
+        logger.info(f"Ranking {len(summaries)} candidates in {len(groups)} groups, {advance} advance per group")
+
+        by_name = {summary["candidate_name"]: summary for summary in summaries}
+        finalists, eliminated = [], []
+        for group in groups:
+            ranked = self._rank_group(group, job_requirements)
+            finalists += [by_name[row["candidate_name"]] for row in ranked[:advance]]
+            eliminated += [(place, row) for place, row in enumerate(ranked[advance:])]
+
+        # Eliminated candidates follow the finalists, ordered by their place in their group
+        eliminated.sort(key=lambda item: item[0])
+        return self._tournament(finalists, job_requirements) + [row for _, row in eliminated]
+
+    def _rank_group(self, summaries: List[Dict[str, Any]], job_requirements: str) -> List[Dict[str, Any]]:
+        """Let the LLM order one group; fall back to the local order on a bad reply."""
+        candidates_data = "\n".join(json.dumps(summary, ensure_ascii=False) for summary in summaries)
+        by_name = {summary["candidate_name"]: summary for summary in summaries}
+        try:
+            reply = parse_json(self.rank_with_llm(job_requirements, candidates_data))
+            rows = reply if isinstance(reply, list) else [reply]
+        except Exception as e:
+            logger.warning(f"LLM ranking failed, keeping local order: {str(e)}")
+            rows = []
+
+        ranked, seen = [], set()
+        for row in rows:
+            name = row.get("candidate_name") if isinstance(row, dict) else None
+            if name in by_name and name not in seen:
+                seen.add(name)
+                ranked.append(row)
+        # Candidates the LLM dropped keep their local order
+        ranked += [{"candidate_name": name} for name in by_name if name not in seen]
+        return ranked
+
+    def _finalize(self, rankings: List[Dict[str, Any]], shortlist: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        by_name = {summary["candidate_name"]: summary for summary in shortlist}
+        if not rankings:
+            rankings = [{"candidate_name": summary["candidate_name"]} for summary in shortlist]
+
+        results = []
+        for rank, row in enumerate(rankings, 1):
+            local_score = by_name[row["candidate_name"]]["local_score"]
+            results.append({
+                "rank": rank,
+                "candidate_name": row["candidate_name"],
+                "match_score": row.get("match_score", round(local_score * 100)),
+                "key_strengths": row.get("key_strengths", []),
+                "recommendation": row.get("recommendation"),
+                "reasoning": row.get("reasoning", "Ranked by local score"),
+                "local_score": local_score,
+            })
+        return results
@@ -0,0 +1,141 @@
+"""
+Overlap-Aware Context Packing
+
+Chunks are split with an overlap (200 characters by default), so two
+retrieved chunks of the same CV that are next to each other repeat that
+overlap, and it was sent to the LLM twice. This module assembles the prompt
+context from the retrieved chunks:
+
+- Chunks of the same source whose ``start_index`` ranges touch or overlap are
+  merged into one passage, keeping the overlapping text once.
+- Chunks with identical text are kept once.
+- Passages are added best first (by the rank of their best chunk) until a
+  token budget is reached; the passage that crosses the budget is cut.
+
+Token counts are estimated from the character count, which is close enough
+for budgeting and needs no tokenizer.
+"""
+
+import logging
+import math
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# Average characters per token of English text for Gemini-style tokenizers
+CHARS_PER_TOKEN = 4
+
+# A cut passage shorter than this is dropped instead
+MIN_PASSAGE_TOKENS = 50
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def format_passage(doc: Document) -> str:
+    """Format one passage as it appears in the prompt context."""
+    return f"**Source: {doc.metadata.get('source', 'Unknown')}**\n\n{doc.page_content}"
+
+
+def merge_chunks(docs: List[Document]) -> List[Document]:
+    """
+    Merge overlapping or adjacent chunks of the same source.
+
+    Args:
+        docs: Retrieved chunks, most relevant first
+
+    Returns:
+        Passages ordered by the rank of their most relevant chunk. Merged
+        passages keep the metadata of their first chunk, with
+        ``start_index`` set to the passage start and ``merged_chunks`` to
+        the number of chunks merged.
+    """
+    spans: Dict[str, List[dict]] = {}
+    passages = []
+    seen_texts = set()
+    for rank, doc in enumerate(docs):
+        if doc.page_content in seen_texts:
+            continue
+        seen_texts.add(doc.page_content)
+
+        start = doc.metadata.get("start_index")
+        if not isinstance(start, int) or start < 0:
+            passages.append({"rank": rank, "doc": doc})
+            continue
+        spans.setdefault(doc.metadata.get("source", "Unknown"), []).append({
+            "rank": rank,
+            "start": start,
+            "end": start + len(doc.page_content),
+            "text": doc.page_content,
+            "metadata": doc.metadata,
+            "count": 1,
+        })
+
+    for source_spans in spans.values():
+        source_spans.sort(key=lambda span: span["start"])
+        merged = [source_spans[0]]
+        for span in source_spans[1:]:
+            current = merged[-1]
+            if span["start"] > current["end"]:
+                merged.append(span)
+                continue
+            if span["end"] > current["end"]:
+                current["text"] += span["text"][current["end"] - span["start"]:]
+                current["end"] = span["end"]
+            current["rank"] = min(current["rank"], span["rank"])
+            current["count"] += span["count"]
+
+        for span in merged:
+            metadata = dict(span["metadata"], start_index=span["start"])
+            if span["count"] > 1:
+                metadata["merged_chunks"] = span["count"]
+            passages.append({"rank": span["rank"], "doc": Document(page_content=span["text"], metadata=metadata)})
+
+    passages.sort(key=lambda passage: passage["rank"])
+    return [passage["doc"] for passage in passages]
+
+
+def pack_context(docs: List[Document], token_budget: Optional[int] = None) -> List[Document]:
+    """
+    Merge retrieved chunks and keep the best passages within a token budget.
+
+    Args:
+        docs: Retrieved chunks, most relevant first
+        token_budget: Maximum estimated tokens of the formatted passages.
+            None keeps every passage.
+
+    Returns:
+        Passages to put in the prompt, most relevant first
+    """
+    passages = merge_chunks(docs)
+    if token_budget is None:
+        return passages
+
+    packed = []
+    remaining = token_budget
+    for doc in passages:
+        cost = estimate_tokens(format_passage(doc))
+        if cost <= remaining:
+            packed.append(doc)
+            remaining -= cost
+            continue
+
+        # Cut the passage that crosses the budget at a word boundary
+        header_tokens = cost - estimate_tokens(doc.page_content)
+        keep_chars = (remaining - header_tokens) * CHARS_PER_TOKEN
+        if keep_chars >= MIN_PASSAGE_TOKENS * CHARS_PER_TOKEN:
+            text = doc.page_content[:keep_chars]
+            text = text[:text.rfind(" ")] if " " in text else text
+            packed.append(Document(page_content=text, metadata=dict(doc.metadata, truncated=True)))
+        break
+
+    logger.debug(
+        f"Packed {len(docs)} chunks into {len(packed)} passages "
+        f"({sum(len(doc.page_content) for doc in docs)} -> "
+        f"{sum(len(doc.page_content) for doc in packed)} characters)"
+    )
+    return packed
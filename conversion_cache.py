@@ -0,0 +1,114 @@
+"""
+Persistent Cache of Converted Markdown
+
+Both the RAG agent and the CV analyzer convert the same CV files with
+MarkItDown. This cache stores the converted Markdown on disk, compressed with
+zstandard, keyed by the file's content hash and the MarkItDown version, so a
+file that has been converted once is never parsed again until either the file
+or the converter changes.
+
+Layout: ``<cache_dir>/<key[:2]>/<key>.md.zst``
+"""
+
+import hashlib
+import logging
+import os
+from importlib import metadata
+from pathlib import Path
+from typing import Optional
+
+import zstandard
+
+from ingest_manifest import file_sha256
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = ".cv_cache/markdown"
+
+# Bump when the way converted text is produced or stored changes
+CACHE_FORMAT_VERSION = "1"
+
+
+def converter_version() -> str:
+    """Return the installed MarkItDown version without importing it."""
+    try:
+        return metadata.version("markitdown")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+class ConversionCache:
+    """
+    On-disk cache of MarkItDown output keyed by file content and converter.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, compression_level: int = 3):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Folder where compressed Markdown files are stored
+            compression_level: zstandard compression level
+        """
+        self.cache_dir = Path(cache_dir)
+        self.compression_level = compression_level
+        self.version = f"{converter_version()}:{CACHE_FORMAT_VERSION}"
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, file_path: Path, sha256: Optional[str] = None) -> str:
+        """
+        Build the cache key for a file.
+
+        Args:
+            file_path: Source document
+            sha256: Precomputed content hash (computed if None)
+
+        Returns:
+            Hex cache key
+        """
+        content_hash = sha256 or file_sha256(file_path)
+        return hashlib.sha256(f"{self.version}:{content_hash}".encode()).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.md.zst"
+
+    def get(self, file_path: Path, sha256: Optional[str] = None) -> Optional[str]:
+        """
+        Return the cached Markdown for a file, or None on a miss.
+
+        Args:
+            file_path: Source document
+            sha256: Precomputed content hash (computed if None)
+        """
+        entry_path = self._entry_path(self.key_for(file_path, sha256))
+        try:
+            data = entry_path.read_bytes()
+            text = zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, zstandard.ZstdError, UnicodeDecodeError) as e:
+            logger.warning(f"Discarding corrupt cache entry {entry_path.name}: {str(e)}")
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return text
+
+    def put(self, file_path: Path, text: str, sha256: Optional[str] = None):
+        """
+        Store the converted Markdown for a file.
+
+        Args:
+            file_path: Source document
+            text: Converted Markdown
+            sha256: Precomputed content hash (computed if None)
+        """
+        entry_path = self._entry_path(self.key_for(file_path, sha256))
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+
+        data = zstandard.ZstdCompressor(level=self.compression_level).compress(text.encode("utf-8"))
+        tmp_path = entry_path.with_suffix(f".tmp{os.getpid()}")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, entry_path)
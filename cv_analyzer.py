@@ -3,27 +3,78 @@
 
 import os
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from markitdown import markitdown
+from typing import Iterator, List, Optional, Tuple
+from markitdown import MarkItDown
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+from analysis_cache import AnalysisCache, DEFAULT_ANALYSIS_CACHE_PATH
+from candidate_ranking import CandidateRanker, RANKING_PROMPT
+from conversion_cache import ConversionCache, DEFAULT_CACHE_DIR
+from document_conversion import default_worker_count, iter_convert_files
+from metrics import MetricsRegistry, default_registry, llm_usage_callback
 
 load_dotenv()
 
+ANALYSIS_MODEL = "gemini-2.0-flash-lite"
+
+# Bump the version whenever the prompt or its parsing changes meaning, so
+# cached analyses made with the old prompt are not reused
+ANALYSIS_PROMPT_VERSION = "1"
+
+ANALYSIS_PROMPT = """Analyze the following CV and extract key information in JSON format:
+
+Candidate Name: {candidate_name}
+
+CV Content:
+{cv_content}
+
+Please extract and provide:
+1. Full Name
+2. Email
+3. Phone (if available)
+4. Years of Experience
+5. Top 5 Key Skills (as a list)
+6. Education Background (degree, field, institution)
+7. Professional Experience (job titles, companies, years)
+8. Certifications (if any)
+9. Overall Strength Score (1-10)
+10. Strengths Summary (2-3 sentences)
+11. Areas for Improvement (if any)
+
+Return ONLY valid JSON format, no additional text."""
+
 class CVAnalyzer:
-    def __init__(self):
+    def __init__(
+        self,
+        conversion_cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+        analysis_cache_path: Optional[str] = DEFAULT_ANALYSIS_CACHE_PATH,
+        metrics: Optional[MetricsRegistry] = None
+    ):
         api_key = os.getenv("GOOGLE_API_KEY")
         if not api_key:
             raise ValueError("GOOGLE_API_KEY environment variable not set")
         
         self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash-lite",
+            model=ANALYSIS_MODEL,
             api_key=api_key,
             temperature=0.5
         )
         
+        self.md_converter = MarkItDown()
+        # Converted Markdown shared with the RAG agent; None disables caching
+        self.conversion_cache = ConversionCache(conversion_cache_dir) if conversion_cache_dir else None
+        # Analyses keyed by CV text, prompt version and model; None disables caching
+        self.analysis_cache = AnalysisCache(analysis_cache_path) if analysis_cache_path else None
+        # Stage timings and LLM usage (see metrics)
+        self.metrics = metrics or default_registry
+        
         self.cv_data = {}
         self.candidates = []
         
@@ -34,9 +85,16 @@ class CVAnalyzer:
             if not path.exists():
                 raise FileNotFoundError(f"File not found: {file_path}")
             
+            if self.conversion_cache:
+                cached = self.conversion_cache.get(path)
+                if cached is not None:
+                    return cached
+            
             # MarkItDown automatically detects file type and extracts content
-            result = markitdown.markitdown(file_path)
-            return result if result else ""
+            result = self.md_converter.convert(str(path)).text_content or ""
+            if self.conversion_cache:
+                self.conversion_cache.put(path, result)
+            return result
         except Exception as e:
             print(f"Error extracting CV from {file_path}: {e}")
             return ""
@@ -44,49 +102,69 @@ class CVAnalyzer:
     def analyze_cv(self, cv_text: str, candidate_name: str) -> dict:
         """Analyze CV content using LangChain and extract key information."""
         
-        analysis_prompt = PromptTemplate(
-            input_variables=["cv_content", "candidate_name"],
-            template="""Analyze the following CV and extract key information in JSON format:
-
-Candidate Name: {candidate_name}
-
-CV Content:
-{cv_content}
-
-Please extract and provide:
-1. Full Name
-2. Email
-3. Phone (if available)
-4. Years of Experience
-5. Top 5 Key Skills (as a list)
-6. Education Background (degree, field, institution)
-7. Professional Experience (job titles, companies, years)
-8. Certifications (if any)
-9. Overall Strength Score (1-10)
-10. Strengths Summary (2-3 sentences)
-11. Areas for Improvement (if any)
-
-Return ONLY valid JSON format, no additional text."""
-        )
-        
-        chain = LLMChain(llm=self.llm, prompt=analysis_prompt)
-        
-        try:
-            result = chain.run(
-                cv_content=cv_text[:3000],  # Limit to 3000 chars for efficiency
-                candidate_name=candidate_name
+        with self.metrics.span("analyze_cv", candidate=candidate_name, cached=False) as span:
+            cache_key = None
+            if self.analysis_cache is not None:
+                cache_key = AnalysisCache.make_key(
+                    cv_text, candidate_name, ANALYSIS_PROMPT, ANALYSIS_PROMPT_VERSION, ANALYSIS_MODEL
+                )
+                cached = self.analysis_cache.get(cache_key)
+                if cached is not None:
+                    span["attributes"]["cached"] = True
+                    cached["cv_text"] = cv_text
+                    return cached
+            
+            analysis_prompt = PromptTemplate(
+                input_variables=["cv_content", "candidate_name"],
+                template=ANALYSIS_PROMPT
             )
             
-            # Parse JSON response
-            analysis = json.loads(result)
-            analysis["cv_text"] = cv_text
-            return analysis
-        except json.JSONDecodeError:
-            print(f"Error parsing analysis for {candidate_name}")
-            return {"error": "Failed to parse analysis", "candidate_name": candidate_name}
+            chain = analysis_prompt | self.llm | StrOutputParser()
+            
+            try:
+                result = chain.invoke(
+                    {
+                        "cv_content": cv_text[:3000],  # Limit to 3000 chars for efficiency
+                        "candidate_name": candidate_name
+                    },
+                    config={"callbacks": [llm_usage_callback(self.metrics, "analyze_cv")]}
+                )
+                
+                # Parse JSON response
+                analysis = json.loads(result)
+                if cache_key is not None:
+                    self.analysis_cache.put(cache_key, analysis)
+                analysis["cv_text"] = cv_text
+                return analysis
+            except json.JSONDecodeError:
+                print(f"Error parsing analysis for {candidate_name}")
+                span["attributes"]["error"] = "unparseable response"
+                return {"error": "Failed to parse analysis", "candidate_name": candidate_name}
     
-    def collect_cvs(self, cv_folder: str):
-        """Collect and analyze all CVs from a folder."""
+    def collect_cvs(
+        self,
+        cv_folder: str,
+        extraction_workers: int = 1,
+        analysis_concurrency: int = 1,
+        extraction_timeout: Optional[float] = None
+    ):
+        """
+        Collect and analyze all CVs from a folder.
+        
+        Extraction and analysis are pipelined: each CV is handed to the LLM as
+        soon as its text is extracted, while the next files are still being
+        converted. A CV that fails to extract or analyze is reported and
+        skipped without affecting the others. Candidates are appended to
+        self.candidates in file name order regardless of completion order.
+        
+        Args:
+            cv_folder: Folder containing the CV files
+            extraction_workers: Processes used to convert files. Values above
+                1 convert on a process pool.
+            analysis_concurrency: Maximum LLM analyses in flight
+            extraction_timeout: Seconds allowed per file on the process pool
+                before it is skipped. None waits indefinitely.
+        """
         folder_path = Path(cv_folder)
         
         if not folder_path.exists():
@@ -94,29 +172,111 @@ Return ONLY valid JSON format, no additional text."""
             return
         
         cv_extensions = {".pdf", ".docx", ".doc", ".txt", ".md"}
-        cv_files = [f for f in folder_path.iterdir() if f.suffix.lower() in cv_extensions]
+        cv_files = sorted(f for f in folder_path.iterdir() if f.suffix.lower() in cv_extensions)
         
         if not cv_files:
             print(f"No CV files found in {cv_folder}")
             return
         
-        print(f"Found {len(cv_files)} CV files. Analyzing...")
+        analysis_concurrency = max(1, analysis_concurrency)
+        print(
+            f"Found {len(cv_files)} CV files. Analyzing "
+            f"(extraction_workers={extraction_workers}, analysis_concurrency={analysis_concurrency})..."
+        )
+        
+        start = time.perf_counter()
+        results = [None] * len(cv_files)
+        progress = {"done": 0}
+        progress_lock = threading.Lock()
+        # Bounds how many extracted texts wait for the LLM at any time
+        backlog = threading.BoundedSemaphore(analysis_concurrency * 2)
         
-        for cv_file in cv_files:
-            candidate_name = cv_file.stem
-            print(f"\nProcessing: {candidate_name}")
-            
-            cv_text = self.extract_cv_text(str(cv_file))
-            if cv_text:
+        def report(candidate_name: str, ok: bool, detail: str = ""):
+            with progress_lock:
+                progress["done"] += 1
+                mark = "✓ Analyzed" if ok else "✗ Failed to analyze"
+                print(f"[{progress['done']}/{len(cv_files)}] {mark}: {candidate_name}{detail}")
+        
+        def analyze(position: int, cv_text: str, candidate_name: str):
+            try:
                 analysis = self.analyze_cv(cv_text, candidate_name)
-                if "error" not in analysis:
-                    self.candidates.append(analysis)
-                    print(f"✓ Analyzed: {candidate_name}")
-                else:
-                    print(f"✗ Failed to analyze: {candidate_name}")
+            except Exception as e:
+                analysis = {"error": str(e), "candidate_name": candidate_name}
+            finally:
+                backlog.release()
+            
+            if "error" not in analysis:
+                results[position] = analysis
+                report(candidate_name, True)
+            else:
+                report(candidate_name, False, f" ({analysis['error']})")
+        
+        positions = {cv_file: i for i, cv_file in enumerate(cv_files)}
+        with ThreadPoolExecutor(max_workers=analysis_concurrency) as executor:
+            for cv_file, cv_text, error in self._iter_cv_texts(cv_files, extraction_workers, extraction_timeout):
+                if not cv_text:
+                    report(cv_file.stem, False, f" ({error or 'no text extracted'})")
+                    continue
+                backlog.acquire()
+                executor.submit(analyze, positions[cv_file], cv_text, cv_file.stem)
+        
+        analyzed = [analysis for analysis in results if analysis is not None]
+        self.candidates.extend(analyzed)
+        
+        elapsed = time.perf_counter() - start
+        print(f"\nAnalyzed {len(analyzed)}/{len(cv_files)} CVs in {elapsed:.1f}s")
+        if self.analysis_cache is not None:
+            stats = self.analysis_cache.stats()
+            print(f"Analysis cache: {stats['hits']} reused, {stats['misses']} analyzed")
     
-    def rank_candidates(self, job_requirements: str = None) -> list:
-        """Rank candidates based on analysis and optional job requirements."""
+    def _iter_cv_texts(
+        self,
+        cv_files: List[Path],
+        workers: int,
+        timeout: Optional[float]
+    ) -> Iterator[Tuple[Path, Optional[str], Optional[str]]]:
+        """
+        Yield (file, text, error) for each CV, converting on a process pool if workers > 1.
+        
+        Cached conversions are yielded first; only cache misses go to the pool.
+        """
+        if workers <= 1:
+            for cv_file in cv_files:
+                yield cv_file, self.extract_cv_text(str(cv_file)), None
+            return
+        
+        misses = []
+        for cv_file in cv_files:
+            cached = self.conversion_cache.get(cv_file) if self.conversion_cache else None
+            if cached is not None:
+                yield cv_file, cached, None
+            else:
+                misses.append(cv_file)
+        
+        if not misses:
+            return
+        for cv_file, cv_text, error in iter_convert_files(misses, workers, timeout):
+            if cv_text is not None and self.conversion_cache:
+                self.conversion_cache.put(cv_file, cv_text)
+            yield cv_file, cv_text, error
+    
+    def rank_candidates(self, job_requirements: str = None, top_k: int = 10, group_size: int = 10) -> list:
+        """
+        Rank candidates based on analysis and optional job requirements.
+        
+        All candidates are scored locally first (embedding similarity and
+        structured fields, no API call); only compact summaries of the top_k
+        are sent to the LLM for the final ordering (see candidate_ranking).
+        
+        Args:
+            job_requirements: Job requirements text
+            top_k: Number of candidates shortlisted for the LLM
+            group_size: Maximum candidates per LLM prompt; larger shortlists
+                are ranked in groups whose winners meet in a final round
+        
+        Returns:
+            Rankings of the shortlisted candidates, best first
+        """
         
         if not self.candidates:
             print("No candidates to rank")
@@ -124,41 +284,24 @@ Return ONLY valid JSON format, no additional text."""
         
         ranking_prompt = PromptTemplate(
             input_variables=["candidates_data", "job_requirements"],
-            template="""You are an expert HR recruiter. Rank the following candidates based on their qualifications.
-
-Job Requirements:
-{job_requirements}
-
-Candidates Data:
-{candidates_data}
-
-Provide a ranking in JSON format with:
-1. rank (1, 2, 3, etc.)
-2. candidate_name
-3. match_score (0-100)
-4. key_strengths (list of 3-4 points)
-5. recommendation (hire/maybe/not_recommended)
-6. reasoning (1-2 sentences)
-
-Return ONLY valid JSON array format, sorted by rank."""
+            template=RANKING_PROMPT
         )
+        chain = ranking_prompt | self.llm | StrOutputParser()
         
-        candidates_json = json.dumps(self.candidates, indent=2)
-        requirements = job_requirements or "Software Engineer with 5+ years experience"
-        
-        chain = LLMChain(llm=self.llm, prompt=ranking_prompt)
+        def rank_with_llm(requirements: str, candidates_data: str) -> str:
+            with self.metrics.span("rank_with_llm"):
+                return chain.invoke(
+                    {
+                        "candidates_data": candidates_data,
+                        "job_requirements": requirements
+                    },
+                    config={"callbacks": [llm_usage_callback(self.metrics, "rank_candidates")]}
+                )
         
-        try:
-            result = chain.run(
-                candidates_data=candidates_json,
-                job_requirements=requirements
-            )
-            
-            rankings = json.loads(result)
-            return rankings if isinstance(rankings, list) else [rankings]
-        except json.JSONDecodeError:
-            print("Error parsing rankings")
-            return []
+        requirements = job_requirements or "Software Engineer with 5+ years experience"
+        ranker = CandidateRanker(rank_with_llm, top_k=top_k, group_size=group_size)
+        with self.metrics.span("rank_candidates", candidates=len(self.candidates), top_k=top_k):
+            return ranker.rank(self.candidates, requirements)
     
     def select_best_candidate(self, rankings: list) -> dict:
         """Select the best candidate from rankings."""
@@ -186,9 +329,21 @@ Return ONLY valid JSON array format, sorted by rank."""
         return report
 
 
-def main():
+def main(argv: Optional[List[str]] = None):
     """Main function to run CV analysis."""
+    import argparse
+    from profiling import add_profile_argument, profile_run
+    
+    parser = argparse.ArgumentParser(description="Analyze and rank the CVs in ./cvs")
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
     
+    with profile_run(args.profile, "cv_analyzer"):
+        _analyze_folder()
+
+
+def _analyze_folder():
+    """Analyze the CVs in ./cvs, rank the candidates and write the report."""
     # Initialize analyzer
     analyzer = CVAnalyzer()
     
@@ -200,8 +355,8 @@ def main():
     print(f"Please add CV files to the '{cv_folder}' folder")
     print("Supported formats: PDF, DOCX, DOC, TXT, MD\n")
     
-    # Collect and analyze CVs
-    analyzer.collect_cvs(cv_folder)
+    # Collect and analyze CVs: convert on all cores, several LLM calls in flight
+    analyzer.collect_cvs(cv_folder, extraction_workers=default_worker_count(), analysis_concurrency=4)
     
     if analyzer.candidates:
         # Get job requirements (optional)
@@ -0,0 +1,174 @@
+"""
+Parallel Document Conversion
+
+PDF and DOCX conversion with MarkItDown (pdfminer, mammoth) is CPU-bound, so
+converting files one at a time in a single thread leaves most cores idle.
+This module converts files on a pool of worker processes, each holding its
+own MarkItDown instance, and yields the results in input order.
+
+A file that takes longer than the per-file timeout is reported as failed.
+The timeout starts when a worker picks the file up, so neither the time a
+file spends queued behind others nor the worker start-up (importing
+MarkItDown) counts against it. Because a hung worker process cannot be
+interrupted, the pool is terminated and restarted for the files that had not
+finished yet, so one pathological PDF never holds up the rest of the run.
+
+Worker processes are started with ``forkserver`` (``spawn`` where it is not
+available) rather than ``fork``: the pool is created while embedding and
+indexing threads are running, and forking a multi-threaded process can
+deadlock the child on a lock held by another thread.
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two checks of the worker start times while waiting for a file
+_POLL_INTERVAL = 0.05
+
+# Per-process converter and start-time queue, set by the pool initializer
+_worker_converter = None
+_worker_started = None
+
+
+def _init_worker(started, converter: Optional[Callable[[str], str]] = None):
+    """Create the converter used by this worker process."""
+    global _worker_converter, _worker_started
+    _worker_started = started
+    if converter is not None:
+        _worker_converter = converter
+        return
+    from markitdown import MarkItDown
+    markitdown = MarkItDown()
+    _worker_converter = lambda file_path: markitdown.convert(file_path).text_content
+
+
+def _convert_in_worker(index: int, file_path: str) -> str:
+    """Convert a single file to Markdown inside a worker process."""
+    _worker_started.put((index, time.time()))
+    return _worker_converter(file_path)
+
+
+def default_worker_count() -> int:
+    """Return the default number of conversion processes (one per core)."""
+    return os.cpu_count() or 1
+
+
+def default_start_method() -> str:
+    """Return the process start method used for conversion pools."""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return "forkserver"
+    return "spawn"
+
+
+def _wait_for_result(async_result, index: int, started, start_times: Dict[int, float], timeout: Optional[float]) -> str:
+    """
+    Wait for a conversion, timing it from when a worker picked the file up.
+
+    Raises:
+        multiprocessing.TimeoutError: If the conversion ran longer than timeout
+    """
+    if timeout is None:
+        return async_result.get()
+    while True:
+        try:
+            while True:
+                i, started_at = started.get_nowait()
+                start_times[i] = started_at
+        except queue.Empty:
+            pass
+        # A result that finished while the consumer was busy is returned no
+        # matter how long ago the worker picked the file up
+        if async_result.ready():
+            return async_result.get(0)
+        wait = _POLL_INTERVAL
+        if index in start_times:
+            remaining = start_times[index] + timeout - time.time()
+            if remaining <= 0:
+                raise multiprocessing.TimeoutError
+            wait = min(wait, remaining)
+        try:
+            return async_result.get(wait)
+        except multiprocessing.TimeoutError:
+            continue
+
+
+def iter_convert_files(
+    file_paths: List[Path],
+    max_workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+    max_pending: Optional[int] = None,
+    converter: Optional[Callable[[str], str]] = None,
+    start_method: Optional[str] = None
+) -> Iterator[Tuple[Path, Optional[str], Optional[str]]]:
+    """
+    Convert files to Markdown on a process pool.
+
+    Args:
+        file_paths: Files to convert
+        max_workers: Number of worker processes (defaults to the CPU count)
+        timeout: Seconds a single file may take once a worker has picked it
+            up. None waits indefinitely.
+        max_pending: Maximum files submitted ahead of the one being yielded,
+            which bounds the converted texts held in memory when the consumer
+            is slower than the pool. None submits every file at once.
+        converter: Module-level function mapping a file path to its text,
+            used instead of MarkItDown (it must be picklable)
+        start_method: multiprocessing start method (defaults to
+            default_start_method())
+
+    Yields:
+        Tuples of (file_path, markdown_text, error) in the order of file_paths.
+        Exactly one of markdown_text and error is None.
+    """
+    max_workers = max(1, min(max_workers or default_worker_count(), len(file_paths) or 1))
+    context = multiprocessing.get_context(start_method or default_start_method())
+    pending = list(range(len(file_paths)))
+
+    while pending:
+        # A fresh queue per pool, so start times of files interrupted by a
+        # restart are not carried over
+        started = context.Queue()
+        start_times: Dict[int, float] = {}
+        pool = context.Pool(processes=max_workers, initializer=_init_worker, initargs=(started, converter))
+        try:
+            async_results = {}
+            submitted = 0
+            order, pending = pending, []
+
+            for position, i in enumerate(order):
+                while submitted < len(order) and (max_pending is None or submitted < position + max_pending):
+                    j = order[submitted]
+                    async_results[j] = pool.apply_async(_convert_in_worker, (j, str(file_paths[j])))
+                    submitted += 1
+                try:
+                    # Results are dropped once yielded so finished texts are not kept
+                    text = _wait_for_result(async_results.pop(i), i, started, start_times, timeout)
+                    yield file_paths[i], text, None
+                except multiprocessing.TimeoutError:
+                    logger.error(f"Conversion of {file_paths[i].name} timed out after {timeout}s")
+                    yield file_paths[i], None, f"timed out after {timeout}s"
+
+                    # The stuck worker never returns; emit what already finished
+                    # and restart the pool for the rest
+                    for j in order[position + 1:]:
+                        if j not in async_results or not async_results[j].ready():
+                            pending = order[order.index(j):]
+                            break
+                        try:
+                            yield file_paths[j], async_results[j].get(0), None
+                        except Exception as e:
+                            yield file_paths[j], None, str(e)
+                    break
+                except Exception as e:
+                    yield file_paths[i], None, str(e)
+        finally:
+            pool.terminate()
+            pool.join()
+            started.close()
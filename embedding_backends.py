@@ -0,0 +1,238 @@
+"""
+Embedding Backends
+
+The RAG agent can embed text with different backends, selected by name:
+
+- ``google``: Google Generative AI embeddings (``models/gemini-embedding-001``).
+  Needs ``GOOGLE_API_KEY`` and a network connection.
+- ``hashing``: A local CPU embedder based on hashed word and character
+  n-gram features. It needs no model download, no network and no API key,
+  which makes it suitable for CI, offline runs and tests.
+
+The backend is chosen with the ``embedding_backend`` argument of
+``CVRAGAgent`` or the ``CV_RAG_EMBEDDING_BACKEND`` environment variable.
+Every saved index records the backend, model and dimension that built it
+(``embedding.json``), and loading it with a different configuration fails.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_BACKEND = "google"
+EMBEDDING_INFO_FILENAME = "embedding.json"
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic local embeddings from hashed word and character n-grams.
+
+    Each word contributes a unigram feature plus its character n-grams (with
+    word-boundary markers), hashed into a fixed number of signed buckets. The
+    result is L2-normalized, so inner product equals cosine similarity.
+    """
+
+    model = "hashing-ngram-v1"
+
+    def __init__(self, dimension: int = 1024, ngram_range: tuple = (3, 5), word_weight: float = 2.0):
+        """
+        Initialize the embedder.
+
+        Args:
+            dimension: Number of hash buckets (vector size)
+            ngram_range: Inclusive range of character n-gram lengths
+            word_weight: Weight of whole-word features relative to n-grams
+        """
+        self.dimension = dimension
+        self.ngram_range = ngram_range
+        self.word_weight = word_weight
+
+    def _add_feature(self, vector: np.ndarray, feature: str, weight: float):
+        digest = zlib.crc32(feature.encode("utf-8"))
+        sign = 1.0 if digest & 0x80000000 else -1.0
+        vector[digest % self.dimension] += sign * weight
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        min_n, max_n = self.ngram_range
+
+        for word in re.findall(r"\w+", text.lower()):
+            self._add_feature(vector, word, self.word_weight)
+            marked = f"<{word}>"
+            for n in range(min_n, max_n + 1):
+                for i in range(len(marked) - n + 1):
+                    self._add_feature(vector, marked[i:i + n], 1.0)
+
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of documents."""
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query."""
+        return self._embed(text)
+
+
+GOOGLE_EMBEDDING_MODEL = "models/gemini-embedding-001"
+
+
+def _create_google(dimension: Optional[int]) -> Embeddings:
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY not found in environment variables")
+    return _GoogleEmbeddings(api_key, dimension)
+
+
+class _GoogleEmbeddings(Embeddings):
+    """
+    Google embeddings whose client is created on first use.
+
+    Importing the Google client takes over a second, which agents that only
+    load an index and embed the odd query should not pay at startup. A fixed
+    ``output_dimensionality`` is passed to every call when a dimension is set.
+    """
+
+    model = GOOGLE_EMBEDDING_MODEL
+
+    def __init__(self, api_key: str, dimension: Optional[int] = None):
+        self.api_key = api_key
+        self.dimension = dimension
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> Embeddings:
+        with self._lock:
+            if self._client is None:
+                from langchain_google_genai import GoogleGenerativeAIEmbeddings
+                self._client = GoogleGenerativeAIEmbeddings(model=self.model, google_api_key=self.api_key)
+            return self._client
+
+    def _kwargs(self) -> dict:
+        return {"output_dimensionality": self.dimension} if self.dimension else {}
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.client.embed_documents(texts, **self._kwargs())
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.client.embed_query(text, **self._kwargs())
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.client.aembed_documents(texts, **self._kwargs())
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.client.aembed_query(text, **self._kwargs())
+
+
+def _create_hashing(dimension: Optional[int]) -> Embeddings:
+    return HashingEmbeddings(dimension=dimension or 1024)
+
+
+EMBEDDING_BACKENDS: Dict[str, Callable[[Optional[int]], Embeddings]] = {
+    "google": _create_google,
+    "hashing": _create_hashing,
+}
+
+
+def resolve_backend_name(backend: Optional[str] = None) -> str:
+    """Return the configured backend name (argument, then environment, then default)."""
+    return (backend or os.getenv("CV_RAG_EMBEDDING_BACKEND") or DEFAULT_EMBEDDING_BACKEND).lower()
+
+
+def create_embeddings(backend: str, dimension: Optional[int] = None) -> Embeddings:
+    """
+    Create the embeddings model of a backend.
+
+    Args:
+        backend: Backend name (see EMBEDDING_BACKENDS)
+        dimension: Output dimension, for backends that support choosing it
+
+    Returns:
+        LangChain Embeddings object
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"Unknown embedding backend '{backend}'. "
+            f"Available: {', '.join(sorted(EMBEDDING_BACKENDS))}"
+        )
+    return EMBEDDING_BACKENDS[backend](dimension)
+
+
+def model_name(embeddings: Embeddings) -> str:
+    """Return the model name of an embeddings object."""
+    return getattr(embeddings, "model", None) or type(embeddings).__name__
+
+
+def save_embedding_info(folder: str, backend: str, model: str, dimension: int):
+    """
+    Record which backend built an index.
+
+    Args:
+        folder: Vector store folder
+        backend: Backend name
+        model: Embedding model name
+        dimension: Vector dimension of the index
+    """
+    path = Path(folder) / EMBEDDING_INFO_FILENAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"backend": backend, "model": model, "dimension": dimension}, f, indent=2)
+
+
+def check_embedding_info(
+    folder: str,
+    backend: str,
+    model: str,
+    index_dimension: int,
+    dimension: Optional[int] = None
+):
+    """
+    Refuse an index that was built with a different embedding configuration.
+
+    Indexes saved before this information was recorded are accepted.
+
+    Args:
+        folder: Vector store folder
+        backend: Configured backend name
+        model: Configured embedding model name
+        index_dimension: Vector dimension of the loaded index
+        dimension: Configured output dimension, if any
+
+    Raises:
+        ValueError: If the backend, model or dimension do not match
+    """
+    path = Path(folder) / EMBEDDING_INFO_FILENAME
+    if not path.exists():
+        logger.warning(f"No {EMBEDDING_INFO_FILENAME} in {folder}; cannot verify the embedding backend")
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        info = json.load(f)
+
+    expected_dimension = dimension or info.get("dimension")
+    if (
+        info.get("backend") != backend
+        or info.get("model") != model
+        or info.get("dimension") != index_dimension
+        or expected_dimension != index_dimension
+    ):
+        raise ValueError(
+            f"Vector store at {folder} was built with backend '{info.get('backend')}' "
+            f"(model={info.get('model')}, dimension={info.get('dimension')}) but the agent "
+            f"is configured for backend '{backend}' (model={model}, "
+            f"dimension={dimension or 'default'}). Rebuild the index or change the configuration."
+        )
@@ -0,0 +1,268 @@
+"""
+Persistent Embedding Cache
+
+Identical chunk text (boilerplate sections, unchanged CVs, repeated
+questions) is embedded again on every rebuild. This module keeps computed
+vectors in a SQLite database keyed by (model name, output dimension, hash of
+the text) and wraps any LangChain ``Embeddings`` object so that only cache
+misses reach the embedding API.
+
+The cache is bounded: once it holds more than ``max_entries`` vectors, the
+least recently used ones are evicted. The row count is tracked in memory and
+access times of hits are buffered and written with the next insert (or every
+``TOUCH_FLUSH_SIZE`` hits), so lookups never write to the database. Hit and
+miss counters are kept for monitoring.
+"""
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_CACHE_PATH = ".cv_cache/embeddings.sqlite"
+
+# Buffered access times written at once when no insert flushes them earlier
+TOUCH_FLUSH_SIZE = 1000
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed, size-bounded LRU store of embedding vectors.
+    """
+
+    def __init__(self, path: str = DEFAULT_EMBEDDING_CACHE_PATH, max_entries: int = 200_000):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path: SQLite database file
+            max_entries: Maximum number of vectors kept before LRU eviction
+        """
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        # Access times of hits not yet written to the database
+        self._touched: Dict[str, float] = {}
+
+    @staticmethod
+    def make_key(model: str, dimension: Optional[int], text: str) -> str:
+        """Build the cache key of a text for a given model and output dimension."""
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model}|{dimension or 'default'}|{text_hash}"
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """
+        Look up vectors and mark them as recently used.
+
+        Args:
+            keys: Cache keys to look up
+
+        Returns:
+            Mapping of key to vector for the keys that were found
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+            if found:
+                now = time.time()
+                self._touched.update((key, now) for key in found)
+                if len(self._touched) >= TOUCH_FLUSH_SIZE:
+                    self._flush_touched()
+                    self._conn.commit()
+
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        """
+        Store vectors and evict the least recently used entries if over capacity.
+
+        Args:
+            items: Mapping of cache key to vector
+        """
+        if not items:
+            return
+
+        now = time.time()
+        with self._lock:
+            # Keys map to one vector per model and text, so a key that is
+            # already present (stored by another process) is left as is
+            inserted = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [
+                    (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                    for key, vector in items.items()
+                ]
+            ).rowcount
+            self._count += max(inserted, 0)
+            # Evict on up-to-date access times
+            self._flush_touched()
+            if self._count > self.max_entries:
+                # Other processes may share the file; recount before evicting
+                self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                overflow = self._count - self.max_entries
+                if overflow > 0:
+                    self._conn.execute(
+                        "DELETE FROM embeddings WHERE key IN ("
+                        " SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                        (overflow,)
+                    )
+                    self.evictions += overflow
+                    self._count -= overflow
+            self._conn.commit()
+
+    def _flush_touched(self):
+        """Write the buffered access times (the caller holds the lock and commits)."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters and the current size."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        """Write buffered access times and close the database connection."""
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves vectors from an EmbeddingCache when possible.
+    """
+
+    def __init__(
+        self,
+        base: Embeddings,
+        cache: EmbeddingCache,
+        model_name: Optional[str] = None,
+        dimension: Optional[int] = None
+    ):
+        """
+        Wrap an embeddings model.
+
+        Args:
+            base: Embeddings model called for cache misses
+            cache: Cache to read from and write to
+            model_name: Model name used in the cache key (read from base if None)
+            dimension: Requested output dimension (None for the model default)
+        """
+        self.base = base
+        self.cache = cache
+        self.model_name = model_name or getattr(base, "model", None) or type(base).__name__
+        self.dimension = dimension
+
+    def _keys(self, texts: List[str]) -> List[str]:
+        return [EmbeddingCache.make_key(self.model_name, self.dimension, text) for text in texts]
+
+    def _missing(self, texts: List[str], keys: List[str], found: Dict[str, List[float]]) -> Dict[str, str]:
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        return missing
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, calling the base model only for uncached texts."""
+        keys = self._keys(texts)
+        found = self.cache.get_many(keys)
+        missing = self._missing(texts, keys, found)
+
+        if missing:
+            vectors = self.base.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(computed)
+            found.update(computed)
+
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, serving repeated queries from the cache."""
+        # Queries may use a different task type than documents, so keep them apart
+        key = EmbeddingCache.make_key(self.model_name, self.dimension, f"query:{text}")
+        found = self.cache.get_many([key])
+        if key in found:
+            return found[key]
+
+        vector = self.base.embed_query(text)
+        self.cache.put_many({key: vector})
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Async variant of embed_documents; cache I/O runs in a worker thread."""
+        keys = self._keys(texts)
+        found = await asyncio.to_thread(self.cache.get_many, keys)
+        missing = self._missing(texts, keys, found)
+
+        if missing:
+            vectors = await self.base.aembed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            await asyncio.to_thread(self.cache.put_many, computed)
+            found.update(computed)
+
+        return [found[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Async variant of embed_query; cache I/O runs in a worker thread."""
+        key = EmbeddingCache.make_key(self.model_name, self.dimension, f"query:{text}")
+        found = await asyncio.to_thread(self.cache.get_many, [key])
+        if key in found:
+            return found[key]
+
+        vector = await self.base.aembed_query(text)
+        await asyncio.to_thread(self.cache.put_many, {key: vector})
+        return vector
@@ -0,0 +1,281 @@
+"""
+Batched, Rate-Limited Embedding Engine
+
+Embeds chunk texts in fixed-size batches with bounded concurrency. Requests
+are paced by a token-bucket rate limiter, quota errors (HTTP 429 /
+ResourceExhausted) are retried with exponential backoff, and every finished
+batch is checkpointed to disk. If a build is interrupted, the next run loads
+the checkpoint and only embeds the texts that are still missing.
+
+The engine works with any LangChain ``Embeddings`` object, so it can be
+exercised offline with a fake embedder that injects quota errors.
+"""
+
+import hashlib
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Return True if an exception signals an exhausted API quota or rate limit."""
+    error_msg = str(error)
+    return (
+        "429" in error_msg
+        or "quota" in error_msg.lower()
+        or "ResourceExhausted" in error_msg
+        or type(error).__name__ == "ResourceExhausted"
+    )
+
+
+def text_key(text: str) -> str:
+    """Return the checkpoint key of a chunk text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter.
+
+    Tokens refill continuously at ``rate`` per second up to ``capacity``;
+    ``acquire`` blocks until enough tokens are available.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Initialize the bucket.
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum burst size (defaults to one second of tokens, at least 1)
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until ``tokens`` tokens can be taken from the bucket."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class EmbeddingCheckpoint:
+    """
+    Folder of ``.npz`` files holding vectors of already-embedded texts.
+
+    Each finished batch is written as its own file, so concurrent batches never
+    contend on a single file and a crash loses at most the batches in flight.
+    Every file records the model and output dimension that produced it, and
+    files written for another configuration are ignored on load, so switching
+    models between an interrupted build and its rerun cannot mix vectors.
+    """
+
+    def __init__(self, checkpoint_dir: str, model: str = "", dimension: Optional[int] = None):
+        """
+        Initialize the checkpoint.
+
+        Args:
+            checkpoint_dir: Folder holding the batch files
+            model: Name of the embedding model the vectors come from
+            dimension: Requested output dimension (None for the model default)
+        """
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.model = model
+        self.dimension = dimension
+
+    def load(self) -> Dict[str, List[float]]:
+        """Return all checkpointed vectors of this model keyed by text key."""
+        vectors = {}
+        if not self.checkpoint_dir.exists():
+            return vectors
+
+        for batch_file in sorted(self.checkpoint_dir.glob("*.npz")):
+            try:
+                with np.load(batch_file) as data:
+                    model = str(data["model"]) if "model" in data.files else None
+                    dimension = int(data["dimension"]) if "dimension" in data.files else None
+                    width = data["vectors"].shape[1] if data["vectors"].ndim == 2 else None
+                    if model != self.model or dimension != (self.dimension or 0) or (
+                        self.dimension and width != self.dimension
+                    ):
+                        logger.warning(
+                            f"Ignoring checkpoint {batch_file.name} written for "
+                            f"model={model} dimension={dimension or 'default'}"
+                        )
+                        continue
+                    for key, vector in zip(data["keys"], data["vectors"]):
+                        vectors[str(key)] = vector.tolist()
+            except Exception as e:
+                logger.warning(f"Skipping unreadable checkpoint {batch_file.name}: {str(e)}")
+        return vectors
+
+    def save_batch(self, keys: List[str], vectors: List[List[float]]):
+        """Persist the vectors of one finished batch."""
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        tag = f"{self.model}|{self.dimension or 'default'}|"
+        name = hashlib.sha256((tag + "".join(keys)).encode()).hexdigest()[:16]
+        tmp_path = self.checkpoint_dir / f"{name}.tmp.npz"
+        np.savez(
+            tmp_path,
+            keys=np.array(keys),
+            vectors=np.array(vectors, dtype=np.float32),
+            model=np.array(self.model),
+            dimension=np.array(self.dimension or 0)
+        )
+        tmp_path.replace(self.checkpoint_dir / f"{name}.npz")
+
+    def clear(self):
+        """Delete all checkpoint files."""
+        if not self.checkpoint_dir.exists():
+            return
+        for batch_file in self.checkpoint_dir.glob("*.npz"):
+            batch_file.unlink()
+        try:
+            self.checkpoint_dir.rmdir()
+        except OSError:
+            pass
+
+
+class BatchEmbedder:
+    """
+    Embeds texts in batches with bounded concurrency, rate limiting and retries.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_size: int = 100,
+        max_concurrency: int = 4,
+        requests_per_minute: Optional[float] = None,
+        max_retries: int = 6,
+        initial_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        checkpoint_dir: Optional[str] = None,
+        model_name: Optional[str] = None,
+        dimension: Optional[int] = None,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Initialize the engine.
+
+        Args:
+            embeddings: Embeddings model used for the API calls
+            batch_size: Number of texts sent per request
+            max_concurrency: Maximum number of requests in flight
+            requests_per_minute: Request rate limit. None disables rate limiting.
+            max_retries: Retries per batch on quota errors before giving up
+            initial_backoff: Seconds to wait before the first retry
+            max_backoff: Upper bound for a single backoff wait
+            checkpoint_dir: Folder for resumable checkpoints. None disables them.
+            model_name: Model name recorded with the checkpoints (read from
+                embeddings if None)
+            dimension: Requested output dimension recorded with the checkpoints
+            sleep: Function used to wait between retries
+        """
+        self.embeddings = embeddings
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_limiter = TokenBucket(requests_per_minute / 60.0) if requests_per_minute else None
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        model_name = model_name or getattr(embeddings, "model", None) or type(embeddings).__name__
+        self.checkpoint = EmbeddingCheckpoint(checkpoint_dir, model_name, dimension) if checkpoint_dir else None
+        self.sleep = sleep
+        # Vectors checkpointed by an earlier, interrupted run; read on first use
+        self._resumed: Optional[Dict[str, List[float]]] = None
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch, retrying quota errors with exponential backoff."""
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if not is_quota_error(e) or attempt >= self.max_retries:
+                    raise
+                delay = min(self.max_backoff, self.initial_backoff * (2 ** attempt))
+                delay *= random.uniform(0.5, 1.0)
+                attempt += 1
+                logger.warning(
+                    f"Embedding quota hit, retry {attempt}/{self.max_retries} in {delay:.1f}s"
+                )
+                self.sleep(delay)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts, resuming from the checkpoint if one exists.
+
+        The checkpoint is read once per engine, so calling embed for every
+        batch of a streaming build does not re-read it each time.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            One vector per input text, in input order
+        """
+        keys = [text_key(text) for text in texts]
+        if self._resumed is None:
+            self._resumed = self.checkpoint.load() if self.checkpoint else {}
+        done = {key: self._resumed[key] for key in keys if key in self._resumed}
+
+        # Unique texts that still need an embedding
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in done:
+                missing.setdefault(key, text)
+
+        if done:
+            logger.info(f"Resuming embedding: {len(texts) - len(missing)} texts already checkpointed")
+
+        items = list(missing.items())
+        batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+        logger.info(
+            f"Embedding {len(items)} texts in {len(batches)} batches "
+            f"(concurrency={self.max_concurrency})"
+        )
+
+        def run(batch):
+            batch_keys = [key for key, _ in batch]
+            vectors = self._embed_batch([text for _, text in batch])
+            if self.checkpoint:
+                self.checkpoint.save_batch(batch_keys, vectors)
+            return batch_keys, vectors
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = [executor.submit(run, batch) for batch in batches]
+            try:
+                for completed, future in enumerate(as_completed(futures), 1):
+                    batch_keys, vectors = future.result()
+                    done.update(zip(batch_keys, vectors))
+                    logger.debug(f"Embedded batch {completed}/{len(batches)}")
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        return [done[key] for key in keys]
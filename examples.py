@@ -5,6 +5,7 @@ This script demonstrates various ways to use the RAG agent for analyzing CVs.
 """
 
 import sys
+import asyncio
 from pathlib import Path
 from rag_agent import CVRAGAgent
 import logging
@@ -139,19 +140,20 @@ def example_multiple_queries():
             print("Failed to initialize pipeline")
             return
         
-        print(f"Processing {len(queries)} queries...\n")
+        print(f"Processing {len(queries)} queries concurrently...\n")
         
-        for i, query in enumerate(queries, 1):
+        results = asyncio.run(agent.abatch_query(queries, max_concurrency=4))
+        
+        for i, result in enumerate(results, 1):
             print(f"\n{'─'*80}")
-            print(f"Query {i}: {query}")
+            print(f"Query {i}: {result['question']}")
             print('─'*80)
             
-            try:
-                result = agent.query(query)
-                print(f"Answer: {result}\n")
-            except Exception as e:
-                print(f"Error: {str(e)}\n")
-                logger.error(f"Error processing query {i}: {str(e)}")
+            if result["error"] is None:
+                print(f"Answer: {result['answer']}\n")
+            else:
+                print(f"Error: {result['error']}\n")
+                logger.error(f"Error processing query {i}: {result['error']}")
         
     except Exception as e:
         logger.error(f"Error in multiple queries example: {str(e)}", exc_info=True)
@@ -0,0 +1,187 @@
+"""
+Ingestion Manifest for Incremental Vector Store Refreshes
+
+The manifest records, for every CV that has been indexed, its content hash,
+modification time, size and the IDs of the chunks written to the FAISS store.
+Comparing it with the files currently in the CV folder tells the pipeline
+which files have to be converted and embedded again and which vectors belong
+to files that no longer exist.
+
+The manifest is stored as JSON inside the vector store folder
+(``cv_vector_store/manifest.json``) so it always travels with the index it
+describes.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_sha256(file_path: Path, block_size: int = 1 << 20) -> str:
+    """
+    Compute the SHA-256 hex digest of a file's content.
+
+    Args:
+        file_path: File to hash
+        block_size: Number of bytes read per iteration
+
+    Returns:
+        Hex digest of the file content
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ManifestDiff(NamedTuple):
+    """Result of comparing the manifest with the files on disk."""
+    added: List[Path]
+    changed: List[Path]
+    unchanged: List[Path]
+    deleted: List[str]
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.changed or self.deleted)
+
+
+class IngestManifest:
+    """
+    Per-file record of what has been ingested into the vector store.
+
+    Entries are keyed by the file name, which is the same value stored in the
+    ``source`` metadata of every chunk.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Initialize an empty manifest.
+
+        Args:
+            path: Location of the manifest JSON file
+        """
+        self.path = Path(path)
+        self.entries: Dict[str, dict] = {}
+
+    @classmethod
+    def load(cls, path: Path) -> "IngestManifest":
+        """
+        Load a manifest from disk, returning an empty one if it does not exist.
+
+        Args:
+            path: Location of the manifest JSON file
+
+        Returns:
+            IngestManifest instance
+        """
+        manifest = cls(path)
+        if not manifest.path.exists():
+            return manifest
+
+        try:
+            with open(manifest.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable manifest at {manifest.path}: {str(e)}")
+            return manifest
+
+        if data.get("version") != MANIFEST_VERSION:
+            logger.warning(f"Ignoring manifest with unsupported version {data.get('version')}")
+            return manifest
+
+        manifest.entries = data.get("files", {})
+        return manifest
+
+    def save(self):
+        """Atomically write the manifest to disk."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": self.entries}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def record(self, file_path: Path, chunk_ids: List[str], sha256: Optional[str] = None):
+        """
+        Record that a file has been ingested with the given chunk IDs.
+
+        Args:
+            file_path: The ingested file
+            chunk_ids: IDs of the chunks written to the vector store
+            sha256: Precomputed content hash (computed if None)
+        """
+        stat = file_path.stat()
+        self.entries[file_path.name] = {
+            "file_path": str(file_path),
+            "sha256": sha256 or file_sha256(file_path),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "chunk_ids": list(chunk_ids),
+        }
+
+    def remove(self, source: str) -> List[str]:
+        """
+        Forget a file and return the chunk IDs that belonged to it.
+
+        Args:
+            source: File name of the entry to remove
+
+        Returns:
+            Chunk IDs previously recorded for the file
+        """
+        entry = self.entries.pop(source, None)
+        return entry["chunk_ids"] if entry else []
+
+    def chunk_ids(self, source: str) -> List[str]:
+        """Return the chunk IDs recorded for a file."""
+        entry = self.entries.get(source)
+        return list(entry["chunk_ids"]) if entry else []
+
+    def diff(self, file_paths: List[Path]) -> ManifestDiff:
+        """
+        Compare the manifest with the files currently on disk.
+
+        Files whose size and modification time match the manifest are treated
+        as unchanged without being read. Otherwise the content hash decides, so
+        a touched but identical file is not re-embedded.
+
+        Args:
+            file_paths: Files currently present in the CV folder
+
+        Returns:
+            ManifestDiff describing added, changed, unchanged and deleted files
+        """
+        added, changed, unchanged = [], [], []
+        seen = set()
+
+        for file_path in file_paths:
+            seen.add(file_path.name)
+            entry = self.entries.get(file_path.name)
+            if entry is None:
+                added.append(file_path)
+                continue
+
+            stat = file_path.stat()
+            if stat.st_mtime_ns == entry["mtime_ns"] and stat.st_size == entry["size"]:
+                unchanged.append(file_path)
+                continue
+
+            if file_sha256(file_path) == entry["sha256"]:
+                # Content is identical; only refresh the cheap fingerprint
+                entry["mtime_ns"] = stat.st_mtime_ns
+                entry["size"] = stat.st_size
+                unchanged.append(file_path)
+            else:
+                changed.append(file_path)
+
+        deleted = [source for source in self.entries if source not in seen]
+        return ManifestDiff(added, changed, unchanged, deleted)
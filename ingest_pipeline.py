@@ -0,0 +1,236 @@
+"""
+Streaming Ingestion Pipeline
+
+A full build used to convert every CV, then chunk every document, then embed
+every chunk, holding each complete intermediate list in memory before the
+first vector reached the index. Peak memory grew with the corpus, and the
+converter sat idle while the embedder ran (and the other way round).
+
+This module chains generator stages (convert -> chunk -> embed -> index).
+Each stage runs in its own thread and hands its output to the next one
+through a bounded queue, so:
+
+- at most ``queue_size`` items wait between two stages, whatever the corpus
+  size, and a slow stage pauses the ones before it (backpressure);
+- conversion, embedding requests and indexing overlap in time.
+
+Every stage records how many items it produced, how long it was busy, how
+long it waited for input and how long it was blocked by a full output queue.
+That gives per-stage throughput and shows which stage bounds the run: stages
+after the bottleneck wait for input, stages before it are blocked.
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Iterable, Iterator, List
+
+_DONE = object()
+
+
+class StageStats:
+    """
+    Counters of one pipeline stage.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.total_seconds = 0.0
+        self.waiting_seconds = 0.0
+        self.blocked_seconds = 0.0
+
+    @property
+    def busy_seconds(self) -> float:
+        """Seconds spent working, excluding waits for input and for queue space."""
+        return max(0.0, self.total_seconds - self.waiting_seconds - self.blocked_seconds)
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.busy_seconds if self.busy_seconds else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "stage": self.name,
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "waiting_seconds": round(self.waiting_seconds, 3),
+            "blocked_seconds": round(self.blocked_seconds, 3),
+            "items_per_second": round(self.items_per_second, 2),
+        }
+
+
+class _Stopped(Exception):
+    """Raised to a stage waiting for input when the pipeline is stopping."""
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class _TimedInput:
+    """Iterator wrapper adding the time spent waiting for items to a stage's stats."""
+
+    def __init__(self, iterable: Iterable, stats: StageStats, count: bool = False):
+        self.iterator = iter(iterable)
+        self.stats = stats
+        self.count = count
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            item = next(self.iterator)
+        finally:
+            self.stats.waiting_seconds += time.perf_counter() - start
+        if self.count:
+            self.stats.items += 1
+        return item
+
+
+class IngestPipeline:
+    """
+    Chain of generator stages connected by bounded queues.
+
+    Example::
+
+        pipeline = IngestPipeline(queue_size=8)
+        pipeline.add_stage("convert", lambda _: convert(files))
+        pipeline.add_stage("chunk", chunk_documents)
+        pipeline.run("index", add_to_index)
+        print(pipeline.report())
+    """
+
+    def __init__(self, queue_size: int = 8):
+        """
+        Initialize an empty pipeline.
+
+        Args:
+            queue_size: Maximum items waiting between two stages
+        """
+        self.queue_size = max(1, queue_size)
+        self.stages = []
+        self.stats: List[StageStats] = []
+
+    def add_stage(self, name: str, stage: Callable[[Iterator], Iterable]) -> "IngestPipeline":
+        """
+        Append a stage.
+
+        Args:
+            name: Stage name used in the report
+            stage: Function taking the iterator of the previous stage's items
+                (an empty iterator for the first stage) and returning an
+                iterable of its own items
+
+        Returns:
+            The pipeline, for chaining
+        """
+        self.stages.append((name, stage))
+        return self
+
+    def run(self, sink_name: str, sink: Callable[[Iterator], None]) -> List[StageStats]:
+        """
+        Run every stage and feed the last stage's items to the sink.
+
+        The sink runs in the calling thread. An exception raised by any stage
+        stops the pipeline and is re-raised here.
+
+        Args:
+            sink_name: Sink name used in the report
+            sink: Function consuming the iterator of the last stage's items
+
+        Returns:
+            Stats of every stage, sink last
+        """
+        self.stats = []
+        stop = threading.Event()
+        threads = []
+        items: Iterator = iter(())
+        try:
+            for name, stage in self.stages:
+                stats = StageStats(name)
+                self.stats.append(stats)
+                items = self._start_stage(stage, items, stats, stop, threads)
+
+            sink_stats = StageStats(sink_name)
+            self.stats.append(sink_stats)
+            start = time.perf_counter()
+            sink(_TimedInput(items, sink_stats, count=True))
+            sink_stats.total_seconds = time.perf_counter() - start
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        return self.stats
+
+    def _start_stage(
+        self,
+        stage: Callable[[Iterator], Iterable],
+        upstream: Iterator,
+        stats: StageStats,
+        stop: threading.Event,
+        threads: List[threading.Thread]
+    ) -> Iterator:
+        """Start a stage in a thread and return the iterator over its output queue."""
+        output = queue.Queue(maxsize=self.queue_size)
+
+        def put(item) -> bool:
+            start = time.perf_counter()
+            try:
+                while not stop.is_set():
+                    try:
+                        output.put(item, timeout=0.1)
+                        return True
+                    except queue.Full:
+                        continue
+                return False
+            finally:
+                stats.blocked_seconds += time.perf_counter() - start
+
+        def produce():
+            start = time.perf_counter()
+            try:
+                for item in stage(_TimedInput(upstream, stats)):
+                    stats.items += 1
+                    if not put(item):
+                        return
+                put(_DONE)
+            except _Stopped:
+                pass
+            except BaseException as e:
+                put(_Failure(e))
+            finally:
+                stats.total_seconds = time.perf_counter() - start
+
+        thread = threading.Thread(target=produce, name=f"ingest-{stats.name}", daemon=True)
+        thread.start()
+        threads.append(thread)
+
+        def consume() -> Iterator:
+            while True:
+                try:
+                    item = output.get(timeout=0.1)
+                except queue.Empty:
+                    if stop.is_set():
+                        raise _Stopped()
+                    continue
+                if item is _DONE:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+
+        return consume()
+
+    def report(self) -> str:
+        """Format the stage stats of the last run as a table."""
+        lines = [f"{'stage':<10} {'items':>8} {'busy s':>8} {'wait s':>8} {'blocked s':>10} {'items/s':>9}"]
+        for stats in self.stats:
+            lines.append(
+                f"{stats.name:<10} {stats.items:>8} {stats.busy_seconds:>8.2f} "
+                f"{stats.waiting_seconds:>8.2f} {stats.blocked_seconds:>10.2f} {stats.items_per_second:>9.1f}"
+            )
+        return "\n".join(lines)
@@ -7,6 +7,7 @@ Provides a user-friendly command-line interface for interacting with the RAG sys
 import sys
 import os
 from pathlib import Path
+from ingest_manifest import IngestManifest
 from rag_agent import CVRAGAgent
 import logging
 
@@ -36,7 +37,13 @@ class InteractiveCVRAG:
         if self.agent.initialize_pipeline(rebuild=rebuild):
             self.initialized = True
             print("\n[OK] RAG Agent initialized successfully!")
-            print(f"[OK] Loaded {len(self.agent.documents)} CV documents")
+            # The manifest lists every indexed file; counting sources in the
+            # index would read the whole docstore at startup
+            manifest = IngestManifest.load(self.agent.manifest_path)
+            if manifest.entries:
+                print(f"[OK] Loaded {len(manifest.entries)} CV documents")
+            else:
+                print(f"[OK] Loaded {self.agent.vector_store.index.ntotal} chunks")
             
             if self.agent.vector_store:
                 print(f"[OK] Vector store created with embeddings")
@@ -72,27 +79,32 @@ class InteractiveCVRAG:
         print("-"*80 + "\n")
         
         try:
-            result = self.agent.query(question)
-            print("\nResponse:")
-            print("-"*80)
-            
-            # Extract the final response
-            if isinstance(result, dict):
-                if 'output' in result:
-                    print(result['output'])
-                else:
-                    print(result)
-            else:
-                print(result)
-            
-            print("-"*80)
+            for event in self.agent.query_stream(question):
+                if event["type"] == "sources":
+                    if event["cached"]:
+                        print("Sources: (cached answer)")
+                    else:
+                        print(f"Sources: {', '.join(event['sources']) or 'none'}")
+                    print("\nResponse:")
+                    print("-"*80)
+                elif event["type"] == "token":
+                    print(event["content"], end="", flush=True)
+                elif event["type"] == "done":
+                    print("\n" + "-"*80)
         except Exception as e:
             print(f"\n[ERROR] Error: {str(e)}")
             logger.error(f"Query error: {str(e)}", exc_info=True)
     
     def view_documents(self):
         """Display loaded documents."""
-        if not self.initialized or not self.agent.documents:
+        if not self.initialized or self.agent.vector_store is None:
+            print("No documents loaded.")
+            return
+        
+        # Read from the index: a streaming build keeps no documents in memory
+        metadata_index = self.agent.metadata_index()
+        sources = metadata_index.values("source")
+        if not sources:
             print("No documents loaded.")
             return
         
@@ -100,10 +112,12 @@ class InteractiveCVRAG:
         print("Loaded Documents")
         print("="*80 + "\n")
         
-        for i, doc in enumerate(self.agent.documents, 1):
-            print(f"{i}. {doc.metadata.get('source', 'Unknown')}")
+        for i, source in enumerate(sources, 1):
+            positions = metadata_index.select({"source": source})
+            doc = self.agent.vector_store.docstore.search(next(iter(metadata_index.ids_for(positions[:1]))))
+            print(f"{i}. {source}")
             print(f"   Type: {doc.metadata.get('file_type', 'Unknown')}")
-            print(f"   Content length: {len(doc.page_content)} characters")
+            print(f"   Chunks: {len(positions)}")
             print()
     
     def show_examples(self):
@@ -161,11 +175,19 @@ class InteractiveCVRAG:
                 print("\n[ERROR] Invalid option. Please try again.")
 
 
-def main():
+def main(argv=None):
     """Entry point for the interactive CLI."""
+    import argparse
+    from profiling import add_profile_argument, profile_run
+    
+    parser = argparse.ArgumentParser(description="Interactive CV RAG Agent")
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+    
     try:
-        app = InteractiveCVRAG()
-        app.run()
+        with profile_run(args.profile, "interactive_rag"):
+            app = InteractiveCVRAG()
+            app.run()
     except KeyboardInterrupt:
         print("\n\n[OK] Application interrupted by user. Goodbye!")
     except Exception as e:
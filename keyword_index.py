@@ -0,0 +1,230 @@
+"""
+BM25 Keyword Index
+
+Dense embeddings are good at paraphrases but weak at exact terms such as
+technology names ("Python", "Kubernetes") or certifications ("PMP",
+"AWS Solutions Architect"). This module keeps a BM25 inverted index over the
+chunk texts, saved next to the FAISS index as ``bm25.json``, and fuses keyword
+and vector results with reciprocal rank fusion.
+
+A keyword search needs no embedding call, so keyword-only retrieval costs no
+API round trip at all.
+
+Adding or deleting a few CVs does not rewrite ``bm25.json``: the changes are
+appended to ``bm25.log`` and replayed on load, and the two files are merged
+once the log grows as large as the index itself.
+"""
+
+import heapq
+import json
+import logging
+import math
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+KEYWORD_INDEX_FILENAME = "bm25.json"
+KEYWORD_LOG_FILENAME = "bm25.log"
+FORMAT_VERSION = 1
+
+# Keeps "c++", "c#" and "node.js" style terms together
+_TOKEN_RE = re.compile(r"\w[\w+#]*(?:\.\w+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase terms."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over chunks identified by their chunk IDs.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize an empty index.
+
+        Args:
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self.doc_terms: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+
+    def add(self, ids: Iterable[str], texts: Iterable[str]):
+        """
+        Index chunks, replacing any chunk with the same ID.
+
+        Args:
+            ids: Chunk IDs
+            texts: Chunk texts
+        """
+        for doc_id, text in zip(ids, texts):
+            self._add_terms(doc_id, dict(Counter(tokenize(text))))
+
+    def _add_terms(self, doc_id: str, terms: Dict[str, int]):
+        if doc_id in self.doc_terms:
+            self.remove([doc_id])
+        self.doc_terms[doc_id] = terms
+        self.doc_lengths[doc_id] = sum(terms.values())
+        self.total_length += self.doc_lengths[doc_id]
+        for term, count in terms.items():
+            self.postings[term][doc_id] = count
+
+    def remove(self, ids: Iterable[str]):
+        """Remove chunks from the index, ignoring unknown IDs."""
+        for doc_id in ids:
+            terms = self.doc_terms.pop(doc_id, None)
+            if terms is None:
+                continue
+            self.total_length -= self.doc_lengths.pop(doc_id)
+            for term in terms:
+                posting = self.postings[term]
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+
+    def search(
+        self,
+        query: str,
+        k: int = 4,
+        allowed_ids: Optional[Set[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Return the best-matching chunks for a query.
+
+        Args:
+            query: Query text
+            k: Number of results
+            allowed_ids: If given, only these chunks are considered
+
+        Returns:
+            (chunk ID, BM25 score) pairs, best first; chunks sharing no term
+            with the query are not returned
+        """
+        n_docs = len(self.doc_terms)
+        if not n_docs:
+            return []
+
+        average_length = self.total_length / n_docs
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, count in posting.items():
+                if allowed_ids is not None and doc_id not in allowed_ids:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / average_length)
+                scores[doc_id] += idf * count * (self.k1 + 1) / (count + norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def save(self, folder: str):
+        """Write the index to ``bm25.json`` in a vector store folder."""
+        path = Path(folder) / KEYWORD_INDEX_FILENAME
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": FORMAT_VERSION,
+                "k1": self.k1,
+                "b": self.b,
+                "docs": self.doc_terms,
+            }, f)
+        tmp_path.replace(path)
+        (Path(folder) / KEYWORD_LOG_FILENAME).unlink(missing_ok=True)
+
+    def save_changes(self, folder: str, added_ids: Iterable[str], removed_ids: Iterable[str]):
+        """
+        Persist added and removed chunks by appending them to ``bm25.log``.
+
+        Writes the whole index instead when there is no saved index yet or
+        the log has grown as large as the index file.
+
+        Args:
+            folder: Vector store folder
+            added_ids: IDs of chunks added since the last save
+            removed_ids: IDs of chunks removed since the last save
+        """
+        path = Path(folder) / KEYWORD_INDEX_FILENAME
+        log_path = Path(folder) / KEYWORD_LOG_FILENAME
+        if not path.exists() or (log_path.exists() and log_path.stat().st_size >= path.stat().st_size):
+            self.save(folder)
+            return
+
+        # Removals first, so a replaced chunk ends up with its new terms
+        entry = {
+            "remove": list(removed_ids),
+            "add": {doc_id: self.doc_terms[doc_id] for doc_id in added_ids if doc_id in self.doc_terms},
+        }
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    @classmethod
+    def load(cls, folder: str) -> "BM25Index":
+        """
+        Read the index saved in a vector store folder.
+
+        Raises:
+            FileNotFoundError: If the folder has no keyword index
+            ValueError: If the file was written by an incompatible version
+        """
+        path = Path(folder) / KEYWORD_INDEX_FILENAME
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported keyword index version in {path}")
+
+        index = cls(k1=data["k1"], b=data["b"])
+        for doc_id, terms in data["docs"].items():
+            index._add_terms(doc_id, terms)
+
+        log_path = Path(folder) / KEYWORD_LOG_FILENAME
+        if log_path.exists():
+            with open(log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A write interrupted by a crash leaves a partial last line
+                        logger.warning(f"Ignoring truncated entry in {log_path}")
+                        break
+                    index.remove(entry["remove"])
+                    for doc_id, terms in entry["add"].items():
+                        index._add_terms(doc_id, terms)
+        return index
+
+
+def reciprocal_rank_fusion(result_lists: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Merge ranked ID lists with reciprocal rank fusion.
+
+    Each ID scores ``sum(1 / (k + rank))`` over the lists it appears in, so
+    items ranked well by several retrievers come first without having to
+    compare their incompatible raw scores.
+
+    Args:
+        result_lists: Ranked lists of IDs, best first
+        k: Damping constant (60 is the value from the original paper)
+
+    Returns:
+        (ID, fused score) pairs, best first
+    """
+    scores = defaultdict(float)
+    for results in result_lists:
+        for rank, doc_id in enumerate(results, 1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
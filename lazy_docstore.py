@@ -0,0 +1,347 @@
+"""
+Lazy, Read-Only Vector Store Loading
+
+``FAISS.load_local`` reads the whole index into memory and unpickles the
+whole docstore before the first query. This module supports a faster load
+mode for serving:
+
+- The FAISS index is memory-mapped read-only, so loading is near-instant and
+  processes on the same host share its pages through the OS page cache.
+- Chunk texts and metadata live in a SQLite file (``docstore.sqlite``) written
+  next to the index. Only the chunks a search returns are read from it.
+
+The SQLite docstore is written on every save, so any saved store can be
+opened in either mode. After adding, replacing or deleting CVs only the
+changed rows are written (update_sqlite_docstore), and the in-memory load
+mode reads the chunks back from the same file.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+DOCSTORE_FILENAME = "docstore.sqlite"
+
+
+def write_sqlite_docstore(folder: str, docstore: Docstore, index_to_docstore_id: Dict[int, str]):
+    """
+    Write the chunks of a vector store to ``docstore.sqlite``.
+
+    The file is written under a temporary name and renamed, so readers never
+    see a partial file.
+
+    Args:
+        folder: Vector store folder
+        docstore: Docstore holding the chunk documents
+        index_to_docstore_id: Mapping of FAISS position to chunk ID
+    """
+    path = Path(folder) / DOCSTORE_FILENAME
+    tmp_path = path.with_suffix(".sqlite.tmp")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path.unlink(missing_ok=True)
+
+    conn = sqlite3.connect(str(tmp_path))
+    try:
+        conn.execute(
+            "CREATE TABLE docs ("
+            " position INTEGER PRIMARY KEY,"
+            " id TEXT NOT NULL UNIQUE,"
+            " page_content TEXT NOT NULL,"
+            " metadata TEXT NOT NULL)"
+        )
+        rows = []
+        for position, doc_id in index_to_docstore_id.items():
+            doc = docstore.search(doc_id)
+            if not isinstance(doc, Document):
+                raise ValueError(f"Could not find document for id {doc_id}")
+            rows.append((int(position), doc_id, doc.page_content, json.dumps(doc.metadata)))
+        conn.executemany("INSERT INTO docs VALUES (?, ?, ?, ?)", rows)
+        conn.commit()
+    finally:
+        conn.close()
+    tmp_path.replace(path)
+
+
+def update_sqlite_docstore(
+    folder: str,
+    docstore: Docstore,
+    index_to_docstore_id: Dict[int, str],
+    added_ids: Iterable[str],
+    removed_ids: Iterable[str]
+):
+    """
+    Apply added and removed chunks to an existing ``docstore.sqlite``.
+
+    Deleting vectors compacts the FAISS positions of the chunks behind them,
+    so stored positions that no longer match index_to_docstore_id are
+    rewritten as well (only the integers, not the texts). All changes are
+    applied in one transaction. Writes the whole file if it does not exist.
+
+    Args:
+        folder: Vector store folder
+        docstore: Docstore holding the chunk documents
+        index_to_docstore_id: Mapping of FAISS position to chunk ID after the changes
+        added_ids: IDs of chunks added since the file was written
+        removed_ids: IDs of chunks removed since the file was written
+    """
+    path = Path(folder) / DOCSTORE_FILENAME
+    if not path.exists():
+        write_sqlite_docstore(folder, docstore, index_to_docstore_id)
+        return
+
+    positions = {doc_id: int(position) for position, doc_id in index_to_docstore_id.items()}
+    added_ids = [doc_id for doc_id in dict.fromkeys(added_ids) if doc_id in positions]
+    conn = sqlite3.connect(str(path))
+    try:
+        conn.executemany(
+            "DELETE FROM docs WHERE id = ?",
+            [(doc_id,) for doc_id in set(removed_ids) | set(added_ids)]
+        )
+        moved = [
+            (positions[doc_id], doc_id)
+            for position, doc_id in conn.execute("SELECT position, id FROM docs")
+            if positions.get(doc_id, position) != position
+        ]
+        # Two passes through negative positions, so no move collides with a
+        # row that has not moved yet
+        conn.executemany("UPDATE docs SET position = ? WHERE id = ?", [(-1 - new, doc_id) for new, doc_id in moved])
+        conn.execute("UPDATE docs SET position = -1 - position WHERE position < 0")
+
+        rows = []
+        for doc_id in added_ids:
+            doc = docstore.search(doc_id)
+            if not isinstance(doc, Document):
+                raise ValueError(f"Could not find document for id {doc_id}")
+            rows.append((positions[doc_id], doc_id, doc.page_content, json.dumps(doc.metadata)))
+        conn.executemany("INSERT INTO docs VALUES (?, ?, ?, ?)", rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def read_sqlite_docstore(folder: str) -> Tuple[Dict[str, Document], Dict[int, str]]:
+    """
+    Read every chunk of ``docstore.sqlite`` into memory.
+
+    Args:
+        folder: Vector store folder
+
+    Returns:
+        (documents by chunk ID, mapping of FAISS position to chunk ID)
+    """
+    conn = sqlite3.connect(f"{(Path(folder) / DOCSTORE_FILENAME).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        documents = {}
+        index_to_docstore_id = {}
+        for position, doc_id, page_content, metadata in conn.execute(
+            "SELECT position, id, page_content, metadata FROM docs ORDER BY position"
+        ):
+            documents[doc_id] = Document(id=doc_id, page_content=page_content, metadata=json.loads(metadata))
+            index_to_docstore_id[position] = doc_id
+    finally:
+        conn.close()
+    return documents, index_to_docstore_id
+
+
+class SQLiteDocstore(Docstore):
+    """
+    Read-only docstore that reads chunks from ``docstore.sqlite`` on demand.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open the docstore.
+
+        Args:
+            path: SQLite file written by write_sqlite_docstore
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            f"{self.path.resolve().as_uri()}?mode=ro",
+            uri=True,
+            check_same_thread=False
+        )
+
+    def search(self, search: str) -> Union[str, Document]:
+        """Return the document with the given ID, or a message if it is missing."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, page_content, metadata FROM docs WHERE id = ?", (search,)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=row[0], page_content=row[1], metadata=json.loads(row[2]))
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        raise ValueError("The memory-mapped vector store is read-only")
+
+    def delete(self, ids: list) -> None:
+        raise ValueError("The memory-mapped vector store is read-only")
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+class LazyIndexMapping(Mapping):
+    """
+    Read-only FAISS position -> chunk ID mapping backed by a SQLiteDocstore.
+    """
+
+    def __init__(self, docstore: SQLiteDocstore):
+        self.docstore = docstore
+
+    def _query(self, sql: str, params: tuple = ()):
+        with self.docstore._lock:
+            return self.docstore._conn.execute(sql, params).fetchall()
+
+    def __getitem__(self, position: int) -> str:
+        rows = self._query("SELECT id FROM docs WHERE position = ?", (int(position),))
+        if not rows:
+            raise KeyError(position)
+        return rows[0][0]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter([row[0] for row in self._query("SELECT position FROM docs ORDER BY position")])
+
+    def __len__(self) -> int:
+        return self._query("SELECT COUNT(*) FROM docs")[0][0]
+
+    def values(self):
+        return [row[0] for row in self._query("SELECT id FROM docs ORDER BY position")]
+
+    def positions_of(self, ids: List[str]) -> Dict[str, int]:
+        """Return the positions of the given chunk IDs (unknown IDs are left out)."""
+        positions = {}
+        ids = list(ids)
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            positions.update(self._query(f"SELECT id, position FROM docs WHERE id IN ({placeholders})", tuple(batch)))
+        return positions
+
+    def items(self):
+        return self._query("SELECT position, id FROM docs ORDER BY position")
+
+
+class SQLiteMetadataIndex:
+    """
+    MetadataIndex counterpart that answers filters from ``docstore.sqlite``.
+
+    Building a MetadataIndex over a memory-mapped store would read every
+    chunk; this class instead resolves each filter with one SQL query on the
+    ``metadata`` column, so scoped questions cost no start-up scan.
+    """
+
+    def __init__(self, docstore: SQLiteDocstore):
+        self.docstore = docstore
+
+    def _query(self, sql: str, params: tuple = ()):
+        with self.docstore._lock:
+            return self.docstore._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _path(field: str) -> str:
+        return '$."' + field.replace('"', '\\"') + '"'
+
+    def __len__(self) -> int:
+        return self._query("SELECT COUNT(*) FROM docs")[0][0]
+
+    def _has_field(self, field: str) -> bool:
+        return bool(self._query(
+            "SELECT 1 FROM docs WHERE json_type(metadata, ?) = 'text' LIMIT 1", (self._path(field),)
+        ))
+
+    def fields(self) -> List[str]:
+        """Return the metadata fields that can be filtered on."""
+        rows = self._query(
+            "SELECT DISTINCT json_each.key FROM docs, json_each(docs.metadata) "
+            "WHERE json_each.type = 'text' ORDER BY json_each.key"
+        )
+        return [row[0] for row in rows]
+
+    def values(self, field: str) -> List[str]:
+        """Return the distinct values of a field."""
+        rows = self._query(
+            "SELECT DISTINCT json_extract(metadata, ?1) AS value FROM docs "
+            "WHERE json_type(metadata, ?1) = 'text' ORDER BY value",
+            (self._path(field),)
+        )
+        return [row[0] for row in rows]
+
+    def select(self, filter: Dict[str, Any]) -> np.ndarray:
+        """
+        Resolve a filter to the FAISS positions of matching chunks.
+
+        Same semantics as MetadataIndex.select.
+
+        Raises:
+            ValueError: If a field is not indexed
+        """
+        clauses, params = [], []
+        for field, wanted in filter.items():
+            if not self._has_field(field):
+                raise ValueError(
+                    f"Cannot filter on '{field}'. Indexed fields: {', '.join(self.fields())}"
+                )
+            values = [value for value in (wanted if isinstance(wanted, (list, tuple, set)) else [wanted])
+                      if isinstance(value, str)]
+            if not values:
+                return np.array([], dtype=np.int64)
+            clauses.append(
+                f"(json_type(metadata, ?) = 'text' AND json_extract(metadata, ?) IN ({','.join('?' * len(values))}))"
+            )
+            params.extend([self._path(field), self._path(field), *values])
+        rows = self._query(
+            f"SELECT position FROM docs WHERE {' AND '.join(clauses) or '1'} ORDER BY position", tuple(params)
+        )
+        return np.array([row[0] for row in rows], dtype=np.int64)
+
+    def ids_for(self, positions: Iterable[int]) -> Set[str]:
+        """Return the chunk IDs at the given positions."""
+        ids = set()
+        positions = [int(position) for position in positions]
+        for start in range(0, len(positions), 500):
+            batch = positions[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            ids.update(row[0] for row in self._query(f"SELECT id FROM docs WHERE position IN ({placeholders})", tuple(batch)))
+        return ids
+
+    def position_of(self, doc_id: str) -> Optional[int]:
+        """Return the FAISS position of a chunk ID, or None if it is unknown."""
+        rows = self._query("SELECT position FROM docs WHERE id = ?", (doc_id,))
+        return rows[0][0] if rows else None
+
+
+def read_index_mmap(index_path: str):
+    """
+    Memory-map a FAISS index file read-only.
+
+    Flat and HNSW vectors are mapped without copying. Index types whose
+    storage cannot be mapped that way are read with the plain mmap reader.
+
+    Args:
+        index_path: Path of ``index.faiss``
+
+    Returns:
+        faiss.Index
+    """
+    import faiss
+
+    try:
+        return faiss.read_index(index_path, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError as e:
+        logger.debug(f"Zero-copy mapping not supported ({str(e)}), using the mmap reader")
+        return faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
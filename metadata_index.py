@@ -0,0 +1,144 @@
+"""
+Metadata Index for Filtered Retrieval
+
+Questions are often scoped to one candidate ("What did Jane do at Acme?") or
+to one group of uploads. Filtering the k hits of a plain vector search after
+the fact wastes most of them on other CVs and can return nothing at all.
+
+This module maps string metadata values (``source``, ``file_path``,
+``file_type``, ...) to the FAISS positions of the chunks that carry them.
+A filter is resolved to the set of allowed positions before the search runs,
+and FAISS only considers those vectors (``IDSelectorBatch``), so scoped
+questions get k results from the right CVs no matter how large the corpus is.
+
+The index is built once per loaded store and then kept up to date as single
+CVs are added, replaced or deleted, so scoped questions never wait for a
+rebuild. Read-only memory-mapped stores use ``SQLiteMetadataIndex`` (see
+lazy_docstore), which answers the same queries from ``docstore.sqlite``.
+"""
+
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+class MetadataIndex:
+    """
+    Inverted index from (metadata field, value) to FAISS positions.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, Set[int]]] = defaultdict(lambda: defaultdict(set))
+        self.ids_by_position: Dict[int, str] = {}
+        self.positions_by_id: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids_by_position)
+
+    @classmethod
+    def build(cls, index_to_docstore_id: Mapping[int, str], docstore) -> "MetadataIndex":
+        """
+        Build the index from a LangChain FAISS store's position mapping and docstore.
+
+        Args:
+            index_to_docstore_id: Mapping of FAISS position to chunk ID
+            docstore: Docstore returning the chunk Document of an ID
+        """
+        metadata_index = cls()
+        for position, doc_id in index_to_docstore_id.items():
+            doc = docstore.search(doc_id)
+            if isinstance(doc, Document):
+                metadata_index.add(position, doc_id, doc.metadata)
+        return metadata_index
+
+    def add(self, position: int, doc_id: str, metadata: Dict[str, Any]):
+        """Index the string metadata values of one chunk."""
+        self.ids_by_position[int(position)] = doc_id
+        self.positions_by_id[doc_id] = int(position)
+        for field, value in metadata.items():
+            if isinstance(value, str):
+                self.postings[field][value].add(int(position))
+
+    def remove(self, doc_ids: Iterable[str]):
+        """
+        Drop chunks from the index.
+
+        Positions after the removed ones shift down to stay aligned with
+        FAISS, which compacts the index when vectors are deleted.
+        """
+        removed = sorted(self.positions_by_id.pop(doc_id) for doc_id in doc_ids if doc_id in self.positions_by_id)
+        if not removed:
+            return
+        removed = np.array(removed, dtype=np.int64)
+
+        def shift(positions: Set[int]) -> Set[int]:
+            kept = np.array(sorted(positions), dtype=np.int64)
+            kept = kept[~np.isin(kept, removed)]
+            return set((kept - np.searchsorted(removed, kept)).tolist())
+
+        for field in list(self.postings):
+            values = self.postings[field]
+            for value in list(values):
+                values[value] = shift(values[value])
+                if not values[value]:
+                    del values[value]
+            if not values:
+                del self.postings[field]
+
+        positions = np.array(sorted(self.ids_by_position), dtype=np.int64)
+        ids = [self.ids_by_position[int(position)] for position in positions]
+        mask = ~np.isin(positions, removed)
+        positions = (positions - np.searchsorted(removed, positions))[mask].tolist()
+        ids = [doc_id for doc_id, keep in zip(ids, mask) if keep]
+        self.ids_by_position = dict(zip(positions, ids))
+        self.positions_by_id = dict(zip(ids, positions))
+
+    def fields(self) -> List[str]:
+        """Return the metadata fields that can be filtered on."""
+        return sorted(self.postings)
+
+    def values(self, field: str) -> List[str]:
+        """Return the distinct values of a field."""
+        return sorted(self.postings.get(field, {}))
+
+    def select(self, filter: Dict[str, Any]) -> np.ndarray:
+        """
+        Resolve a filter to the FAISS positions of matching chunks.
+
+        Fields are combined with AND; a list of values for one field matches
+        any of them.
+
+        Args:
+            filter: Mapping of field to a value or a list of values,
+                e.g. {"source": ["jane.pdf", "john.pdf"], "file_type": ".pdf"}
+
+        Returns:
+            Sorted int64 array of positions
+
+        Raises:
+            ValueError: If a field is not indexed
+        """
+        selected: Optional[Set[int]] = None
+        for field, wanted in filter.items():
+            if field not in self.postings:
+                raise ValueError(
+                    f"Cannot filter on '{field}'. Indexed fields: {', '.join(self.fields())}"
+                )
+            values = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+            matches = set()
+            for value in values:
+                matches |= self.postings[field].get(value, set())
+            selected = matches if selected is None else selected & matches
+            if not selected:
+                break
+        return np.array(sorted(selected or ()), dtype=np.int64)
+
+    def ids_for(self, positions: Iterable[int]) -> Set[str]:
+        """Return the chunk IDs at the given positions."""
+        return {self.ids_by_position[int(position)] for position in positions}
+
+    def position_of(self, doc_id: str) -> Optional[int]:
+        """Return the FAISS position of a chunk ID, or None if it is unknown."""
+        return self.positions_by_id.get(doc_id)
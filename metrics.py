@@ -0,0 +1,359 @@
+"""
+Pipeline Metrics and Tracing
+
+Log lines alone do not tell whether a slow answer came from the query
+embedding, the FAISS search or the LLM call. This module provides a small
+thread-safe metrics registry:
+
+- ``span(name)`` times a block. Spans nest (the parent is tracked per thread
+  and per asyncio task), are kept in a bounded buffer of recent spans, and
+  feed the ``rag_stage_duration_seconds`` histogram labelled by stage.
+- Counters and gauges, e.g. LLM calls and prompt/response characters and
+  tokens (``llm_usage_callback`` records them for any LangChain LLM call,
+  using the token counts the model reports, or an estimate if it reports
+  none).
+
+The registry is dumped with ``to_json()`` or ``to_prometheus()`` (Prometheus
+text exposition format). Components record into ``default_registry`` unless
+given their own.
+
+Spans opened inside a generator stay open across its yields, and each
+``next()`` may run in another context (``asyncio.to_thread`` copies one per
+call); ``iter_in_context`` runs the generator in one context of its own so
+those spans nest and close correctly.
+
+Span listeners (``add_span_listener``) are told when any span starts and
+finishes; the profiler uses them to attribute peak memory to stages.
+"""
+
+import contextvars
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_DURATION = "rag_stage_duration_seconds"
+
+# Average characters per token, used when a model reports no token counts
+CHARS_PER_TOKEN = 4
+
+_HELP = {
+    STAGE_DURATION: "Duration of pipeline stages",
+    "rag_llm_calls_total": "LLM calls",
+    "rag_llm_prompt_characters_total": "Characters sent to the LLM",
+    "rag_llm_response_characters_total": "Characters received from the LLM",
+    "rag_llm_prompt_tokens_total": "Prompt tokens (reported by the model, else estimated)",
+    "rag_llm_response_tokens_total": "Response tokens (reported by the model, else estimated)",
+    "rag_llm_estimated_token_calls_total": "LLM calls whose token counts were estimated",
+    "rag_queries_total": "Answered questions by answer cache outcome",
+    "rag_ingest_stage_items": "Items produced by each stage of the last streaming build",
+    "rag_ingest_stage_busy_seconds": "Working time of each stage of the last streaming build",
+    "rag_ingest_stage_waiting_seconds": "Time each stage of the last streaming build waited for input",
+    "rag_ingest_stage_blocked_seconds": "Time each stage of the last streaming build was blocked by a full queue",
+}
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+# Objects with span_started(record) and span_finished(record) methods,
+# notified for the spans of every registry. Empty unless profiling.
+_span_listeners: tuple = ()
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class MetricsRegistry:
+    """
+    Thread-safe store of counters, gauges, histograms and recent spans.
+    """
+
+    def __init__(self, max_spans: int = 1000, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Initialize an empty registry.
+
+        Args:
+            max_spans: Number of finished spans kept for inspection
+            buckets: Upper bounds (seconds) of the histogram buckets
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, dict]] = {}
+        self._help: Dict[str, str] = dict(_HELP)
+        self._spans = deque(maxlen=max_spans)
+
+    def describe(self, name: str, help_text: str):
+        """Set the help text of a metric."""
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        """Add to a counter."""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels):
+        """Set a gauge."""
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """Add an observation to a histogram."""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = {"count": 0, "sum": 0.0, "buckets": [0] * len(self.buckets)}
+            histogram["count"] += 1
+            histogram["sum"] += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+
+    def counter_value(self, name: str, **labels) -> float:
+        """Return the current value of a counter (0 if never incremented)."""
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0.0)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[dict]:
+        """
+        Time a block as a pipeline stage.
+
+        The yielded record can be given more attributes inside the block.
+        An exception escaping the block is recorded on the span and re-raised.
+
+        Args:
+            name: Stage name, used as the ``stage`` label of the duration histogram
+            **attributes: Extra fields stored on the span record
+        """
+        parent = _current_span.get()
+        record = {
+            "name": name,
+            "trace_id": parent["trace_id"] if parent else uuid.uuid4().hex[:16],
+            "span_id": uuid.uuid4().hex[:16],
+            "parent_id": parent["span_id"] if parent else None,
+            "start": time.time(),
+            "attributes": dict(attributes),
+        }
+        listeners = _span_listeners
+        for listener in listeners:
+            listener.span_started(record)
+        token = _current_span.set(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            _current_span.reset(token)
+            record["duration_ms"] = round(duration * 1000, 3)
+            for listener in listeners:
+                listener.span_finished(record)
+            self.observe(STAGE_DURATION, duration, stage=name)
+            with self._lock:
+                self._spans.append(record)
+
+    def spans(self, name: Optional[str] = None) -> List[dict]:
+        """Return the recent finished spans, oldest first, optionally of one stage."""
+        with self._lock:
+            return [dict(span) for span in self._spans if name is None or span["name"] == name]
+
+    def record_llm_usage(
+        self,
+        operation: str,
+        prompt_chars: int,
+        response_chars: int,
+        input_tokens: Optional[int] = None,
+        output_tokens: Optional[int] = None
+    ):
+        """
+        Count one LLM call with its prompt and response sizes.
+
+        Args:
+            operation: Caller label (e.g. "query", "analyze_cv")
+            prompt_chars: Characters sent
+            response_chars: Characters received
+            input_tokens: Prompt tokens reported by the model (estimated if None)
+            output_tokens: Response tokens reported by the model (estimated if None)
+        """
+        estimated = input_tokens is None or output_tokens is None
+        if input_tokens is None:
+            input_tokens = -(-prompt_chars // CHARS_PER_TOKEN)
+        if output_tokens is None:
+            output_tokens = -(-response_chars // CHARS_PER_TOKEN)
+        self.inc("rag_llm_calls_total", operation=operation)
+        self.inc("rag_llm_prompt_characters_total", prompt_chars, operation=operation)
+        self.inc("rag_llm_response_characters_total", response_chars, operation=operation)
+        self.inc("rag_llm_prompt_tokens_total", input_tokens, operation=operation)
+        self.inc("rag_llm_response_tokens_total", output_tokens, operation=operation)
+        if estimated:
+            self.inc("rag_llm_estimated_token_calls_total", operation=operation)
+
+    def reset(self):
+        """Drop every metric and span."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+            self._spans.clear()
+
+    def to_dict(self) -> dict:
+        """Return every metric and the recent spans as plain data."""
+        def series(metrics: Dict[str, Dict[LabelKey, object]]) -> dict:
+            return {
+                name: [{"labels": dict(key), "value": value} for key, value in values.items()]
+                for name, values in metrics.items()
+            }
+
+        with self._lock:
+            histograms = {
+                name: [
+                    {
+                        "labels": dict(key),
+                        "count": histogram["count"],
+                        "sum": histogram["sum"],
+                        "buckets": dict(zip((str(bound) for bound in self.buckets), histogram["buckets"])),
+                    }
+                    for key, histogram in values.items()
+                ]
+                for name, values in self._histograms.items()
+            }
+            return {
+                "counters": series(self._counters),
+                "gauges": series(self._gauges),
+                "histograms": histograms,
+                "spans": [dict(span) for span in self._spans],
+            }
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        """Dump the registry as JSON."""
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_prometheus(self) -> str:
+        """Dump the metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def header(name: str, kind: str):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for name, values in sorted(self._counters.items()):
+                header(name, "counter")
+                lines += [f"{name}{_format_labels(key)} {value:g}" for key, value in values.items()]
+            for name, values in sorted(self._gauges.items()):
+                header(name, "gauge")
+                lines += [f"{name}{_format_labels(key)} {value:g}" for key, value in values.items()]
+            for name, values in sorted(self._histograms.items()):
+                header(name, "histogram")
+                for key, histogram in values.items():
+                    for bound, count in zip(self.buckets, histogram["buckets"]):
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', f'{bound:g}'))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {histogram['count']}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram['sum']:g}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def llm_usage_callback(registry: MetricsRegistry, operation: str):
+    """
+    Create a LangChain callback handler that records LLM usage in a registry.
+
+    Pass it as ``config={"callbacks": [handler]}`` to ``invoke``/``stream``.
+    Create one handler per call.
+
+    Args:
+        registry: Registry receiving the counters
+        operation: Caller label
+    """
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class UsageCallback(BaseCallbackHandler):
+        def __init__(self):
+            self.prompt_chars = 0
+
+        def on_llm_start(self, serialized, prompts, **kwargs):
+            self.prompt_chars = sum(len(prompt) for prompt in prompts)
+
+        def on_chat_model_start(self, serialized, messages, **kwargs):
+            self.prompt_chars = sum(len(str(message.content)) for batch in messages for message in batch)
+
+        def on_llm_end(self, response, **kwargs):
+            generations = [generation for batch in response.generations for generation in batch]
+            response_chars = sum(len(generation.text) for generation in generations)
+            usage = None
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+            registry.record_llm_usage(
+                operation,
+                self.prompt_chars,
+                response_chars,
+                usage.get("input_tokens") if usage else None,
+                usage.get("output_tokens") if usage else None
+            )
+
+    return UsageCallback()
+
+
+def iter_in_context(iterator: Iterator[T]) -> Iterator[T]:
+    """
+    Drive a generator in one private context, whichever thread resumes it.
+
+    The context is copied from the first caller, so spans of the generator
+    nest under the caller's current span.
+
+    Args:
+        iterator: Generator that opens spans across its yields
+    """
+    context = contextvars.copy_context()
+    try:
+        while True:
+            try:
+                item = context.run(next, iterator)
+            except StopIteration:
+                return
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            context.run(close)
+
+
+def add_span_listener(listener):
+    """Notify a listener of every span start and finish (see _span_listeners)."""
+    global _span_listeners
+    _span_listeners = _span_listeners + (listener,)
+
+
+def remove_span_listener(listener):
+    """Stop notifying a listener added with add_span_listener."""
+    global _span_listeners
+    _span_listeners = tuple(existing for existing in _span_listeners if existing is not listener)
+
+
+default_registry = MetricsRegistry()
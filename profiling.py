@@ -0,0 +1,267 @@
+"""
+Profiling Mode for the CLI Entry Points
+
+Finding out why ingestion is slow on one folder used to mean editing the code
+to wrap it in cProfile. ``--profile DIR`` on the ``rag_agent``,
+``interactive_rag`` and ``cv_analyzer`` entry points records, for the whole
+run:
+
+- ``<name>.pstats`` / ``<name>.txt``: a cProfile profile of the main thread
+  (open the first with ``python -m pstats`` or snakeviz; the second lists
+  the top functions by cumulative time);
+- ``<name>.collapsed``: stacks of every thread sampled at a fixed interval,
+  one ``frame;frame;frame count`` line per distinct stack, for flamegraph.pl
+  or speedscope. cProfile only sees the thread that started it; the sampler
+  also covers the conversion, embedding and indexing threads of a
+  streaming build;
+- ``<name>.memory.json``: tracemalloc peak memory of each pipeline stage
+  (every metrics span, see metrics), with the top allocation sites at the
+  stage's highest peak.
+
+Without ``--profile`` no profiler is started and cProfile, pstats and
+tracemalloc are not even imported: the only cost left in the pipeline is the
+empty listener check in ``metrics.span``.
+"""
+
+import json
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Dict, Optional
+
+import metrics
+
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+# Allocation sites kept per stage in the memory report
+TOP_ALLOCATIONS = 10
+
+
+def add_profile_argument(parser):
+    """Add the ``--profile [DIR]`` option to an argparse parser."""
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="profile",
+        metavar="DIR",
+        help="Write CPU profiles, sampled stacks and per-stage peak memory to DIR (default: profile)"
+    )
+
+
+def profile_run(output_dir: Optional[str], name: str):
+    """
+    Return a context manager profiling the block if output_dir is set.
+
+    Args:
+        output_dir: Folder receiving the profile files; None disables profiling
+        name: File name prefix, usually the entry point's name
+
+    Returns:
+        A Profiler, or a no-op context manager
+    """
+    if not output_dir:
+        return nullcontext()
+    return Profiler(output_dir, name)
+
+
+class _StackSampler(threading.Thread):
+    """Thread counting the stacks of every other thread at a fixed interval."""
+
+    def __init__(self, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class _StageMemory:
+    """
+    Span listener recording the tracemalloc peak of every stage.
+
+    tracemalloc has a single process-wide peak, so whenever a span starts or
+    finishes the peak reached so far is folded into every open span before
+    the peak is reset. Each span thus gets the highest traced memory seen
+    while it was open, nested spans included. Spans running concurrently in
+    other threads count towards each other's peaks.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.open: Dict[str, dict] = {}
+        self.stages: Dict[str, dict] = {}
+
+    def _fold_peak(self):
+        import tracemalloc
+
+        _, peak = tracemalloc.get_traced_memory()
+        for frame in self.open.values():
+            frame["peak"] = max(frame["peak"], peak)
+        tracemalloc.reset_peak()
+
+    def span_started(self, record: dict):
+        import tracemalloc
+
+        with self.lock:
+            self._fold_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            self.open[record["span_id"]] = {"start": current, "peak": current}
+
+    def span_finished(self, record: dict):
+        import tracemalloc
+
+        with self.lock:
+            self._fold_peak()
+            frame = self.open.pop(record["span_id"], None)
+            if frame is None:
+                return
+            stage = self.stages.setdefault(
+                record["name"], {"calls": 0, "peak_bytes": 0, "peak_growth_bytes": 0, "top_allocations": []}
+            )
+            stage["calls"] += 1
+            stage["peak_growth_bytes"] = max(stage["peak_growth_bytes"], frame["peak"] - frame["start"])
+            if frame["peak"] > stage["peak_bytes"]:
+                stage["peak_bytes"] = frame["peak"]
+                # Allocations still alive at the end of the stage's highest run
+                statistics = tracemalloc.take_snapshot().statistics("lineno")[:TOP_ALLOCATIONS]
+                stage["top_allocations"] = [
+                    {"site": str(stat.traceback), "bytes": stat.size, "blocks": stat.count}
+                    for stat in statistics
+                ]
+
+
+class Profiler:
+    """
+    CPU, stack-sampling and per-stage memory profiler for one run.
+
+    Example::
+
+        with Profiler("profile", "rag_agent"):
+            agent.initialize_pipeline()
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        name: str = "profile",
+        sample_interval: float = DEFAULT_SAMPLE_INTERVAL,
+        trace_memory: bool = True
+    ):
+        """
+        Initialize the profiler.
+
+        Args:
+            output_dir: Folder receiving the profile files
+            name: File name prefix
+            sample_interval: Seconds between two stack samples
+            trace_memory: Whether to trace allocations per stage (tracemalloc
+                slows allocation-heavy code down noticeably)
+        """
+        self.output_dir = Path(output_dir)
+        self.name = name
+        self.sample_interval = sample_interval
+        self.trace_memory = trace_memory
+        self._profile = None
+        self._sampler = None
+        self._memory = None
+        self._started_tracemalloc = False
+        self.paths: Dict[str, str] = {}
+
+    def start(self):
+        """Start the CPU profile, the stack sampler and memory tracing."""
+        import cProfile
+        import tracemalloc
+
+        if self.trace_memory:
+            self._started_tracemalloc = not tracemalloc.is_tracing()
+            if self._started_tracemalloc:
+                tracemalloc.start()
+            self._memory = _StageMemory()
+            metrics.add_span_listener(self._memory)
+        self._sampler = _StackSampler(self.sample_interval)
+        self._sampler.start()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def stop(self) -> Dict[str, str]:
+        """
+        Stop profiling and write the profile files.
+
+        Returns:
+            Mapping of profile kind ("pstats", "text", "collapsed", "memory")
+            to the written file
+        """
+        import io
+        import pstats
+        import tracemalloc
+
+        self._profile.disable()
+        self._sampler.stop()
+        if self._memory is not None:
+            metrics.remove_span_listener(self._memory)
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        prefix = self.output_dir / self.name
+
+        self.paths["pstats"] = f"{prefix}.pstats"
+        self._profile.dump_stats(self.paths["pstats"])
+
+        text = io.StringIO()
+        pstats.Stats(self._profile, stream=text).sort_stats("cumulative").print_stats(40)
+        self.paths["text"] = f"{prefix}.txt"
+        Path(self.paths["text"]).write_text(text.getvalue(), encoding="utf-8")
+
+        self.paths["collapsed"] = f"{prefix}.collapsed"
+        with open(self.paths["collapsed"], "w", encoding="utf-8") as f:
+            for stack, count in self._sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        if self._memory is not None:
+            self.paths["memory"] = f"{prefix}.memory.json"
+            with open(self.paths["memory"], "w", encoding="utf-8") as f:
+                json.dump(self._memory.stages, f, indent=2)
+        return self.paths
+
+    def report(self) -> str:
+        """Format the written files and the per-stage peak memory as text."""
+        lines = [f"Profile written to {self.output_dir}:"]
+        lines += [f"  {kind:<10} {path}" for kind, path in self.paths.items()]
+        if self._memory is not None and self._memory.stages:
+            lines.append(f"\n{'stage':<24} {'calls':>6} {'peak MB':>9} {'growth MB':>10}")
+            stages = sorted(self._memory.stages.items(), key=lambda item: -item[1]["peak_bytes"])
+            for name, stage in stages:
+                lines.append(
+                    f"{name:<24} {stage['calls']:>6} {stage['peak_bytes'] / 2**20:>9.1f} "
+                    f"{stage['peak_growth_bytes'] / 2**20:>10.1f}"
+                )
+        return "\n".join(lines)
+
+    def __enter__(self) -> "Profiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        print(self.report())
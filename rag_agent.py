@@ -18,17 +18,49 @@ COSTAR Framework Application:
 """
 
 import os
+import asyncio
 import logging
+import shutil
+import threading
+from functools import cached_property
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+import numpy as np
 from dotenv import load_dotenv
 
-from markitdown import MarkItDown
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
 from langchain_core.documents import Document
-from langchain_community.vectorstores import FAISS
-from langchain_core.tools import tool
+
+from answer_cache import SemanticAnswerCache
+from context_packing import format_passage, pack_context
+from conversion_cache import ConversionCache, DEFAULT_CACHE_DIR
+from document_conversion import iter_convert_files
+from embedding_backends import (
+    check_embedding_info,
+    create_embeddings,
+    model_name,
+    resolve_backend_name,
+    save_embedding_info,
+)
+from embedding_cache import CachedEmbeddings, EmbeddingCache, DEFAULT_EMBEDDING_CACHE_PATH
+from embedding_engine import BatchEmbedder, is_quota_error
+from index_factory import (
+    build_index,
+    configure_search,
+    filtered_search,
+    reconstruct_vectors,
+    supports_removal,
+    training_sample_size,
+)
+from ingest_manifest import IngestManifest, MANIFEST_FILENAME, file_sha256
+from ingest_pipeline import IngestPipeline
+from keyword_index import BM25Index, reciprocal_rank_fusion
+from metadata_index import MetadataIndex
+from metrics import MetricsRegistry, default_registry, iter_in_context, llm_usage_callback
+
+# MarkItDown, the text splitter, the Google clients, FAISS and the LangChain
+# vector store take seconds to import, so they are imported on first use
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import FAISS
 
 # Configure logging
 logging.basicConfig(
@@ -40,6 +72,27 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+SUPPORTED_EXTENSIONS = {'.pdf', '.docx', '.doc'}
+
+RETRIEVAL_MODES = ("hybrid", "dense", "keyword")
+
+SYSTEM_PROMPT = """You are a professional CV Analyst assistant. Your role is to help analyze and understand information from CV documents.
+
+COSTAR Framework Guidelines:
+- **Context**: You have access to a database of CV documents
+- **Objective**: Provide accurate, detailed answers about candidate qualifications, experience, and skills
+- **Style**: Professional, structured, and clear
+- **Tone**: Helpful, impartial, and informative
+- **Audience**: HR professionals, recruiters, and hiring managers
+- **Response**: Detailed, evidence-based answers with specific references to CV content
+
+When answering questions:
+1. Provide accurate information based on the retrieved documents
+2. Always cite the source CV when providing information
+3. Provide specific examples from the documents
+4. Be objective and factual
+5. If information is not available, clearly state that"""
+
 
 class CVRAGAgent:
     """
@@ -48,7 +101,7 @@ class CVRAGAgent:
     This class handles:
     - Document loading from a folder using MarkItDown
     - Document chunking
-    - Embedding generation with Google AI
+    - Embedding generation with a configurable backend (Google AI or local)
     - Vector store management with FAISS
     - RAG-based question answering
     """
@@ -58,7 +111,33 @@ class CVRAGAgent:
         cv_folder: str = "cv",
         chunk_size: int = 1000,
         chunk_overlap: int = 200,
-        vector_store_path: str = "cv_vector_store"
+        vector_store_path: str = "cv_vector_store",
+        conversion_workers: int = 1,
+        conversion_timeout: Optional[float] = None,
+        conversion_cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+        embedding_batch_size: int = 100,
+        embedding_concurrency: int = 4,
+        embedding_requests_per_minute: Optional[float] = None,
+        embedding_cache_path: Optional[str] = DEFAULT_EMBEDDING_CACHE_PATH,
+        embedding_cache_max_entries: int = 200_000,
+        answer_cache_size: int = 256,
+        answer_cache_ttl: Optional[float] = 3600,
+        answer_cache_threshold: float = 0.95,
+        embedding_backend: Optional[str] = None,
+        embedding_dimension: Optional[int] = None,
+        index_type: str = "flat",
+        index_params: Optional[dict] = None,
+        load_mode: str = "memory",
+        retrieval_mode: str = "hybrid",
+        retrieval_min_k: int = 4,
+        retrieval_max_k: int = 10,
+        retrieval_score_ratio: float = 0.85,
+        retrieval_score_threshold: Optional[float] = None,
+        retrieval_mmr_lambda: Optional[float] = None,
+        context_token_budget: Optional[int] = 3000,
+        ingest_batch_size: int = 512,
+        ingest_queue_size: int = 8,
+        metrics: Optional[MetricsRegistry] = None
     ):
         """
         Initialize the CV RAG Agent.
@@ -68,84 +147,302 @@ class CVRAGAgent:
             chunk_size: Size of text chunks in characters
             chunk_overlap: Overlap between chunks in characters
             vector_store_path: Path where FAISS vector store will be saved/loaded
+            conversion_workers: Number of processes used to convert documents.
+                Values above 1 enable parallel conversion.
+            conversion_timeout: Seconds allowed per file in parallel conversion
+                before it is skipped. None waits indefinitely.
+            conversion_cache_dir: Folder of the converted Markdown cache shared
+                with CVAnalyzer. None disables the cache.
+            embedding_batch_size: Number of chunks sent per embedding request
+            embedding_concurrency: Maximum embedding requests in flight
+            embedding_requests_per_minute: Embedding request rate limit.
+                None disables rate limiting.
+            embedding_cache_path: SQLite file caching embeddings by model and
+                chunk text. None disables the cache.
+            embedding_cache_max_entries: Vectors kept before LRU eviction
+            answer_cache_size: Number of answers kept by the semantic answer
+                cache. 0 disables the cache.
+            answer_cache_ttl: Seconds a cached answer stays valid
+            answer_cache_threshold: Minimum cosine similarity between two
+                questions for a cached answer to be reused
+            embedding_backend: Embedding backend name ("google" or "hashing").
+                Defaults to $CV_RAG_EMBEDDING_BACKEND, then "google".
+            embedding_dimension: Output dimension of the embeddings. None uses
+                the backend default.
+            index_type: FAISS index type: "flat" (exact), "hnsw", "ivf_flat"
+                or "ivf_pq" (see index_factory)
+            index_params: Index build/search parameters such as nlist,
+                nprobe, hnsw_m or ef_search (see index_factory)
+            load_mode: How a saved store is loaded: "memory" reads it fully,
+                "mmap" memory-maps the index read-only and reads chunk texts
+                on demand (fast startup, no updates; see lazy_docstore)
+            retrieval_mode: "hybrid" fuses vector and BM25 keyword results,
+                "dense" uses vector search only and "keyword" uses BM25 only
+                (no embedding call per question; see keyword_index)
+            retrieval_min_k: Fewest chunks retrieved per question
+            retrieval_max_k: Most chunks retrieved per question
+            retrieval_score_ratio: Chunks scoring below this fraction of the
+                best chunk's relevance are dropped (down to retrieval_min_k)
+            retrieval_score_threshold: Minimum cosine similarity between a
+                chunk and the question; chunks found by BM25 are exempt.
+                None disables the absolute cutoff.
+            retrieval_mmr_lambda: Relevance/diversity trade-off of maximal
+                marginal relevance selection (1.0: relevance only). None
+                keeps the ranked order.
+            context_token_budget: Estimated tokens of retrieved CV content
+                sent per question, after overlapping chunks are merged.
+                None sends every retrieved chunk (see context_packing).
+            ingest_batch_size: Chunks embedded and added to the index at a
+                time by a full build
+            ingest_queue_size: Items buffered between the stages of a full
+                build (see ingest_pipeline)
+            metrics: Registry receiving stage timings and LLM usage.
+                Defaults to metrics.default_registry.
         """
+        if load_mode not in ("memory", "mmap"):
+            raise ValueError(f"Unknown load_mode '{load_mode}'. Available: memory, mmap")
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(
+                f"Unknown retrieval_mode '{retrieval_mode}'. Available: {', '.join(RETRIEVAL_MODES)}"
+            )
+
         self.cv_folder = Path(cv_folder)
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.vector_store_path = vector_store_path
+        self.manifest_path = Path(vector_store_path) / MANIFEST_FILENAME
+        self.conversion_workers = conversion_workers
+        self.conversion_timeout = conversion_timeout
+        self.conversion_cache = ConversionCache(conversion_cache_dir) if conversion_cache_dir else None
+        self.embedding_batch_size = embedding_batch_size
+        self.embedding_concurrency = embedding_concurrency
+        self.embedding_requests_per_minute = embedding_requests_per_minute
+        self.embedding_checkpoint_dir = Path(vector_store_path) / "embedding_checkpoint"
+        self.index_type = index_type
+        self.index_params = index_params or {}
+        self.load_mode = load_mode
+        self.retrieval_mode = retrieval_mode
+        self.retrieval_min_k = max(1, retrieval_min_k)
+        self.retrieval_max_k = max(self.retrieval_min_k, retrieval_max_k)
+        self.retrieval_score_ratio = retrieval_score_ratio
+        self.retrieval_score_threshold = retrieval_score_threshold
+        self.retrieval_mmr_lambda = retrieval_mmr_lambda
+        self.context_token_budget = context_token_budget
+        self.ingest_batch_size = max(1, ingest_batch_size)
+        self.ingest_queue_size = ingest_queue_size
+        self.metrics = metrics or default_registry
+        
+        # Initialize embeddings from the configured backend
+        self.embedding_backend = resolve_backend_name(embedding_backend)
+        base_embeddings = create_embeddings(self.embedding_backend, embedding_dimension)
+        self.embedding_model = model_name(base_embeddings)
+        self.embedding_dimension = embedding_dimension or getattr(base_embeddings, "dimension", None)
+        self.embeddings = base_embeddings
+        
+        # Serve repeated chunk and query texts from the persistent cache
+        self.embedding_cache = None
+        if embedding_cache_path:
+            self.embedding_cache = EmbeddingCache(
+                embedding_cache_path,
+                max_entries=embedding_cache_max_entries
+            )
+            self.embeddings = CachedEmbeddings(
+                base_embeddings,
+                self.embedding_cache,
+                model_name=self.embedding_model,
+                dimension=self.embedding_dimension
+            )
+        
+        if not os.getenv("GOOGLE_API_KEY"):
+            logger.warning("GOOGLE_API_KEY not set: indexing works, but questions cannot be answered")
         
-        # Initialize components
-        self.md_converter = MarkItDown()
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
+        # Answers to repeated questions; cleared whenever the index changes
+        self.answer_cache = None
+        if answer_cache_size > 0:
+            self.answer_cache = SemanticAnswerCache(
+                max_entries=answer_cache_size,
+                ttl_seconds=answer_cache_ttl,
+                similarity_threshold=answer_cache_threshold
+            )
+        
+        self.vector_store = None
+        # Loader of a saved keyword index that is read on first use (mmap mode)
+        self._keyword_index_loader = None
+        self._keyword_index_lock = threading.Lock()
+        self.keyword_index = None
+        self._metadata_index = None
+        self._position_by_id = None
+        # Chunk IDs added and removed since the last save, or None when the
+        # next save must write the whole store
+        self._pending_changes = None
+        self.documents = []
+        
+        logger.info(f"CVRAGAgent initialized with cv_folder={cv_folder}")
+    
+    @cached_property
+    def md_converter(self):
+        """MarkItDown converter, created on first use."""
+        from markitdown import MarkItDown
+        return MarkItDown()
+    
+    @cached_property
+    def text_splitter(self):
+        """Chunk splitter, created on first use."""
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        return RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
             separators=["\n\n", "\n", " ", ""],
             add_start_index=True
         )
-        
-        # Initialize Google AI embeddings
+    
+    @cached_property
+    def llm(self):
+        """LLM for generation, created on first use (None without GOOGLE_API_KEY)."""
         api_key = os.getenv("GOOGLE_API_KEY")
         if not api_key:
-            raise ValueError("GOOGLE_API_KEY not found in environment variables")
+            return None
         
-        self.embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/gemini-embedding-001",
-            google_api_key=api_key
-        )
-        
-        # Initialize LLM for generation (safety settings removed - API handles filtering)
-        self.llm = ChatGoogleGenerativeAI(
+        # Safety settings removed - API handles filtering
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(
             model="gemini-2.0-flash-lite",
             google_api_key=api_key,
             temperature=0.7
         )
+    
+    def list_cv_files(self) -> List[Path]:
+        """
+        List the supported CV files in the cv folder.
         
-        self.vector_store = None
-        self.documents = []
+        Returns:
+            Sorted list of file paths
+        """
+        if not self.cv_folder.exists():
+            return []
         
-        logger.info(f"CVRAGAgent initialized with cv_folder={cv_folder}")
+        return sorted(
+            file_path for file_path in self.cv_folder.iterdir()
+            if file_path.suffix.lower() in SUPPORTED_EXTENSIONS
+        )
     
-    def load_documents(self) -> List[Document]:
+    def load_documents(self, file_paths: Optional[List[Path]] = None) -> List[Document]:
         """
-        Load all PDF and DOCX files from the cv folder using MarkItDown.
+        Load PDF and DOCX files using MarkItDown.
+        
+        Files already present in the conversion cache are not parsed again.
+        
+        Args:
+            file_paths: Files to load. Loads every file in the cv folder if None.
         
         Returns:
             List of Document objects
         """
-        logger.info(f"Loading documents from {self.cv_folder}")
+        update_documents = file_paths is None
+        if update_documents:
+            logger.info(f"Loading documents from {self.cv_folder}")
+            
+            if not self.cv_folder.exists():
+                logger.warning(f"CV folder not found at {self.cv_folder}")
+                return []
+            
+            file_paths = self.list_cv_files()
         
-        if not self.cv_folder.exists():
-            logger.warning(f"CV folder not found at {self.cv_folder}")
-            return []
+        # Serve what we can from the conversion cache
+        texts = {}
+        to_convert = []
+        for file_path in file_paths:
+            cached = self.conversion_cache.get(file_path) if self.conversion_cache else None
+            if cached is None:
+                to_convert.append(file_path)
+            else:
+                texts[file_path] = cached
         
-        documents = []
-        supported_extensions = {'.pdf', '.docx', '.doc'}
+        if self.conversion_cache and texts:
+            logger.info(f"Loaded {len(texts)} documents from the conversion cache")
         
-        for file_path in self.cv_folder.iterdir():
-            if file_path.suffix.lower() in supported_extensions:
-                try:
-                    logger.info(f"Converting {file_path.name} using MarkItDown")
-                    result = self.md_converter.convert(str(file_path))
-                    
-                    doc = Document(
-                        page_content=result.text_content,
-                        metadata={
-                            "source": file_path.name,
-                            "file_path": str(file_path),
-                            "file_type": file_path.suffix.lower()
-                        }
-                    )
-                    documents.append(doc)
-                    logger.info(f"Successfully loaded {file_path.name}")
-                    
-                except Exception as e:
-                    logger.error(f"Error loading {file_path.name}: {str(e)}")
-                    continue
+        if self.conversion_workers > 1 and len(to_convert) > 1:
+            converted = dict(self._iter_convert_parallel(to_convert))
+        else:
+            converted = dict(self._iter_convert_sequential(to_convert))
+        
+        for file_path, text in converted.items():
+            if self.conversion_cache:
+                self.conversion_cache.put(file_path, text)
+            texts[file_path] = text
+        
+        documents = [
+            self._build_document(file_path, texts[file_path])
+            for file_path in file_paths
+            if file_path in texts
+        ]
         
-        self.documents = documents
+        if update_documents:
+            self.documents = documents
         logger.info(f"Loaded {len(documents)} documents")
         return documents
     
+    def _iter_convert_sequential(self, file_paths: List[Path]) -> Iterator[tuple]:
+        """
+        Convert files one at a time in this process.
+        
+        Args:
+            file_paths: Files to convert
+            
+        Yields:
+            (file_path, markdown) for the files that converted successfully
+        """
+        for file_path in file_paths:
+            try:
+                logger.info(f"Converting {file_path.name} using MarkItDown")
+                result = self.md_converter.convert(str(file_path))
+                logger.info(f"Successfully loaded {file_path.name}")
+                yield file_path, result.text_content
+                
+            except Exception as e:
+                logger.error(f"Error loading {file_path.name}: {str(e)}")
+                continue
+    
+    def _iter_convert_parallel(self, file_paths: List[Path], max_pending: Optional[int] = None) -> Iterator[tuple]:
+        """
+        Convert files on a process pool.
+        
+        Args:
+            file_paths: Files to convert
+            max_pending: Maximum files submitted ahead of the consumer.
+                None submits every file at once.
+            
+        Yields:
+            (file_path, markdown) for the files that converted successfully
+        """
+        logger.info(
+            f"Converting {len(file_paths)} files with {self.conversion_workers} workers "
+            f"(timeout={self.conversion_timeout})"
+        )
+        
+        for file_path, text, error in iter_convert_files(
+            file_paths,
+            max_workers=self.conversion_workers,
+            timeout=self.conversion_timeout,
+            max_pending=max_pending
+        ):
+            if error is not None:
+                logger.error(f"Error loading {file_path.name}: {error}")
+                continue
+            logger.info(f"Successfully loaded {file_path.name}")
+            yield file_path, text
+    
+    def _build_document(self, file_path: Path, text: str) -> Document:
+        """Wrap converted Markdown in a Document with file metadata."""
+        return Document(
+            page_content=text,
+            metadata={
+                "source": file_path.name,
+                "file_path": str(file_path),
+                "file_type": file_path.suffix.lower()
+            }
+        )
+    
     def chunk_documents(self, documents: Optional[List[Document]] = None) -> List[Document]:
         """
         Split documents into chunks for embedding.
@@ -161,11 +458,21 @@ class CVRAGAgent:
         
         logger.info(f"Chunking {len(documents)} documents")
         chunks = self.text_splitter.split_documents(documents)
+        
+        # Give every chunk a stable ID (source + position) so its vector can
+        # later be replaced or deleted without rebuilding the whole index
+        chunk_counts = {}
+        for chunk in chunks:
+            source = chunk.metadata.get("source", "Unknown")
+            position = chunk_counts.get(source, 0)
+            chunk_counts[source] = position + 1
+            chunk.id = f"{source}::{position}"
+        
         logger.info(f"Created {len(chunks)} chunks from documents")
         
         return chunks
     
-    def create_vector_store(self, chunks: Optional[List[Document]] = None) -> FAISS:
+    def create_vector_store(self, chunks: Optional[List[Document]] = None) -> "FAISS":
         """
         Create FAISS vector store from document chunks.
         
@@ -180,65 +487,471 @@ class CVRAGAgent:
         
         logger.info(f"Creating FAISS vector store with {len(chunks)} chunks")
         
+        embedder = self._batch_embedder()
         try:
-            self.vector_store = FAISS.from_documents(
-                chunks,
-                self.embeddings
+            text_embeddings = self._embed_chunks(chunks, embedder)
+            ids = [chunk.id for chunk in chunks]
+            
+            # Build (and train, for IVF) the configured index type
+            from langchain_community.docstore.in_memory import InMemoryDocstore
+            from langchain_community.vectorstores import FAISS
+            
+            vectors = np.array([vector for _, vector in text_embeddings], dtype=np.float32)
+            index = build_index(self.index_type, vectors, self.index_params)
+            self.vector_store = FAISS(self.embeddings, index, InMemoryDocstore(), {})
+            self._pending_changes = None
+            ids = self.vector_store.add_embeddings(
+                text_embeddings,
+                metadatas=[chunk.metadata for chunk in chunks],
+                ids=ids if all(ids) else None
             )
+            logger.info(f"Built {self.index_type} index with {index.ntotal} vectors")
+            
+            self.keyword_index = BM25Index()
+            self.keyword_index.add(ids, [chunk.page_content for chunk in chunks])
+            embedder.checkpoint.clear()
+            self._on_index_changed(replaced=True)
             logger.info("FAISS vector store created successfully")
             return self.vector_store
         except Exception as e:
             error_msg = str(e)
-            if "429" in error_msg or "quota" in error_msg.lower() or "ResourceExhausted" in error_msg:
+            if is_quota_error(e):
                 logger.error(f"Error creating vector store: Google API quota exceeded")
-                print("\n" + "="*80)
-                print("[WARNING] QUOTA LIMIT REACHED - Google API Free Tier")
-                print("="*80)
-                print("\nThe Google Generative AI API free tier has limited embedding requests.")
-                print("\n[INFO] TO FIX THIS ISSUE:")
-                print("\n1. Visit Google AI Studio: https://ai.google.dev/")
-                print("2. Set up a PAID BILLING PLAN (no longer free tier)")
-                print("3. Your current API key will then have access to:")
-                print("   - Unlimited embedding requests (for production use)")
-                print("   - Higher rate limits")
-                print("   - Production support")
-                print("\n4. No code changes needed - just update your billing!")
-                print("\n[NOTE] ALTERNATIVE (Testing only):")
-                print("   Switch to a different embedding model or use local embeddings")
-                print("="*80 + "\n")
+                self._print_quota_help(
+                    f"Embeddings computed so far are checkpointed in\n"
+                    f"   {self.embedding_checkpoint_dir} - rerun the build to resume."
+                )
                 raise
             else:
                 logger.error(f"Error creating vector store: {error_msg}")
                 raise
     
+    def build_vector_store_streaming(self, file_paths: Optional[List[Path]] = None) -> bool:
+        """
+        Build and save the vector store with the streaming ingestion pipeline.
+        
+        Files flow through convert -> chunk -> embed -> index stages that run
+        concurrently and pass bounded batches to each other (see
+        ingest_pipeline), so documents, chunks and embeddings are never all
+        held in memory at once, and conversion overlaps embedding. Vectors
+        are added to the index every ingest_batch_size chunks.
+        
+        The new index is built aside and replaces the loaded one only once
+        the whole build succeeded. Embedded batches are checkpointed, so a
+        build interrupted by a quota error resumes where it stopped.
+        
+        Args:
+            file_paths: Files to ingest. Ingests the whole cv folder if None.
+            
+        Returns:
+            True if at least one chunk was indexed, False otherwise
+        """
+        if file_paths is None:
+            if not self.cv_folder.exists():
+                logger.warning(f"CV folder not found at {self.cv_folder}")
+                return False
+            file_paths = self.list_cv_files()
+        
+        logger.info(f"Streaming ingestion of {len(file_paths)} files (batch={self.ingest_batch_size} chunks)")
+        embedder = self._batch_embedder()
+        manifest = IngestManifest(self.manifest_path)
+        # Built aside and swapped in on success, so a failed build keeps the
+        # index that is currently loaded
+        vector_store = None
+        keyword_index = BM25Index()
+        
+        def convert(_) -> Iterator[tuple]:
+            to_convert, hashes = [], {}
+            for file_path in file_paths:
+                # Hashed once: the cache key and the manifest share it
+                hashes[file_path] = file_sha256(file_path)
+                cached = self.conversion_cache.get(file_path, hashes[file_path]) if self.conversion_cache else None
+                if cached is None:
+                    to_convert.append(file_path)
+                else:
+                    yield self._build_document(file_path, cached), hashes[file_path]
+            
+            if self.conversion_workers > 1 and len(to_convert) > 1:
+                converted = self._iter_convert_parallel(to_convert, max_pending=2 * self.conversion_workers)
+            else:
+                converted = self._iter_convert_sequential(to_convert)
+            for file_path, text in converted:
+                if self.conversion_cache:
+                    self.conversion_cache.put(file_path, text, hashes[file_path])
+                yield self._build_document(file_path, text), hashes[file_path]
+        
+        def chunk(documents: Iterator[tuple]) -> Iterator[tuple]:
+            for doc, sha256 in documents:
+                chunks = self.text_splitter.split_documents([doc])
+                # Same stable IDs (source + position) as chunk_documents
+                for position, chunk in enumerate(chunks):
+                    chunk.id = f"{doc.metadata['source']}::{position}"
+                file_path = Path(doc.metadata["file_path"])
+                yield (file_path, [chunk.id for chunk in chunks], sha256), chunks
+        
+        def embed_batch(batch: List[Document]) -> list:
+            with self.metrics.span("embed_batch", chunks=len(batch)):
+                return embedder.embed([chunk.page_content for chunk in batch])
+        
+        def embed(chunked: Iterator[tuple]) -> Iterator[tuple]:
+            records, batch = [], []
+            for record, chunks in chunked:
+                records.append(record)
+                batch.extend(chunks)
+                if len(batch) >= self.ingest_batch_size:
+                    yield records, batch, embed_batch(batch)
+                    records, batch = [], []
+            if records:
+                yield records, batch, embed_batch(batch)
+        
+        def index_batches(pending: List[tuple]):
+            nonlocal vector_store
+            with self.metrics.span("index_batch", chunks=sum(len(batch[1]) for batch in pending)):
+                vector_store = self._add_ingest_batches(pending, manifest, vector_store, keyword_index)
+        
+        def index(batches: Iterator[tuple]):
+            # Trained index types are built once enough vectors for training arrived
+            train_size = max(1, training_sample_size(self.index_type, self.index_params))
+            pending, pending_vectors = [], 0
+            for batch in batches:
+                pending.append(batch)
+                pending_vectors += len(batch[2])
+                if vector_store is None and pending_vectors < train_size:
+                    continue
+                index_batches(pending)
+                pending, pending_vectors = [], 0
+            if pending:
+                index_batches(pending)
+        
+        pipeline = IngestPipeline(queue_size=self.ingest_queue_size)
+        pipeline.add_stage("convert", convert).add_stage("chunk", chunk).add_stage("embed", embed)
+        try:
+            pipeline.run("index", index)
+        except Exception as e:
+            if is_quota_error(e):
+                logger.error("Error creating vector store: Google API quota exceeded")
+                self._print_quota_help(
+                    f"Embeddings computed so far are checkpointed in\n"
+                    f"   {self.embedding_checkpoint_dir} - rerun the build to resume."
+                )
+            else:
+                logger.error(f"Error creating vector store: {str(e)}")
+            raise
+        logger.info(f"Ingestion throughput:\n{pipeline.report()}")
+        for stats in pipeline.stats:
+            self.metrics.set("rag_ingest_stage_items", stats.items, stage=stats.name)
+            self.metrics.set("rag_ingest_stage_busy_seconds", stats.busy_seconds, stage=stats.name)
+            self.metrics.set("rag_ingest_stage_waiting_seconds", stats.waiting_seconds, stage=stats.name)
+            self.metrics.set("rag_ingest_stage_blocked_seconds", stats.blocked_seconds, stage=stats.name)
+        
+        if vector_store is None:
+            logger.error("No documents loaded")
+            return False
+        
+        self.vector_store = vector_store
+        self.keyword_index = keyword_index
+        self.documents = []
+        self._pending_changes = None
+        self._on_index_changed(replaced=True)
+        with self.metrics.span("save_vector_store"):
+            self.save_vector_store()
+        manifest.save()
+        embedder.checkpoint.clear()
+        return True
+    
+    def _add_ingest_batches(
+        self,
+        batches: List[tuple],
+        manifest: IngestManifest,
+        vector_store: Optional["FAISS"],
+        keyword_index: BM25Index
+    ) -> Optional["FAISS"]:
+        """
+        Add embedded batches from the streaming pipeline to a vector store.
+        
+        Args:
+            batches: (records, chunks, vectors) tuples; records are
+                (file_path, chunk_ids, sha256) per ingested file
+            manifest: Manifest receiving the ingested files
+            vector_store: Store being built, or None before the first batch
+            keyword_index: Keyword index being built
+            
+        Returns:
+            The vector store, created from the first batch with chunks
+        """
+        chunks = [chunk for _, batch_chunks, _ in batches for chunk in batch_chunks]
+        vectors = [vector for _, _, batch_vectors in batches for vector in batch_vectors]
+        for records, _, _ in batches:
+            for file_path, chunk_ids, sha256 in records:
+                manifest.record(file_path, chunk_ids, sha256=sha256)
+        if not chunks:
+            return vector_store
+        
+        if vector_store is None:
+            from langchain_community.docstore.in_memory import InMemoryDocstore
+            from langchain_community.vectorstores import FAISS
+            
+            index = build_index(self.index_type, np.array(vectors, dtype=np.float32), self.index_params)
+            vector_store = FAISS(self.embeddings, index, InMemoryDocstore(), {})
+        
+        texts = [chunk.page_content for chunk in chunks]
+        ids = vector_store.add_embeddings(
+            list(zip(texts, vectors)),
+            metadatas=[chunk.metadata for chunk in chunks],
+            ids=[chunk.id for chunk in chunks]
+        )
+        keyword_index.add(ids, texts)
+        logger.info(f"Indexed {len(chunks)} chunks ({vector_store.index.ntotal} total)")
+        return vector_store
+    
+    def _print_quota_help(self, resume_note: str):
+        """Explain an embedding quota error and how to resume."""
+        print("\n" + "="*80)
+        print("[WARNING] QUOTA LIMIT REACHED - Google API Free Tier")
+        print("="*80)
+        print("\nThe Google Generative AI API free tier has limited embedding requests.")
+        print(f"\n[INFO] {resume_note}")
+        print("\n[INFO] TO FIX THIS ISSUE:")
+        print("\n1. Visit Google AI Studio: https://ai.google.dev/")
+        print("2. Set up a PAID BILLING PLAN (no longer free tier)")
+        print("3. Your current API key will then have access to:")
+        print("   - Unlimited embedding requests (for production use)")
+        print("   - Higher rate limits")
+        print("   - Production support")
+        print("\n4. No code changes needed - just update your billing!")
+        print("\n[NOTE] ALTERNATIVE (Testing only):")
+        print("   Lower embedding_requests_per_minute, or switch to a different")
+        print("   embedding model or local embeddings")
+        print("="*80 + "\n")
+    
+    def _batch_embedder(self) -> BatchEmbedder:
+        """Create the batched embedding engine for the configured embeddings."""
+        return BatchEmbedder(
+            self.embeddings,
+            batch_size=self.embedding_batch_size,
+            max_concurrency=self.embedding_concurrency,
+            requests_per_minute=self.embedding_requests_per_minute,
+            checkpoint_dir=str(self.embedding_checkpoint_dir),
+            model_name=f"{self.embedding_backend}:{self.embedding_model}",
+            dimension=self.embedding_dimension
+        )
+    
+    def _embed_chunks(
+        self,
+        chunks: List[Document],
+        embedder: Optional[BatchEmbedder] = None
+    ) -> List[tuple]:
+        """
+        Embed chunk texts with the batched embedding engine.
+        
+        Args:
+            chunks: Chunks to embed
+            embedder: Engine to use. A new one is created if None.
+            
+        Returns:
+            List of (text, vector) pairs in chunk order
+        """
+        embedder = embedder or self._batch_embedder()
+        texts = [chunk.page_content for chunk in chunks]
+        return list(zip(texts, embedder.embed(texts)))
+    
     def save_vector_store(self):
-        """Save the FAISS vector store to disk."""
+        """
+        Save the FAISS vector store to disk.
+        
+        After add_cv, replace_cv, delete_cv or a refresh of a loaded store,
+        only the changed chunks are written to the SQLite docstore and the
+        keyword index; index.faiss is still rewritten as a whole.
+        """
         if self.vector_store is None:
             logger.warning("No vector store to save")
             return
         
+        if self._pending_changes is not None:
+            self._save_changes()
+            return
+        
+        from lazy_docstore import write_sqlite_docstore
+        
         logger.info(f"Saving vector store to {self.vector_store_path}")
         self.vector_store.save_local(self.vector_store_path)
+        write_sqlite_docstore(
+            self.vector_store_path,
+            self.vector_store.docstore,
+            self.vector_store.index_to_docstore_id
+        )
+        if self.keyword_index is not None:
+            self.keyword_index.save(self.vector_store_path)
+        self._save_embedding_info()
+        self._pending_changes = {"added": set(), "removed": set()}
+        logger.info("Vector store saved successfully")
+    
+    def _save_changes(self):
+        """Write the chunks added and removed since the last save."""
+        import faiss
+        from lazy_docstore import update_sqlite_docstore
+        
+        added, removed = self._pending_changes["added"], self._pending_changes["removed"]
+        if not added and not removed:
+            logger.info("Vector store has no unsaved changes")
+            return
+        logger.info(
+            f"Saving {len(added)} added and {len(removed)} removed chunks to {self.vector_store_path}"
+        )
+        folder = Path(self.vector_store_path)
+        tmp_path = folder / "index.faiss.tmp"
+        faiss.write_index(self.vector_store.index, str(tmp_path))
+        tmp_path.replace(folder / "index.faiss")
+        update_sqlite_docstore(
+            self.vector_store_path,
+            self.vector_store.docstore,
+            self.vector_store.index_to_docstore_id,
+            added,
+            removed
+        )
+        # The pickled docstore is only written by full saves; the SQLite
+        # docstore is authoritative from here on
+        (folder / "index.pkl").unlink(missing_ok=True)
+        if self.keyword_index is not None:
+            self.keyword_index.save_changes(self.vector_store_path, added, removed)
+        self._save_embedding_info()
+        self._pending_changes = {"added": set(), "removed": set()}
         logger.info("Vector store saved successfully")
     
+    def _save_embedding_info(self):
+        """Record the embedding configuration next to the index."""
+        save_embedding_info(
+            self.vector_store_path,
+            self.embedding_backend,
+            self.embedding_model,
+            self.vector_store.index.d
+        )
+    
     def load_vector_store(self):
-        """Load FAISS vector store from disk."""
+        """
+        Load FAISS vector store from disk.
+        
+        Raises:
+            ValueError: If the store was built with a different embedding backend
+        """
         if not Path(self.vector_store_path).exists():
             logger.warning(f"Vector store not found at {self.vector_store_path}")
             return False
         
-        logger.info(f"Loading vector store from {self.vector_store_path}")
+        from langchain_community.vectorstores import FAISS
+        from lazy_docstore import DOCSTORE_FILENAME
+        
+        logger.info(f"Loading vector store from {self.vector_store_path} (mode={self.load_mode})")
+        has_docstore = (Path(self.vector_store_path) / DOCSTORE_FILENAME).exists()
         try:
-            self.vector_store = FAISS.load_local(
-                self.vector_store_path,
-                self.embeddings,
-                allow_dangerous_deserialization=True
-            )
-            logger.info("Vector store loaded successfully")
-            return True
+            if self.load_mode == "mmap" and has_docstore:
+                vector_store = self._load_mmap_store()
+            elif has_docstore:
+                vector_store = self._load_memory_store()
+            else:
+                if self.load_mode == "mmap":
+                    logger.warning(f"No {DOCSTORE_FILENAME} in {self.vector_store_path}; loading into memory")
+                vector_store = FAISS.load_local(
+                    self.vector_store_path,
+                    self.embeddings,
+                    allow_dangerous_deserialization=True
+                )
         except Exception as e:
             logger.error(f"Error loading vector store: {str(e)}")
             return False
+        
+        # Refuse an index built with a different embedding backend or dimension
+        check_embedding_info(
+            self.vector_store_path,
+            self.embedding_backend,
+            self.embedding_model,
+            vector_store.index.d,
+            self.embedding_dimension
+        )
+        
+        configure_search(vector_store.index, self.index_params)
+        self.vector_store = vector_store
+        # Stores without a SQLite docstore are converted by one full save
+        self._pending_changes = {"added": set(), "removed": set()} if has_docstore else None
+        if self.load_mode == "mmap" and has_docstore:
+            # Read on the first keyword or hybrid retrieval, so startup does
+            # not grow with the corpus
+            self.keyword_index = None
+            self._keyword_index_loader = self._load_keyword_index
+        else:
+            self.keyword_index = self._load_keyword_index()
+        self._on_index_changed(replaced=True)
+        logger.info("Vector store loaded successfully")
+        return True
+    
+    @property
+    def keyword_index(self) -> Optional[BM25Index]:
+        """BM25 index of the loaded store, read from disk on first use in mmap mode."""
+        if self._keyword_index_loader is not None:
+            with self._keyword_index_lock:
+                if self._keyword_index_loader is not None:
+                    self._keyword_index = self._keyword_index_loader()
+                    self._keyword_index_loader = None
+        return self._keyword_index
+    
+    @keyword_index.setter
+    def keyword_index(self, keyword_index: Optional[BM25Index]):
+        self._keyword_index_loader = None
+        self._keyword_index = keyword_index
+    
+    def _load_keyword_index(self) -> Optional[BM25Index]:
+        """
+        Load the saved BM25 index, or build it from the docstore for older stores.
+        
+        A memory-mapped store is never scanned to rebuild it: without a saved
+        index, retrieval falls back to vector search.
+        """
+        from lazy_docstore import SQLiteDocstore
+        
+        try:
+            return BM25Index.load(self.vector_store_path)
+        except (FileNotFoundError, ValueError) as e:
+            if isinstance(self.vector_store.docstore, SQLiteDocstore):
+                logger.warning(f"No usable keyword index ({type(e).__name__}); using vector search only")
+                return None
+            logger.warning(f"Rebuilding keyword index from the docstore ({type(e).__name__})")
+        
+        keyword_index = BM25Index()
+        for doc_id in self.vector_store.index_to_docstore_id.values():
+            doc = self.vector_store.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                keyword_index.add([doc_id], [doc.page_content])
+        return keyword_index
+    
+    def _load_memory_store(self) -> "FAISS":
+        """Read the saved index and the SQLite docstore into memory."""
+        import faiss
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores import FAISS
+        from lazy_docstore import read_sqlite_docstore
+        
+        index = faiss.read_index(str(Path(self.vector_store_path) / "index.faiss"))
+        documents, index_to_docstore_id = read_sqlite_docstore(self.vector_store_path)
+        return FAISS(self.embeddings, index, InMemoryDocstore(documents), index_to_docstore_id)
+    
+    def _load_mmap_store(self) -> "FAISS":
+        """Open the saved store with a memory-mapped index and a lazy docstore."""
+        from langchain_community.vectorstores import FAISS
+        from lazy_docstore import DOCSTORE_FILENAME, LazyIndexMapping, SQLiteDocstore, read_index_mmap
+        
+        index = read_index_mmap(str(Path(self.vector_store_path) / "index.faiss"))
+        docstore = SQLiteDocstore(str(Path(self.vector_store_path) / DOCSTORE_FILENAME))
+        return FAISS(self.embeddings, index, docstore, LazyIndexMapping(docstore))
+    
+    def _check_writable(self):
+        """Raise if the loaded store cannot be modified."""
+        from lazy_docstore import SQLiteDocstore
+        
+        if self.vector_store is not None and isinstance(self.vector_store.docstore, SQLiteDocstore):
+            raise ValueError(
+                "The vector store was loaded with load_mode='mmap' and is read-only. "
+                "Use load_mode='memory' to add, replace or delete CVs."
+            )
     
     def create_retrieval_tool(self):
         """
@@ -250,6 +963,8 @@ class CVRAGAgent:
         if self.vector_store is None:
             raise ValueError("Vector store not initialized. Create or load it first.")
         
+        from langchain_core.tools import tool
+        
         @tool(response_format="content_and_artifact")
         def retrieve_cv_context(query: str) -> tuple[str, List[Document]]:
             """
@@ -264,13 +979,13 @@ class CVRAGAgent:
             logger.info(f"Retrieving context for query: {query}")
             
             # Retrieve relevant documents
-            retrieved_docs = self.vector_store.similarity_search(query, k=4)
+            retrieved_docs = self._retrieve(query)
             
-            # Format the retrieved context
+            # Format the retrieved context, merging overlapping chunks
             formatted_content = "\n\n".join([
                 f"Source: {doc.metadata.get('source', 'Unknown')}\n"
                 f"Content: {doc.page_content}"
-                for doc in retrieved_docs
+                for doc in pack_context(retrieved_docs, self.context_token_budget)
             ])
             
             logger.info(f"Retrieved {len(retrieved_docs)} relevant documents")
@@ -279,49 +994,327 @@ class CVRAGAgent:
         
         return retrieve_cv_context
     
-    def query_simple(self, question: str) -> str:
+    def _check_ready(self):
+        """Raise if the agent cannot answer questions yet."""
+        if self.vector_store is None:
+            raise ValueError("RAG pipeline not initialized. Call initialize_pipeline() first.")
+        if self.llm is None:
+            raise ValueError("No LLM available: GOOGLE_API_KEY not found in environment variables")
+    
+    def _embed_question(self, question: str) -> Optional[List[float]]:
+        """Embed a question, or return None if retrieval does not need an embedding."""
+        if self.retrieval_mode == "keyword" and self.keyword_index is not None:
+            return None
+        return self.embeddings.embed_query(question)
+    
+    async def _aembed_question(self, question: str) -> Optional[List[float]]:
+        """Async variant of _embed_question."""
+        if self.retrieval_mode == "keyword" and self.keyword_index is not None:
+            return None
+        return await self.embeddings.aembed_query(question)
+    
+    def _retrieve(
+        self,
+        question: str,
+        query_embedding: Optional[List[float]] = None,
+        k: Optional[int] = None,
+        fetch_k: int = 20,
+        filter: Optional[dict] = None
+    ) -> List[Document]:
         """
-        Simple query method without agent framework.
+        Retrieve the chunks most relevant to a question.
+        
+        Depending on retrieval_mode, candidates come from vector search, BM25
+        keyword search, or both fused with reciprocal rank fusion. Keyword-only
+        retrieval falls back to vector search when no chunk shares a term with
+        the question.
+        
+        The number of chunks returned adapts to the question: candidates
+        whose relevance is below retrieval_score_ratio of the best one are
+        dropped, keeping between retrieval_min_k and retrieval_max_k chunks.
+        Relevance is the cosine similarity to the question in dense mode and
+        the BM25 score in keyword mode. In hybrid mode each retriever's score
+        is taken relative to its best hit and a chunk keeps the higher of the
+        two, so exact-term matches that vector search missed are not cut.
+        retrieval_score_threshold drops chunks below a cosine similarity,
+        except those BM25 found. Narrow questions with one clearly relevant
+        passage get few chunks; broad questions, where many chunks score
+        alike, get more. With retrieval_mmr_lambda set, chunks are picked by
+        maximal marginal relevance, spreading them over CVs.
         
         Args:
-            question: The question to ask about CV content
+            question: The question text
+            query_embedding: Embedding of the question (computed if needed and None)
+            k: Fixed number of chunks to return. None adapts the number.
+            fetch_k: Candidates taken from each retriever before selection
+            filter: Metadata filter applied before searching, e.g.
+                {"source": "jane_doe.pdf"} (see MetadataIndex.select)
             
         Returns:
-            The response from the LLM
+            List of retrieved chunks, most relevant first
         """
-        if self.vector_store is None:
-            raise ValueError("RAG pipeline not initialized. Call initialize_pipeline() first.")
+        min_k, max_k = (k, k) if k else (self.retrieval_min_k, self.retrieval_max_k)
+        fetch_k = max(fetch_k, 2 * max_k)
+        mode = self.retrieval_mode
+        if mode != "dense" and self.keyword_index is None:
+            mode = "dense"
         
-        logger.info(f"Processing query: {question}")
+        positions = allowed_ids = None
+        if filter:
+            metadata_index = self.metadata_index()
+            positions = metadata_index.select(filter)
+            if not len(positions):
+                logger.info(f"No chunks match filter {filter}")
+                return []
+            allowed_ids = metadata_index.ids_for(positions)
         
-        # Retrieve similar documents
-        logger.info("Retrieving context...")
-        retrieved_docs = self.vector_store.similarity_search(question, k=4)
+        ranked_ids = []
+        keyword_scores = {}
+        if mode in ("hybrid", "keyword"):
+            with self.metrics.span("keyword_search"):
+                keyword_hits = self.keyword_index.search(question, fetch_k, allowed_ids)
+            if keyword_hits:
+                ranked_ids.append([doc_id for doc_id, _ in keyword_hits])
+                keyword_scores = dict(keyword_hits)
+            elif mode == "keyword":
+                logger.info("No keyword matches, falling back to vector search")
+                mode = "dense"
         
-        # Format context
-        formatted_context = "\n\n---\n\n".join([
-            f"**Source: {doc.metadata.get('source', 'Unknown')}**\n\n{doc.page_content}"
-            for doc in retrieved_docs
-        ])
+        positions_by_id = {}
+        if mode in ("hybrid", "dense"):
+            if query_embedding is None:
+                with self.metrics.span("embed_query"):
+                    query_embedding = self.embeddings.embed_query(question)
+            with self.metrics.span("dense_search"):
+                dense_hits = self._dense_search(query_embedding, fetch_k, positions)
+            ranked_ids.append([doc_id for _, doc_id in dense_hits])
+            positions_by_id = {doc_id: position for position, doc_id in dense_hits}
+        
+        candidate_ids = [doc_id for doc_id, _ in reciprocal_rank_fusion(ranked_ids)]
+        if not candidate_ids:
+            return []
+        
+        vectors = similarities = None
+        if keyword_scores:
+            best = max(keyword_scores.values())
+            keyword_relevance = np.array([keyword_scores.get(doc_id, 0.0) / best for doc_id in candidate_ids])
+        if mode == "keyword":
+            relevance = keyword_relevance
+        else:
+            vectors = self._chunk_vectors(candidate_ids, positions_by_id)
+            query = np.array(query_embedding, dtype=np.float32)
+            similarities = vectors @ (query / (np.linalg.norm(query) or 1.0))
+            relevance = similarities
+            if keyword_scores:
+                # Cosine similarities and BM25 scores are not comparable, so
+                # each is scaled by its best hit before taking the higher
+                best = float(similarities.max())
+                dense_relevance = np.clip(similarities / best, 0.0, None) if best > 0 else np.zeros(len(similarities))
+                relevance = np.maximum(dense_relevance, keyword_relevance)
+                # BM25 hits are exempt from the cosine threshold
+                similarities = np.where(keyword_relevance > 0, np.inf, similarities)
+        
+        docs_by_id = {}
+        for doc_id in candidate_ids:
+            doc = self.vector_store.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                docs_by_id[doc_id] = doc
+        
+        selected = self._select_chunks(
+            relevance,
+            vectors,
+            [docs_by_id[doc_id].metadata.get("source") if doc_id in docs_by_id else None for doc_id in candidate_ids],
+            min_k,
+            max_k,
+            similarities
+        )
+        retrieved_docs = [docs_by_id[candidate_ids[i]] for i in selected if candidate_ids[i] in docs_by_id]
+        logger.info(f"Selected {len(retrieved_docs)} of {len(candidate_ids)} candidate chunks")
+        return retrieved_docs
+    
+    def _dense_search(
+        self,
+        query_embedding: List[float],
+        k: int,
+        positions: Optional[np.ndarray] = None
+    ) -> List[tuple]:
+        """
+        Vector search, optionally restricted to the given FAISS positions.
+        
+        Args:
+            query_embedding: Embedding of the question
+            k: Number of chunks to return
+            positions: Allowed positions (from the metadata index). None searches all.
+            
+        Returns:
+            List of (FAISS position, chunk ID) pairs, most similar first
+        """
+        vector = np.array([query_embedding], dtype=np.float32)
+        if self.vector_store._normalize_L2:
+            import faiss
+            faiss.normalize_L2(vector)
+        
+        if positions is None:
+            _, found = self.vector_store.index.search(vector, k)
+        else:
+            _, found = filtered_search(self.vector_store.index, vector, k, positions)
+        
+        return [
+            (int(position), self.vector_store.index_to_docstore_id[int(position)])
+            for position in found[0]
+            if position != -1
+        ]
+    
+    def _chunk_vectors(self, doc_ids: List[str], positions_by_id: Dict[str, int]) -> np.ndarray:
+        """
+        Return the L2-normalized stored vectors of chunks.
+        
+        Args:
+            doc_ids: Chunk IDs
+            positions_by_id: Known FAISS positions; other chunks are looked
+                up with _positions_of
+            
+        Returns:
+            float32 array with one unit-length row per chunk
+        """
+        missing = [doc_id for doc_id in doc_ids if doc_id not in positions_by_id]
+        if missing:
+            positions_by_id = {**positions_by_id, **self._positions_of(missing)}
+        vectors = reconstruct_vectors(
+            self.vector_store.index,
+            np.array([positions_by_id[doc_id] for doc_id in doc_ids], dtype=np.int64)
+        )
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+    
+    def _positions_of(self, doc_ids: List[str]) -> Dict[str, int]:
+        """
+        Look up the FAISS positions of chunks.
+        
+        The memory-mapped store answers with one SQL query; in memory the
+        reverse mapping is built once per index change.
+        
+        Args:
+            doc_ids: Chunk IDs
+            
+        Returns:
+            Mapping of chunk ID to FAISS position for the IDs that are indexed
+        """
+        mapping = self.vector_store.index_to_docstore_id
+        if hasattr(mapping, "positions_of"):
+            return mapping.positions_of(doc_ids)
+        if self._position_by_id is None:
+            self._position_by_id = {doc_id: int(position) for position, doc_id in mapping.items()}
+        return {doc_id: self._position_by_id[doc_id] for doc_id in doc_ids if doc_id in self._position_by_id}
+    
+    def _select_chunks(
+        self,
+        relevance: np.ndarray,
+        vectors: Optional[np.ndarray],
+        sources: List[Optional[str]],
+        min_k: int,
+        max_k: int,
+        similarities: Optional[np.ndarray] = None
+    ) -> List[int]:
+        """
+        Choose which candidates to keep.
+        
+        Args:
+            relevance: Relevance of each candidate (higher is better)
+            vectors: Unit-length candidate vectors, or None in keyword mode
+            sources: Source CV of each candidate
+            min_k: Minimum number of candidates kept
+            max_k: Maximum number of candidates kept
+            similarities: Cosine similarity of each candidate, checked
+                against retrieval_score_threshold. None skips the check.
+            
+        Returns:
+            Indexes of the kept candidates, in selection order
+        """
+        best = float(relevance.max())
+        cutoff = best - (1 - self.retrieval_score_ratio) * abs(best)
+        
+        eligible = [
+            i for i in range(len(relevance))
+            if relevance[i] >= cutoff and (
+                self.retrieval_score_threshold is None
+                or similarities is None
+                or similarities[i] >= self.retrieval_score_threshold
+            )
+        ]
+        for i in range(len(relevance)):
+            if len(eligible) >= min_k:
+                break
+            if i not in eligible:
+                eligible.append(i)
+        eligible.sort()
+        
+        if self.retrieval_mmr_lambda is None:
+            return eligible[:max_k]
+        
+        # Maximal marginal relevance: a chunk is redundant in proportion to
+        # its similarity to chunks already picked from the same CV
+        lambda_mult = self.retrieval_mmr_lambda
+        selected = []
+        while eligible and len(selected) < max_k:
+            def mmr_score(i: int) -> float:
+                redundancy = max(
+                    (
+                        float(vectors[i] @ vectors[j]) if vectors is not None else 1.0
+                        for j in selected
+                        if sources[j] == sources[i]
+                    ),
+                    default=0.0
+                )
+                return lambda_mult * float(relevance[i]) - (1 - lambda_mult) * redundancy
+            
+            pick = max(eligible, key=mmr_score)
+            selected.append(pick)
+            eligible.remove(pick)
+        return selected
+    
+    def metadata_index(self) -> MetadataIndex:
+        """
+        Return the metadata index of the loaded store, building it on first use.
+        
+        A memory-mapped store is queried in SQL instead (SQLiteMetadataIndex),
+        and an index built in memory is updated as CVs are added or removed.
+        
+        Returns:
+            MetadataIndex mapping metadata values to FAISS positions
+        """
+        from lazy_docstore import SQLiteDocstore, SQLiteMetadataIndex
+        
+        if self.vector_store is None:
+            raise ValueError("Vector store not initialized. Create or load it first.")
+        if self._metadata_index is None and isinstance(self.vector_store.docstore, SQLiteDocstore):
+            self._metadata_index = SQLiteMetadataIndex(self.vector_store.docstore)
+        elif self._metadata_index is None:
+            self._metadata_index = MetadataIndex.build(
+                self.vector_store.index_to_docstore_id,
+                self.vector_store.docstore
+            )
+            logger.info(f"Built metadata index over {len(self._metadata_index)} chunks")
+        return self._metadata_index
+    
+    def _build_messages(self, question: str, retrieved_docs: List[Document]) -> list:
+        """
+        Build the chat messages for answering a question from retrieved chunks.
+        
+        Args:
+            question: The question to ask about CV content
+            retrieved_docs: Chunks retrieved for the question
+            
+        Returns:
+            List of LangChain messages
+        """
+        from langchain_core.messages import HumanMessage, SystemMessage
+        
+        # Format context: overlapping chunks merged, packed to the token budget
+        formatted_context = "\n\n---\n\n".join(
+            format_passage(doc) for doc in pack_context(retrieved_docs, self.context_token_budget)
+        )
         
-        # Create prompt for LLM
-        system_prompt = """You are a professional CV Analyst assistant. Your role is to help analyze and understand information from CV documents.
-
-COSTAR Framework Guidelines:
-- **Context**: You have access to a database of CV documents
-- **Objective**: Provide accurate, detailed answers about candidate qualifications, experience, and skills
-- **Style**: Professional, structured, and clear
-- **Tone**: Helpful, impartial, and informative
-- **Audience**: HR professionals, recruiters, and hiring managers
-- **Response**: Detailed, evidence-based answers with specific references to CV content
-
-When answering questions:
-1. Provide accurate information based on the retrieved documents
-2. Always cite the source CV when providing information
-3. Provide specific examples from the documents
-4. Be objective and factual
-5. If information is not available, clearly state that"""
-
         user_message = f"""Based on the following CV content, please answer this question:
 
 Question: {question}
@@ -330,20 +1323,233 @@ Retrieved CV Content:
 {formatted_context}
 
 Please provide a detailed, evidence-based answer with specific references to the CV sources."""
-
-        # Generate response
-        logger.info("Generating response...")
-        from langchain_core.messages import HumanMessage, SystemMessage
         
-        messages = [
-            SystemMessage(content=system_prompt),
+        return [
+            SystemMessage(content=SYSTEM_PROMPT),
             HumanMessage(content=user_message)
         ]
+    
+    def query_simple(self, question: str, filter: Optional[dict] = None) -> str:
+        """
+        Simple query method without agent framework.
+        
+        Args:
+            question: The question to ask about CV content
+            filter: Metadata filter restricting retrieval, e.g.
+                {"source": "jane_doe.pdf"}. Filtered questions bypass the
+                answer cache.
+            
+        Returns:
+            The response from the LLM
+        """
+        self._check_ready()
+        answer_cache = None if filter else self.answer_cache
+        
+        logger.info(f"Processing query: {question}")
+        
+        with self.metrics.span("query", filtered=bool(filter)) as span:
+            # Exact repeat of a cached question: no embedding call needed
+            if answer_cache is not None:
+                with self.metrics.span("answer_cache_exact"):
+                    cached_answer = answer_cache.get_exact(question)
+                if cached_answer is not None:
+                    logger.info("Answered from cache (exact match)")
+                    return self._count_query(span, "exact", cached_answer)
+            
+            with self.metrics.span("embed_query"):
+                query_embedding = self._embed_question(question)
+            
+            if answer_cache is not None and query_embedding is not None:
+                with self.metrics.span("answer_cache_similar"):
+                    cached_answer = answer_cache.get_similar(query_embedding)
+                if cached_answer is not None:
+                    logger.info("Answered from cache (similar question)")
+                    return self._count_query(span, "similar", cached_answer)
+            
+            # Retrieve similar documents
+            logger.info("Retrieving context...")
+            with self.metrics.span("retrieve") as retrieve_span:
+                retrieved_docs = self._retrieve(question, query_embedding, filter=filter)
+                retrieve_span["attributes"]["chunks"] = len(retrieved_docs)
+            
+            # Generate response
+            logger.info("Generating response...")
+            with self.metrics.span("build_prompt"):
+                messages = self._build_messages(question, retrieved_docs)
+            with self.metrics.span("llm_generate"):
+                response = self.llm.invoke(messages, config=self._llm_config("query"))
+            
+            if answer_cache is not None:
+                answer_cache.put(question, query_embedding, response.content)
+            
+            logger.info("Query processed successfully")
+            return self._count_query(span, "miss", response.content)
+    
+    def _count_query(self, span: dict, cache: str, answer: str) -> str:
+        """Record how a query was answered on its span and in the query counter."""
+        span["attributes"]["cache"] = cache
+        self.metrics.inc("rag_queries_total", cache=cache)
+        return answer
+    
+    def _llm_config(self, operation: str) -> dict:
+        """Runnable config recording the LLM call's usage under an operation label."""
+        return {"callbacks": [llm_usage_callback(self.metrics, operation)]}
+    
+    def query_stream(self, question: str, filter: Optional[dict] = None) -> Iterator[dict]:
+        """
+        Answer a question, yielding the response as it is generated.
+        
+        The retrieved sources are yielded first, before the LLM is called, so
+        callers can show them while the answer streams in.
+        
+        Args:
+            question: The question to ask about CV content
+            filter: Metadata filter restricting retrieval, e.g.
+                {"source": "jane_doe.pdf"}. Filtered questions bypass the
+                answer cache.
+            
+        Yields:
+            {"type": "sources", "sources": [...], "cached": bool} once, then
+            {"type": "token", "content": str} for every piece of the answer,
+            then {"type": "done", "cached": bool} once the answer is complete
+        """
+        self._check_ready()
+        # Spans stay open across yields, and each step may be resumed in
+        # another thread (the service does), so run them in one context
+        yield from iter_in_context(self._stream_answer(question, filter))
+    
+    def _stream_answer(self, question: str, filter: Optional[dict]) -> Iterator[dict]:
+        """Generator behind query_stream, timed like query_simple."""
+        answer_cache = None if filter else self.answer_cache
+        
+        logger.info(f"Processing query (streaming): {question}")
+        
+        with self.metrics.span("query", filtered=bool(filter)) as span:
+            cached_answer = None
+            if answer_cache is not None:
+                with self.metrics.span("answer_cache_exact"):
+                    cached_answer = answer_cache.get_exact(question)
+                cache = "exact"
+            
+            query_embedding = None
+            if cached_answer is None:
+                with self.metrics.span("embed_query"):
+                    query_embedding = self._embed_question(question)
+                if answer_cache is not None and query_embedding is not None:
+                    with self.metrics.span("answer_cache_similar"):
+                        cached_answer = answer_cache.get_similar(query_embedding)
+                    cache = "similar"
+            
+            if cached_answer is not None:
+                self._count_query(span, cache, cached_answer)
+            else:
+                with self.metrics.span("retrieve") as retrieve_span:
+                    retrieved_docs = self._retrieve(question, query_embedding, filter=filter)
+                    retrieve_span["attributes"]["chunks"] = len(retrieved_docs)
+                sources = list(dict.fromkeys(
+                    doc.metadata.get("source", "Unknown") for doc in retrieved_docs
+                ))
+                yield {"type": "sources", "sources": sources, "cached": False}
+                
+                parts = []
+                with self.metrics.span("build_prompt"):
+                    messages = self._build_messages(question, retrieved_docs)
+                with self.metrics.span("llm_generate"):
+                    for chunk in self.llm.stream(messages, config=self._llm_config("query_stream")):
+                        if chunk.content:
+                            parts.append(chunk.content)
+                            yield {"type": "token", "content": chunk.content}
+                
+                if answer_cache is not None:
+                    answer_cache.put(question, query_embedding, "".join(parts))
+                self._count_query(span, "miss", "".join(parts))
+        
+        if cached_answer is not None:
+            yield {"type": "sources", "sources": [], "cached": True}
+            yield {"type": "token", "content": cached_answer}
+            yield {"type": "done", "cached": True}
+            return
+        
+        logger.info("Streaming query processed successfully")
+        yield {"type": "done", "cached": False}
+    
+    async def aquery(self, question: str, filter: Optional[dict] = None) -> str:
+        """
+        Asynchronous version of query_simple.
+        
+        The query embedding and the LLM call use the async LangChain
+        interfaces; the in-memory FAISS search runs in a worker thread.
+        
+        Args:
+            question: The question to ask about CV content
+            filter: Metadata filter restricting retrieval, e.g.
+                {"source": "jane_doe.pdf"}. Filtered questions bypass the
+                answer cache.
+            
+        Returns:
+            The response from the LLM
+        """
+        self._check_ready()
+        answer_cache = None if filter else self.answer_cache
+        
+        logger.info(f"Processing query (async): {question}")
+        
+        with self.metrics.span("query", filtered=bool(filter)) as span:
+            if answer_cache is not None:
+                with self.metrics.span("answer_cache_exact"):
+                    cached_answer = answer_cache.get_exact(question)
+                if cached_answer is not None:
+                    return self._count_query(span, "exact", cached_answer)
+            
+            with self.metrics.span("embed_query"):
+                query_embedding = await self._aembed_question(question)
+            
+            if answer_cache is not None and query_embedding is not None:
+                with self.metrics.span("answer_cache_similar"):
+                    cached_answer = answer_cache.get_similar(query_embedding)
+                if cached_answer is not None:
+                    return self._count_query(span, "similar", cached_answer)
+            
+            with self.metrics.span("retrieve") as retrieve_span:
+                retrieved_docs = await asyncio.to_thread(self._retrieve, question, query_embedding, filter=filter)
+                retrieve_span["attributes"]["chunks"] = len(retrieved_docs)
+            with self.metrics.span("build_prompt"):
+                messages = self._build_messages(question, retrieved_docs)
+            with self.metrics.span("llm_generate"):
+                response = await self.llm.ainvoke(messages, config=self._llm_config("aquery"))
+            
+            if answer_cache is not None:
+                answer_cache.put(question, query_embedding, response.content)
+            
+            return self._count_query(span, "miss", response.content)
+    
+    async def abatch_query(self, questions: List[str], max_concurrency: int = 8) -> List[dict]:
+        """
+        Answer many questions concurrently.
         
-        response = self.llm.invoke(messages)
+        A failing question does not affect the others; its error is reported
+        in its own result.
+        
+        Args:
+            questions: Questions to answer
+            max_concurrency: Maximum number of questions processed at once
+            
+        Returns:
+            One dict per question, in input order, with keys
+            "question", "answer" and "error"
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
         
-        logger.info("Query processed successfully")
-        return response.content
+        async def answer(question: str) -> dict:
+            async with semaphore:
+                try:
+                    return {"question": question, "answer": await self.aquery(question), "error": None}
+                except Exception as e:
+                    logger.error(f"Error processing query '{question}': {str(e)}")
+                    return {"question": question, "answer": None, "error": str(e)}
+        
+        logger.info(f"Processing {len(questions)} queries (max_concurrency={max_concurrency})")
+        return list(await asyncio.gather(*(answer(question) for question in questions)))
     
     def setup_agent(self):
         """
@@ -356,62 +1562,352 @@ Please provide a detailed, evidence-based answer with specific references to the
         logger.info("RAG agent setup complete")
         return None
     
-    def initialize_pipeline(self, rebuild: bool = False) -> bool:
+    def _record_manifest(
+        self,
+        manifest: IngestManifest,
+        documents: List[Document],
+        chunks: List[Document]
+    ):
         """
-        Initialize the complete RAG pipeline.
+        Record the chunk IDs produced for each loaded document in the manifest.
         
         Args:
-            rebuild: If True, rebuild from scratch. If False, try to load existing store.
-            
+            manifest: Manifest to update
+            documents: Documents that were converted
+            chunks: Chunks created from those documents
+        """
+        chunk_ids = {}
+        for chunk in chunks:
+            chunk_ids.setdefault(chunk.metadata.get("source"), []).append(chunk.id)
+        
+        for doc in documents:
+            file_path = Path(doc.metadata["file_path"])
+            manifest.record(file_path, chunk_ids.get(doc.metadata["source"], []))
+    
+    def refresh_vector_store(self) -> bool:
+        """
+        Incrementally sync the vector store with the cv folder.
+        
+        Only files that were added or changed since the last build are
+        converted and embedded; vectors of changed or deleted files are removed
+        from the existing index. Falls back to a full rebuild when there is no
+        manifest or no vector store to update.
+        
         Returns:
             True if successful, False otherwise
         """
-        logger.info(f"Initializing RAG pipeline (rebuild={rebuild})")
+        manifest = IngestManifest.load(self.manifest_path)
+        if not manifest.entries or not self.load_vector_store():
+            logger.info("No manifest or vector store to refresh, running a full rebuild")
+            return self.initialize_pipeline(rebuild=True)
+        
+        diff = manifest.diff(self.list_cv_files())
+        logger.info(
+            f"Refresh plan: {len(diff.added)} added, {len(diff.changed)} changed, "
+            f"{len(diff.deleted)} deleted, {len(diff.unchanged)} unchanged"
+        )
         
-        # Try to load existing vector store if not rebuilding
-        if not rebuild and self.load_vector_store():
-            logger.info("Loaded existing vector store")
+        if not diff.has_changes:
+            manifest.save()
+            logger.info("Vector store is up to date")
             return True
         
-        # Load and process documents
-        documents = self.load_documents()
+        # Drop vectors of files that changed or disappeared
+        stale_ids = []
+        for source in diff.deleted + [file_path.name for file_path in diff.changed]:
+            stale_ids.extend(manifest.remove(source))
+        
+        self._remove_chunks(stale_ids)
+        
+        # Convert and embed only the new and changed files
+        documents = self.load_documents(diff.added + diff.changed)
+        chunks = self.chunk_documents(documents)
+        self._add_chunks(chunks)
+        
+        self._record_manifest(manifest, documents, chunks)
+        self.save_vector_store()
+        manifest.save()
+        
+        logger.info("Vector store refreshed successfully")
+        return True
+    
+    def _remove_chunks(self, chunk_ids: List[str]) -> int:
+        """
+        Delete chunks from the loaded vector store, ignoring unknown IDs.
+        
+        Args:
+            chunk_ids: IDs of the chunks to delete
+            
+        Returns:
+            Number of chunks deleted
+        """
+        if self.vector_store is None or not chunk_ids:
+            return 0
+        self._check_writable()
+        
+        indexed_ids = set(self.vector_store.index_to_docstore_id.values())
+        stale_ids = [chunk_id for chunk_id in chunk_ids if chunk_id in indexed_ids]
+        if stale_ids:
+            if not supports_removal(self.vector_store.index):
+                raise ValueError(
+                    "The HNSW index does not support deleting vectors. "
+                    "Rebuild the index with initialize_pipeline(rebuild=True)."
+                )
+            logger.info(f"Removing {len(stale_ids)} stale chunks")
+            self.vector_store.delete(stale_ids)
+            if self.keyword_index is not None:
+                self.keyword_index.remove(stale_ids)
+            if self._pending_changes is not None:
+                self._pending_changes["added"].difference_update(stale_ids)
+                self._pending_changes["removed"].update(stale_ids)
+            if self._metadata_index is not None:
+                self._metadata_index.remove(stale_ids)
+            self._on_index_changed()
+        return len(stale_ids)
+    
+    def _add_chunks(self, chunks: List[Document]):
+        """
+        Embed chunks and add them to the loaded vector store.
+        
+        Creates the vector store if none is loaded yet.
+        
+        Args:
+            chunks: Chunks to add (with IDs assigned by chunk_documents)
+        """
+        if not chunks:
+            return
+        
+        if self.vector_store is None:
+            self.create_vector_store(chunks)
+            return
+        self._check_writable()
+        
+        logger.info(f"Embedding {len(chunks)} new chunks")
+        embedder = self._batch_embedder()
+        # LangChain numbers new vectors from the current size of the mapping
+        start = len(self.vector_store.index_to_docstore_id)
+        ids = self.vector_store.add_embeddings(
+            self._embed_chunks(chunks, embedder),
+            metadatas=[chunk.metadata for chunk in chunks],
+            ids=[chunk.id for chunk in chunks]
+        )
+        if self.keyword_index is not None:
+            self.keyword_index.add(ids, [chunk.page_content for chunk in chunks])
+        if self._pending_changes is not None:
+            self._pending_changes["added"].update(ids)
+        embedder.checkpoint.clear()
+        if self._metadata_index is not None:
+            for position, (doc_id, chunk) in enumerate(zip(ids, chunks), start):
+                self._metadata_index.add(position, doc_id, chunk.metadata)
+        self._on_index_changed()
+    
+    def _on_index_changed(self, replaced: bool = False):
+        """
+        Invalidate state derived from the index contents.
+        
+        Args:
+            replaced: The whole store was replaced, so the metadata index
+                (otherwise updated in place by _add_chunks and _remove_chunks)
+                is dropped too
+        """
+        if replaced:
+            self._metadata_index = None
+        self._position_by_id = None
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate()
+    
+    def _prepare_update(self) -> IngestManifest:
+        """Load the persisted store (if not loaded yet) and its manifest."""
+        if self.vector_store is None:
+            self.load_vector_store()
+        return IngestManifest.load(self.manifest_path)
+    
+    def _chunk_ids_for(self, source: str, manifest: IngestManifest) -> List[str]:
+        """
+        Remove a CV from the manifest and return the IDs of its indexed chunks.
+        
+        Stores built before the manifest existed have no entry for the CV, so
+        its chunks are then found by their ``source`` metadata.
+        """
+        chunk_ids = manifest.remove(source)
+        if self.vector_store is not None and not chunk_ids:
+            for doc_id in self.vector_store.index_to_docstore_id.values():
+                doc = self.vector_store.docstore.search(doc_id)
+                if isinstance(doc, Document) and doc.metadata.get("source") == source:
+                    chunk_ids.append(doc_id)
+        return chunk_ids
+    
+    def _ingest_cv(self, file_path: Path, replace: bool) -> int:
+        """Shared implementation of add_cv and replace_cv."""
+        file_path = Path(file_path)
+        if not file_path.exists():
+            raise FileNotFoundError(f"File not found: {file_path}")
+        if file_path.suffix.lower() not in SUPPORTED_EXTENSIONS:
+            raise ValueError(f"Unsupported file type: {file_path.suffix}")
+        
+        manifest = self._prepare_update()
+        source = file_path.name
+        stale_ids = self._chunk_ids_for(source, manifest)
+        if stale_ids and not replace:
+            raise ValueError(f"{source} is already indexed. Use replace_cv() to update it.")
+        
+        # Keep the cv folder the source of truth for later refreshes
+        self.cv_folder.mkdir(parents=True, exist_ok=True)
+        target_path = self.cv_folder / source
+        if file_path.resolve() != target_path.resolve():
+            shutil.copy2(file_path, target_path)
+        
+        documents = self.load_documents([target_path])
         if not documents:
-            logger.error("No documents loaded")
-            return False
+            raise ValueError(f"Could not convert {source}")
         
-        # Chunk documents
         chunks = self.chunk_documents(documents)
+        self._remove_chunks(stale_ids)
+        self._add_chunks(chunks)
+        self._record_manifest(manifest, documents, chunks)
+        
+        self.documents = [
+            doc for doc in self.documents if doc.metadata.get("source") != source
+        ] + documents
+        
+        self.save_vector_store()
+        manifest.save()
+        
+        logger.info(f"Indexed {source} with {len(chunks)} chunks")
+        return len(chunks)
+    
+    def add_cv(self, file_path: str) -> int:
+        """
+        Add a new CV to the index without rebuilding it.
+        
+        The file is copied into the cv folder if it is not already there, so
+        later incremental refreshes keep it.
+        
+        Args:
+            file_path: Path to the PDF or DOCX file
+            
+        Returns:
+            Number of chunks added
+        """
+        return self._ingest_cv(Path(file_path), replace=False)
+    
+    def replace_cv(self, file_path: str) -> int:
+        """
+        Replace the chunks of an indexed CV with those of a new version.
+        
+        The CV is matched by file name (the ``source`` metadata). If it is not
+        indexed yet it is simply added.
+        
+        Args:
+            file_path: Path to the new version of the file
+            
+        Returns:
+            Number of chunks indexed for the new version
+        """
+        return self._ingest_cv(Path(file_path), replace=True)
+    
+    def delete_cv(self, source: str, delete_file: bool = False) -> bool:
+        """
+        Delete a CV's chunks from the index.
+        
+        Args:
+            source: File name of the CV (its ``source`` metadata)
+            delete_file: Also remove the file from the cv folder
+            
+        Returns:
+            True if the CV was indexed and has been removed, False otherwise
+        """
+        manifest = self._prepare_update()
+        removed = self._remove_chunks(self._chunk_ids_for(source, manifest))
+        if not removed:
+            logger.warning(f"{source} is not indexed")
+            return False
         
-        # Create vector store
-        self.create_vector_store(chunks)
+        if delete_file:
+            (self.cv_folder / source).unlink(missing_ok=True)
         
-        # Save vector store
+        self.documents = [doc for doc in self.documents if doc.metadata.get("source") != source]
         self.save_vector_store()
+        manifest.save()
+        
+        logger.info(f"Deleted {source} ({removed} chunks)")
+        return True
+    
+    def initialize_pipeline(self, rebuild: bool = False, incremental: bool = False) -> bool:
+        """
+        Initialize the complete RAG pipeline.
+        
+        Args:
+            rebuild: If True, rebuild from scratch. If False, try to load existing store.
+            incremental: If True, update the existing store with only the files
+                that were added, changed or deleted since the last build.
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        logger.info(f"Initializing RAG pipeline (rebuild={rebuild}, incremental={incremental})")
+        
+        with self.metrics.span("initialize_pipeline", rebuild=rebuild, incremental=incremental) as span:
+            if incremental:
+                with self.metrics.span("refresh_vector_store"):
+                    span["attributes"]["ok"] = self.refresh_vector_store()
+                return span["attributes"]["ok"]
+            
+            # Try to load existing vector store if not rebuilding
+            if not rebuild:
+                with self.metrics.span("load_vector_store"):
+                    loaded = self.load_vector_store()
+                if loaded:
+                    logger.info("Loaded existing vector store")
+                    span["attributes"]["ok"] = True
+                    return True
+            
+            # Convert, chunk, embed and index in a streaming pipeline; it also
+            # records the manifest so later refreshes can be incremental
+            with self.metrics.span("ingest"):
+                span["attributes"]["ok"] = self.build_vector_store_streaming()
+            if not span["attributes"]["ok"]:
+                return False
         
         logger.info("RAG pipeline initialized successfully")
         return True
     
-    def query(self, question: str) -> str:
+    def query(self, question: str, filter: Optional[dict] = None) -> str:
         """
         Query the RAG agent with a question about CVs.
         
         Args:
             question: The question to ask about CV content
+            filter: Metadata filter restricting the question to some CVs, e.g.
+                {"source": "jane_doe.pdf"} or {"file_type": [".pdf", ".docx"]}
             
         Returns:
             The agent's response
         """
-        return self.query_simple(question)
+        return self.query_simple(question, filter=filter)
 
 
-def main():
+def main(argv: Optional[List[str]] = None):
     """Example usage of the CV RAG Agent."""
+    import argparse
+    from profiling import add_profile_argument, profile_run
     
+    parser = argparse.ArgumentParser(description="Answer example questions about the CVs")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the vector store from scratch")
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+    
+    with profile_run(args.profile, "rag_agent"):
+        _run_examples(args.rebuild)
+
+
+def _run_examples(rebuild: bool):
+    """Build or load the index and answer the example questions."""
     # Initialize the RAG agent
     rag_agent = CVRAGAgent(cv_folder="cv", chunk_size=1000, chunk_overlap=200)
     
     # Initialize the pipeline
-    if not rag_agent.initialize_pipeline(rebuild=False):
+    if not rag_agent.initialize_pipeline(rebuild=rebuild):
         logger.error("Failed to initialize RAG pipeline")
         return
     
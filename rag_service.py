@@ -0,0 +1,504 @@
+"""
+HTTP Query Service
+
+Every use of the agent used to start a fresh Python process that reloaded
+(or rebuilt) the index before answering a single question. This module is
+an ASGI application that loads the index once and keeps the agent warm:
+
+- ``POST /query``         {"question": ..., "filter": {...}} -> {"answer": ...}
+- ``POST /query/stream``  same body; NDJSON events from ``query_stream``
+  (sources first, then answer tokens, then ``done``; a stream cut short
+  ends with an ``error`` event instead)
+- ``POST /ingest``        the raw file as the body with
+  ``?filename=jane.pdf[&replace=true]``, {"refresh": true}, or
+  {"path": ..., "replace": bool} for a file inside ``ingest_dir`` (path
+  ingest is disabled unless an ingest directory is configured)
+- ``GET /health/live``    the process is up
+- ``GET /health/ready``   the index is loaded and questions can be answered
+- ``GET /metrics``        the agent's metrics in Prometheus text format
+
+Queries share the index; an ingest waits for running queries and has it to
+itself (queries arriving meanwhile wait behind it). At most
+``max_concurrency`` queries run at once and ``max_queue`` more may wait for
+a slot; beyond that requests are rejected at once with ``429`` and a
+``Retry-After`` header instead of piling up. Requests that take longer than
+their timeout get ``504``. The work of a timed-out request finishes in the
+background and keeps its slot until then, so timeouts never let more work
+run than the limits allow.
+
+The application has no dependency beyond the standard library. Serve it
+with any ASGI server, e.g. ``python rag_service.py`` (uvicorn).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Callable, Optional
+from urllib.parse import parse_qs
+
+from rag_agent import CVRAGAgent
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_MAX_QUEUE = 32
+DEFAULT_QUERY_TIMEOUT = 60.0
+DEFAULT_INGEST_TIMEOUT = 300.0
+DEFAULT_MAX_BODY_BYTES = 20 * 2**20
+
+# Seconds suggested to rejected clients before retrying
+RETRY_AFTER_SECONDS = 1
+
+_END = object()
+
+
+class HTTPError(Exception):
+    """Error answered with an HTTP status and a JSON {"error": ...} body."""
+
+    def __init__(self, status: int, message: str, headers: Optional[dict] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class _IndexLock:
+    """
+    Asyncio readers-writer lock: queries share the index, ingests have it alone.
+
+    Waiting writers block new readers, so a steady stream of queries cannot
+    starve an ingest.
+    """
+
+    def __init__(self):
+        self._condition = asyncio.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+    @asynccontextmanager
+    async def read(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._writing and not self._writers_waiting)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._readers -= 1
+                self._condition.notify_all()
+
+    @asynccontextmanager
+    async def write(self):
+        async with self._condition:
+            self._writers_waiting += 1
+            try:
+                await self._condition.wait_for(lambda: not self._writing and not self._readers)
+            finally:
+                self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+def _log_failure(task: asyncio.Task):
+    """Retrieve the outcome of background work nobody waits for anymore."""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background request failed: {task.exception()}")
+
+
+class RAGService:
+    """
+    ASGI application serving a warm CVRAGAgent.
+
+    Example::
+
+        agent = CVRAGAgent(cv_folder="cv")
+        app = RAGService(agent)   # serve with uvicorn, hypercorn, ...
+    """
+
+    def __init__(
+        self,
+        agent: CVRAGAgent,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        query_timeout: Optional[float] = DEFAULT_QUERY_TIMEOUT,
+        ingest_timeout: Optional[float] = DEFAULT_INGEST_TIMEOUT,
+        max_ingest_queue: int = 4,
+        max_body_bytes: int = DEFAULT_MAX_BODY_BYTES,
+        rebuild: bool = False,
+        ingest_dir: Optional[str] = None
+    ):
+        """
+        Initialize the service.
+
+        Args:
+            agent: Agent answering the questions. If its index is not loaded
+                yet, it is loaded (or built) in the background at startup.
+            max_concurrency: Queries answered at the same time
+            max_queue: Queries allowed to wait for a free slot; more are
+                rejected with 429
+            query_timeout: Seconds before a query gets 504 (None: no limit)
+            ingest_timeout: Seconds before an ingest gets 504 (None: no limit)
+            max_ingest_queue: Ingests allowed to run or wait; more get 429
+            max_body_bytes: Largest accepted request body (413 beyond)
+            rebuild: Rebuild the index from the cv folder at startup
+            ingest_dir: Server folder that {"path": ...} ingests may read
+                from. None rejects path ingests (uploads still work).
+        """
+        self.agent = agent
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.query_timeout = query_timeout
+        self.ingest_timeout = ingest_timeout
+        self.max_ingest_queue = max(1, max_ingest_queue)
+        self.max_body_bytes = max_body_bytes
+        self.rebuild = rebuild
+        self.ingest_dir = ingest_dir
+
+        self.loading: Optional[asyncio.Task] = None
+        self.load_error: Optional[str] = None
+        self._lock = _IndexLock()
+        self._query_slots = asyncio.Semaphore(self.max_concurrency)
+        self._pending_queries = 0
+        self._pending_ingests = 0
+
+        self.metrics = agent.metrics
+        self.metrics.describe("rag_http_requests_total", "HTTP requests by endpoint and status")
+
+        self._routes = {
+            ("POST", "/query"): self._query,
+            ("POST", "/query/stream"): self._query_stream,
+            ("POST", "/ingest"): self._ingest,
+            ("GET", "/health/live"): self._live,
+            ("GET", "/health/ready"): self._ready,
+            ("GET", "/metrics"): self._metrics,
+        }
+
+    @property
+    def ready(self) -> bool:
+        """Whether the index is loaded and questions can be answered."""
+        return self.agent.vector_store is not None and self.agent.llm is not None
+
+    async def startup(self):
+        """Start loading (or building) the index in the background if needed."""
+        if self.loading is None and (self.rebuild or self.agent.vector_store is None):
+            self.loading = asyncio.create_task(self._load())
+
+    async def _load(self):
+        async with self._lock.write():
+            try:
+                if not await asyncio.to_thread(self.agent.initialize_pipeline, rebuild=self.rebuild):
+                    self.load_error = "No documents could be indexed"
+            except Exception as e:
+                logger.error(f"Failed to load the index: {e}")
+                self.load_error = str(e)
+
+    # -- ASGI ---------------------------------------------------------------
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        path = scope["path"].rstrip("/") or "/"
+        handler = self._routes.get((scope["method"], path))
+        status = 200
+        try:
+            if handler is None:
+                if any(route_path == path for _, route_path in self._routes):
+                    raise HTTPError(405, f"Method {scope['method']} not allowed on {path}")
+                raise HTTPError(404, f"Not found: {path}")
+            status = await handler(scope, receive, send)
+        except HTTPError as e:
+            status = e.status
+            await self._send_json(send, e.status, {"error": str(e)}, e.headers)
+        except Exception as e:
+            logger.error(f"Error handling {path}: {e}", exc_info=True)
+            status = 500
+            await self._send_json(send, 500, {"error": str(e)})
+        finally:
+            self.metrics.inc("rag_http_requests_total", endpoint=path, status=status)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await self.startup()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _send_json(self, send, status: int, payload: Any, headers: Optional[dict] = None):
+        body = json.dumps(payload).encode("utf-8")
+        await self._start_response(send, status, "application/json", headers)
+        await send({"type": "http.response.body", "body": body})
+
+    async def _start_response(self, send, status: int, content_type: str, headers: Optional[dict] = None):
+        raw_headers = [(b"content-type", content_type.encode())]
+        raw_headers += [(name.encode(), str(value).encode()) for name, value in (headers or {}).items()]
+        await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+
+    async def _read_body(self, receive) -> bytes:
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise HTTPError(400, "Client disconnected")
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > self.max_body_bytes:
+                raise HTTPError(413, f"Request body larger than {self.max_body_bytes} bytes")
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                return b"".join(chunks)
+
+    async def _read_json(self, receive) -> dict:
+        body = await self._read_body(receive)
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Request body is not valid JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        return payload
+
+    # -- Admission ------------------------------------------------------------
+
+    def _check_serving(self):
+        if not self.ready:
+            detail = self.load_error or "index is loading"
+            raise HTTPError(503, f"Not ready: {detail}", {"Retry-After": RETRY_AFTER_SECONDS})
+
+    def _admit_query(self):
+        """Reserve a place for a query, or reject it when the queue is full."""
+        if self._pending_queries >= self.max_concurrency + self.max_queue:
+            raise HTTPError(429, "Too many queries in progress", {"Retry-After": RETRY_AFTER_SECONDS})
+        self._pending_queries += 1
+
+    async def _within_timeout(self, task: asyncio.Task, timeout: Optional[float], what: str):
+        """Wait for a task; on timeout answer 504 and let the task finish in the background."""
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            task.add_done_callback(_log_failure)
+            raise HTTPError(504, f"{what} did not finish within {timeout:g}s")
+
+    @staticmethod
+    def _parse_question(payload: dict) -> tuple:
+        question = payload.get("question")
+        if not isinstance(question, str) or not question.strip():
+            raise HTTPError(400, "'question' must be a non-empty string")
+        filter = payload.get("filter")
+        if filter is not None and not isinstance(filter, dict):
+            raise HTTPError(400, "'filter' must be an object")
+        return question, filter
+
+    # -- Endpoints ------------------------------------------------------------
+
+    async def _live(self, scope, receive, send) -> int:
+        await self._send_json(send, 200, {"status": "ok"})
+        return 200
+
+    async def _ready(self, scope, receive, send) -> int:
+        status = 200 if self.ready else 503
+        await self._send_json(send, status, {
+            "ready": self.ready,
+            "error": self.load_error,
+            "queries_pending": self._pending_queries,
+            "ingests_pending": self._pending_ingests,
+        })
+        return status
+
+    async def _metrics(self, scope, receive, send) -> int:
+        await self._start_response(send, 200, "text/plain; version=0.0.4")
+        await send({"type": "http.response.body", "body": self.metrics.to_prometheus().encode("utf-8")})
+        return 200
+
+    async def _query(self, scope, receive, send) -> int:
+        question, filter = self._parse_question(await self._read_json(receive))
+        self._check_serving()
+        self._admit_query()
+        task = asyncio.create_task(self._run_query(question, filter))
+        try:
+            answer = await self._within_timeout(task, self.query_timeout, "Query")
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        await self._send_json(send, 200, {"answer": answer})
+        return 200
+
+    async def _run_query(self, question: str, filter: Optional[dict]) -> str:
+        try:
+            async with self._query_slots, self._lock.read():
+                return await self.agent.aquery(question, filter=filter)
+        finally:
+            self._pending_queries -= 1
+
+    async def _query_stream(self, scope, receive, send) -> int:
+        question, filter = self._parse_question(await self._read_json(receive))
+        self._check_serving()
+        self._admit_query()
+
+        events: asyncio.Queue = asyncio.Queue()
+        stop = asyncio.Event()
+        asyncio.create_task(self._run_query_stream(question, filter, events, stop))
+
+        loop = asyncio.get_running_loop()
+        deadline = None if self.query_timeout is None else loop.time() + self.query_timeout
+        await self._start_response(send, 200, "application/x-ndjson")
+        try:
+            while True:
+                remaining = None if deadline is None else max(0.0, deadline - loop.time())
+                try:
+                    event = await asyncio.wait_for(events.get(), remaining)
+                except asyncio.TimeoutError:
+                    event = {"type": "error", "error": f"Query did not finish within {self.query_timeout:g}s"}
+                if event is _END:
+                    break
+                line = (json.dumps(event) + "\n").encode("utf-8")
+                await send({"type": "http.response.body", "body": line, "more_body": True})
+                if event["type"] == "error":
+                    break
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            stop.set()
+        return 200
+
+    async def _run_query_stream(self, question: str, filter: Optional[dict], events: asyncio.Queue, stop: asyncio.Event):
+        """Pull events from the synchronous query_stream generator in a worker thread."""
+        try:
+            async with self._query_slots, self._lock.read():
+                iterator = self.agent.query_stream(question, filter=filter)
+                try:
+                    while not stop.is_set():
+                        event = await asyncio.to_thread(next, iterator, _END)
+                        await events.put(event)
+                        if event is _END:
+                            return
+                except Exception as e:
+                    await events.put({"type": "error", "error": str(e)})
+                finally:
+                    # Never closed while a worker thread is inside next()
+                    iterator.close()
+        finally:
+            self._pending_queries -= 1
+
+    async def _ingest(self, scope, receive, send) -> int:
+        params = {name: values[-1] for name, values in parse_qs(scope.get("query_string", b"").decode()).items()}
+        content_type = dict(scope.get("headers", [])).get(b"content-type", b"").decode()
+        if "filename" in params:
+            action = self._upload_action(
+                params["filename"], await self._read_body(receive), params.get("replace", "").lower() in ("1", "true")
+            )
+        elif content_type.startswith("application/json"):
+            action = self._json_ingest_action(await self._read_json(receive))
+        else:
+            raise HTTPError(400, "Send a JSON body or the file with ?filename=...")
+
+        if self._pending_ingests >= self.max_ingest_queue:
+            raise HTTPError(429, "Too many ingests in progress", {"Retry-After": RETRY_AFTER_SECONDS})
+        self._pending_ingests += 1
+        task = asyncio.create_task(self._run_ingest(action))
+        try:
+            result = await self._within_timeout(task, self.ingest_timeout, "Ingest")
+        except FileNotFoundError as e:
+            raise HTTPError(404, str(e))
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        await self._send_json(send, 200, result)
+        return 200
+
+    async def _run_ingest(self, action: Callable[[], dict]) -> dict:
+        try:
+            async with self._lock.write():
+                return await asyncio.to_thread(action)
+        finally:
+            self._pending_ingests -= 1
+
+    def _json_ingest_action(self, payload: dict) -> Callable[[], dict]:
+        if payload.get("refresh"):
+            return lambda: {"refreshed": self.agent.refresh_vector_store()}
+        path = payload.get("path")
+        if not isinstance(path, str) or not path:
+            raise HTTPError(400, "Give 'path' (a file on the server) or 'refresh': true")
+        replace = bool(payload.get("replace"))
+        file_path = self._resolve_ingest_path(path)
+        return lambda: self._ingest_file(file_path, replace)
+
+    def _resolve_ingest_path(self, path: str) -> Path:
+        """Resolve a requested path, refusing anything outside ingest_dir."""
+        if self.ingest_dir is None:
+            raise HTTPError(403, "Path ingest is disabled; upload the file with ?filename=... instead")
+        root = Path(self.ingest_dir).resolve()
+        # resolve() follows symlinks and "..", so neither can leave the folder
+        file_path = (root / path).resolve()
+        if not file_path.is_relative_to(root):
+            raise HTTPError(403, f"{path!r} is outside the ingest directory")
+        return file_path
+
+    def _upload_action(self, filename: str, content: bytes, replace: bool) -> Callable[[], dict]:
+        name = Path(filename).name
+        if not name or name != filename:
+            raise HTTPError(400, f"Invalid file name: {filename!r}")
+        if not content:
+            raise HTTPError(400, "Empty file")
+
+        def ingest_upload() -> dict:
+            with tempfile.TemporaryDirectory() as tmp:
+                upload_path = Path(tmp) / name
+                upload_path.write_bytes(content)
+                return self._ingest_file(upload_path, replace)
+
+        return ingest_upload
+
+    def _ingest_file(self, file_path: Path, replace: bool) -> dict:
+        chunks = self.agent.replace_cv(str(file_path)) if replace else self.agent.add_cv(str(file_path))
+        return {"source": file_path.name, "chunks": chunks}
+
+
+def main(argv=None):
+    """Serve the agent over HTTP with uvicorn."""
+    parser = argparse.ArgumentParser(description="HTTP query service for the CV RAG Agent")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cv-folder", default="cv")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index at startup")
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_QUERY_TIMEOUT, help="Query timeout in seconds")
+    parser.add_argument(
+        "--ingest-dir",
+        help="Folder that JSON {\"path\": ...} ingests may read from (path ingest is disabled without it)"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("uvicorn is required to serve the API: pip install uvicorn")
+
+    logging.basicConfig(level=logging.INFO)
+    agent = CVRAGAgent(cv_folder=args.cv_folder, chunk_size=1000, chunk_overlap=200)
+    app = RAGService(
+        agent,
+        max_concurrency=args.max_concurrency,
+        max_queue=args.max_queue,
+        query_timeout=args.timeout,
+        rebuild=args.rebuild,
+        ingest_dir=args.ingest_dir
+    )
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Startup Benchmark
+
+Measures how long it takes to get from ``python`` to an agent that can answer
+questions from a prebuilt index. Each measurement runs in a fresh
+interpreter, so nothing is already imported or cached in-process.
+
+Two reports are printed:
+
+- Import cost per top-level package of a module, from ``python -X importtime``
+- Time spent importing rag_agent, constructing CVRAGAgent and loading the
+  vector store, plus the first access to the BM25 keyword index, which mmap
+  mode defers to the first keyword or hybrid retrieval (only with ``--store``)
+
+Usage::
+
+    python startup_benchmark.py --module interactive_rag
+    python startup_benchmark.py --store cv_vector_store --backend hashing --load-mode mmap
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List
+
+
+def import_times(module: str) -> List[dict]:
+    """
+    Import a module in a fresh interpreter and return ``-X importtime`` rows.
+
+    Args:
+        module: Module to import
+
+    Returns:
+        One row per imported module with its name, depth in the import tree
+        and self/cumulative time in milliseconds
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    return rows
+
+
+def cost_per_package(rows: List[dict]) -> Dict[str, float]:
+    """Sum the self time of imported modules per top-level package, largest first."""
+    totals = defaultdict(float)
+    for row in rows:
+        totals[row["module"].split(".")[0]] += row["self_ms"]
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+_STARTUP_SCRIPT = """
+import json, logging, sys, time
+from pathlib import Path
+start = time.perf_counter()
+from rag_agent import CVRAGAgent
+imported = time.perf_counter()
+logging.disable(logging.WARNING)
+agent = CVRAGAgent(vector_store_path=sys.argv[1], embedding_backend=sys.argv[2] or None,
+                   load_mode=sys.argv[3])
+constructed = time.perf_counter()
+loaded = agent.load_vector_store()
+done = time.perf_counter()
+keyword_index = agent.keyword_index if loaded else None
+keyword_done = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - start,
+    "construct_s": constructed - imported,
+    "load_s": done - constructed,
+    "total_s": done - start,
+    "keyword_index_s": keyword_done - done,
+    "keyword_chunks": len(keyword_index) if keyword_index is not None else None,
+    "bm25_saved": (Path(sys.argv[1]) / "bm25.json").exists(),
+    "loaded": loaded,
+    "modules_loaded": len(sys.modules),
+}))
+"""
+
+
+def agent_startup(store: str, backend: str = "", load_mode: str = "memory") -> dict:
+    """
+    Time import, construction and index loading of CVRAGAgent in a fresh interpreter.
+
+    Args:
+        store: Vector store folder to load
+        backend: Embedding backend name ("" for the configured default)
+        load_mode: "memory" or "mmap"
+
+    Returns:
+        Seconds per phase (keyword_index_s is the first keyword index access,
+        after startup), the number of modules imported and whether the store
+        has a saved BM25 index
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", _STARTUP_SCRIPT, store, backend, load_mode],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Agent startup failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    """Print import and startup timings."""
+    parser = argparse.ArgumentParser(description="Measure CLI and agent startup cost")
+    parser.add_argument("--module", default="rag_agent", help="Module whose import cost is reported")
+    parser.add_argument("--top", type=int, default=15, help="Number of packages listed")
+    parser.add_argument("--store", help="Vector store folder to time loading")
+    parser.add_argument("--backend", default="", help="Embedding backend used to load the store")
+    parser.add_argument("--load-mode", default="memory", choices=("memory", "mmap"))
+    args = parser.parse_args()
+
+    rows = import_times(args.module)
+    total_ms = sum(row["cumulative_ms"] for row in rows if row["depth"] == 0)
+    print(f"\nImporting {args.module}: {total_ms:.0f} ms, {len(rows)} modules")
+    print(f"\n{'Package':<36}{'Self ms':>10}")
+    print("-" * 46)
+    for package, ms in list(cost_per_package(rows).items())[:args.top]:
+        print(f"{package:<36}{ms:>10.1f}")
+
+    if args.store:
+        timing = agent_startup(args.store, args.backend, args.load_mode)
+        print(f"\nAgent startup ({args.load_mode}, store={args.store})")
+        print("-" * 46)
+        for phase in ("import_s", "construct_s", "load_s", "total_s"):
+            print(f"{phase[:-2]:<36}{timing[phase] * 1000:>10.1f} ms")
+        bm25 = "saved" if timing["bm25_saved"] else "missing"
+        print(f"{'first keyword index access':<36}{timing['keyword_index_s'] * 1000:>10.1f} ms "
+              f"(bm25.json {bm25}, {timing['keyword_chunks']} chunks)")
+        if not timing["loaded"]:
+            print("Warning: the vector store could not be loaded")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ Quick test to verify CV RAG Agent is working correctly
 """
 
 import os
+import tempfile
 from pathlib import Path
 from rag_agent import CVRAGAgent
 
@@ -62,6 +63,1145 @@ def test_cv_folder():
         print("⚠ cv folder not found (will be created on first use)\n")
         return False
 
+def test_ingest_manifest():
+    """Test that the manifest detects added, changed and deleted files"""
+    print("✓ Testing ingestion manifest...")
+    from ingest_manifest import IngestManifest
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        kept, edited, removed = tmp / "kept.pdf", tmp / "edited.pdf", tmp / "removed.pdf"
+        for path in (kept, edited, removed):
+            path.write_bytes(path.name.encode())
+
+        manifest = IngestManifest(tmp / "manifest.json")
+        for path in (kept, edited, removed):
+            manifest.record(path, [f"{path.name}::0"])
+        manifest.save()
+
+        edited.write_bytes(b"new content")
+        removed.unlink()
+        added = tmp / "added.pdf"
+        added.write_bytes(b"added")
+
+        diff = IngestManifest.load(tmp / "manifest.json").diff([added, edited, kept])
+        assert diff.added == [added]
+        assert diff.changed == [edited]
+        assert diff.unchanged == [kept]
+        assert diff.deleted == ["removed.pdf"]
+
+    print("✓ Manifest diff is correct\n")
+    return True
+
+def test_incremental_refresh():
+    """Test that a refresh matches a full rebuild and re-embeds only what changed"""
+    print("✓ Testing incremental refresh end to end...")
+    from langchain_core.embeddings import Embeddings
+    from benchmark import generate_corpus, write_docx
+
+    class RecordingEmbeddings(Embeddings):
+        def __init__(self, base):
+            self.base = base
+            self.embedded = []
+
+        def embed_documents(self, texts):
+            self.embedded.extend(texts)
+            return self.base.embed_documents(texts)
+
+        def embed_query(self, text):
+            return self.base.embed_query(text)
+
+    def make_agent(tmp, store):
+        agent = CVRAGAgent(
+            cv_folder=os.path.join(tmp, "cv"),
+            vector_store_path=os.path.join(tmp, store),
+            conversion_cache_dir=None,
+            embedding_cache_path=None,
+            embedding_backend="hashing"
+        )
+        agent.embeddings = RecordingEmbeddings(agent.embeddings)
+        return agent
+
+    def indexed_chunks(agent):
+        store = agent.vector_store
+        return {doc_id: store.docstore.search(doc_id).page_content for doc_id in store.index_to_docstore_id.values()}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        kept, changed, deleted = generate_corpus(Path(tmp, "cv"), 3)
+        assert make_agent(tmp, "store").initialize_pipeline(rebuild=True)
+
+        write_docx(changed, ["Changed Person", "Rust and embedded firmware engineer", "PMP certified"])
+        deleted.unlink()
+        added = Path(tmp, "cv", "added.docx")
+        write_docx(added, ["Added Person", "Nurse with ten years of patient care"])
+
+        agent = make_agent(tmp, "store")
+        assert agent.initialize_pipeline(incremental=True)
+        expected_texts = {
+            chunk.page_content for chunk in agent.chunk_documents(agent.load_documents([changed, added]))
+        }
+        assert set(agent.embeddings.embedded) == expected_texts
+
+        rebuilt = make_agent(tmp, "rebuilt")
+        assert rebuilt.initialize_pipeline(rebuild=True)
+        reloaded = make_agent(tmp, "store")
+        assert reloaded.load_vector_store()
+        assert indexed_chunks(reloaded) == indexed_chunks(rebuilt)
+        assert {doc_id.split("::")[0] for doc_id in indexed_chunks(reloaded)} == {kept.name, changed.name, added.name}
+        assert len(reloaded.keyword_index) == len(indexed_chunks(rebuilt))
+
+    print("✓ Refresh equals a rebuild without re-embedding unchanged files\n")
+    return True
+
+def test_cv_updates():
+    """Test adding, replacing and deleting single CVs with incremental saves"""
+    print("✓ Testing single-CV updates...")
+    from benchmark import generate_corpus, write_docx
+
+    def make_agent(tmp, load_mode="memory"):
+        return CVRAGAgent(
+            cv_folder=os.path.join(tmp, "cv"),
+            vector_store_path=os.path.join(tmp, "store"),
+            conversion_cache_dir=None,
+            embedding_cache_path=None,
+            embedding_backend="hashing",
+            load_mode=load_mode
+        )
+
+    def chunks_by_source(agent):
+        store = agent.vector_store
+        chunks = {}
+        for position, doc_id in store.index_to_docstore_id.items():
+            doc = store.docstore.search(doc_id)
+            chunks.setdefault(doc.metadata["source"], {})[position] = doc.page_content
+        return chunks
+
+    with tempfile.TemporaryDirectory() as tmp:
+        first, second, third = generate_corpus(Path(tmp, "cv"), 3)
+        agent = make_agent(tmp)
+        assert agent.initialize_pipeline(rebuild=True)
+        total = agent.vector_store.index.ntotal
+        metadata_index = agent.metadata_index()
+
+        new_cv = Path(tmp, "new.docx")
+        write_docx(new_cv, ["New Person", "Kubernetes platform engineer. " * 80, "PMP certified"])
+        added = agent.add_cv(str(new_cv))
+        assert added > 1
+        assert agent.vector_store.index.ntotal == total + added
+        assert len(chunks_by_source(agent)["new.docx"]) == added
+
+        write_docx(new_cv, ["New Person", "Now a data analyst"])
+        assert agent.replace_cv(str(new_cv)) == 1
+        assert list(chunks_by_source(agent)["new.docx"].values()) == ["New Person\n\nNow a data analyst"]
+        assert agent.vector_store.index.ntotal == total + 1
+
+        assert agent.delete_cv("unknown.docx") is False
+        assert agent.delete_cv(second.name) is True
+        assert second.name not in chunks_by_source(agent)
+
+        # The metadata index was updated in place, not rebuilt
+        from metadata_index import MetadataIndex
+        assert agent.metadata_index() is metadata_index
+        rebuilt = MetadataIndex.build(agent.vector_store.index_to_docstore_id, agent.vector_store.docstore)
+        assert metadata_index.ids_by_position == rebuilt.ids_by_position
+        assert {field: dict(values) for field, values in metadata_index.postings.items()} == \
+            {field: dict(values) for field, values in rebuilt.postings.items()}
+
+        # Incremental saves: the reloaded store (both modes) matches memory
+        store_path = Path(tmp, "store")
+        assert (store_path / "bm25.log").exists() and not (store_path / "index.pkl").exists()
+        for load_mode in ("memory", "mmap"):
+            reloaded = make_agent(tmp, load_mode)
+            assert reloaded.load_vector_store()
+            assert chunks_by_source(reloaded) == chunks_by_source(agent)
+            assert len(reloaded.keyword_index) == reloaded.vector_store.index.ntotal
+            assert reloaded.keyword_index.search("analyst", k=1)[0][0].startswith("new.docx")
+            scoped = reloaded.metadata_index()
+            assert scoped.fields() == metadata_index.fields()
+            assert scoped.values("source") == metadata_index.values("source")
+            for source in metadata_index.values("source"):
+                positions = scoped.select({"source": [source, "unknown.docx"], "file_type": ".docx"})
+                assert positions.tolist() == metadata_index.select({"source": source}).tolist()
+                assert scoped.ids_for(positions) == metadata_index.ids_for(positions)
+            try:
+                scoped.select({"missing": "x"})
+                raise AssertionError("Expected an unknown field to be rejected")
+            except ValueError as e:
+                assert "Cannot filter on 'missing'" in str(e)
+
+        # Stores built before the manifest existed are matched on metadata
+        Path(agent.manifest_path).unlink()
+        legacy = make_agent(tmp)
+        try:
+            legacy.add_cv(str(new_cv))
+            raise AssertionError("Expected the indexed CV to be rejected")
+        except ValueError as e:
+            assert "already indexed" in str(e)
+        write_docx(new_cv, ["New Person", "Now a nurse"])
+        assert legacy.replace_cv(str(new_cv)) == 1
+        assert list(chunks_by_source(legacy)["new.docx"].values()) == ["New Person\n\nNow a nurse"]
+        assert legacy.delete_cv(third.name) is True
+        assert set(chunks_by_source(legacy)) == {first.name, "new.docx"}
+        assert legacy.delete_cv(third.name) is False
+
+    print("✓ Single-CV updates keep the saved store consistent\n")
+    return True
+
+def test_conversion_cache():
+    """Test that converted Markdown round-trips through the cache"""
+    print("✓ Testing conversion cache...")
+    from conversion_cache import ConversionCache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        cv_file = tmp / "cv.pdf"
+        cv_file.write_bytes(b"%PDF fake")
+
+        cache = ConversionCache(str(tmp / "cache"))
+        assert cache.get(cv_file) is None
+        cache.put(cv_file, "# Jane Doe\n\nPython developer")
+        assert cache.get(cv_file) == "# Jane Doe\n\nPython developer"
+
+        cv_file.write_bytes(b"%PDF changed")
+        assert cache.get(cv_file) is None
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    print("✓ Conversion cache works\n")
+    return True
+
+def fake_convert(file_path):
+    """Module-level stand-in for MarkItDown that hangs or fails on request"""
+    import time
+    name = Path(file_path).stem
+    if name.startswith("hang"):
+        time.sleep(60)
+    if name.startswith("boom"):
+        raise ValueError(f"cannot parse {name}")
+    return name.upper()
+
+def test_parallel_conversion():
+    """Test that hung and failing conversions are reported without losing the rest"""
+    print("✓ Testing parallel conversion timeouts...")
+    import time
+    from document_conversion import iter_convert_files
+
+    names = ["ok1", "hang", "ok2", "boom", "ok3"]
+    files = [Path(f"{name}.pdf") for name in names]
+    # One worker: the files behind the hung one wait in the queue and then
+    # on a restarted pool, neither of which may count against their timeout
+    results = list(iter_convert_files(files, max_workers=1, timeout=1.0, converter=fake_convert))
+
+    assert [path for path, _, _ in results] == files
+    assert [text for _, text, _ in results] == ["OK1", None, "OK2", None, "OK3"]
+    assert results[1][2] == "timed out after 1.0s"
+    assert "cannot parse boom" in results[3][2]
+
+    # A consumer slower than the timeout still receives conversions that
+    # finished long before it asked for them
+    fast = [Path(f"ok{i}.pdf") for i in range(3)]
+    received = []
+    for path, text, error in iter_convert_files(fast, max_workers=1, timeout=0.5, converter=fake_convert):
+        received.append((path, text, error))
+        time.sleep(1.0)
+    assert received == [(path, f"OK{i}", None) for i, path in enumerate(fast)]
+
+    print("✓ Hung and failing files are skipped\n")
+    return True
+
+class FlakyEmbeddings:
+    """Local fake embedder that answers every other request with a 429"""
+
+    def __init__(self, fail_after: int = None):
+        self.calls = 0
+        self.embedded = 0
+        self.fail_after = fail_after
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.fail_after is not None and self.embedded >= self.fail_after:
+            raise RuntimeError("Permanent failure")
+        if self.calls % 2 == 1:
+            raise RuntimeError("429 Resource has been exhausted (e.g. check quota).")
+        self.embedded += len(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+def test_batch_embedder():
+    """Test batching, 429 retries and checkpoint resume of the embedding engine"""
+    print("✓ Testing batched embedding engine...")
+    from embedding_engine import BatchEmbedder
+
+    texts = [f"chunk {i}" * (i + 1) for i in range(10)]
+    with tempfile.TemporaryDirectory() as tmp:
+        flaky = FlakyEmbeddings(fail_after=4)
+        embedder = BatchEmbedder(flaky, batch_size=2, max_concurrency=1,
+                                 checkpoint_dir=tmp, sleep=lambda _: None)
+        try:
+            embedder.embed(texts)
+            raise AssertionError("Expected the permanent failure to propagate")
+        except RuntimeError as e:
+            assert "Permanent" in str(e)
+
+        # Checkpoints of another model are not reused
+        other = FlakyEmbeddings()
+        embedder = BatchEmbedder(other, batch_size=2, max_concurrency=1, checkpoint_dir=tmp,
+                                 model_name="other-model", sleep=lambda _: None)
+        embedder.embed(texts)
+        assert other.embedded == len(texts)
+
+        resumed = FlakyEmbeddings()
+        embedder = BatchEmbedder(resumed, batch_size=2, max_concurrency=3,
+                                 requests_per_minute=6000, checkpoint_dir=tmp,
+                                 sleep=lambda _: None)
+        vectors = embedder.embed(texts)
+        assert vectors == [[float(len(text)), 1.0] for text in texts]
+        assert resumed.embedded == 6
+
+    print("✓ Embedding engine retries and resumes\n")
+    return True
+
+def test_embedding_cache():
+    """Test embedding cache hits, misses and LRU eviction"""
+    print("✓ Testing embedding cache...")
+    from embedding_cache import CachedEmbeddings, EmbeddingCache
+
+    class CountingEmbeddings:
+        model = "fake-model"
+        embedded = 0
+
+        def embed_documents(self, texts):
+            self.embedded += len(texts)
+            return [[float(len(text))] * 3 for text in texts]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EmbeddingCache(os.path.join(tmp, "emb.sqlite"), max_entries=3)
+        base = CountingEmbeddings()
+        cached = CachedEmbeddings(base, cache)
+
+        first = cached.embed_documents(["a", "bb", "a"])
+        second = cached.embed_documents(["a", "bb"])
+        assert first == [[1.0] * 3, [2.0] * 3, [1.0] * 3]
+        assert second == first[:2]
+        assert base.embedded == 2
+        assert (cache.hits, cache.misses) == (2, 3)
+
+        cached.embed_documents(["ccc", "dddd"])
+        assert len(cache) == 3 and cache.evictions == 1
+        cache.close()
+
+        # Buffered access times are written before evicting
+        cache = EmbeddingCache(os.path.join(tmp, "lru.sqlite"), max_entries=2)
+        cache.put_many({"x": [1.0]})
+        cache.put_many({"y": [2.0]})
+        assert cache.get_many(["x"]) == {"x": [1.0]}
+        cache.put_many({"z": [3.0]})
+        assert set(cache.get_many(["x", "y", "z"])) == {"x", "z"}
+        cache.close()
+        reopened = EmbeddingCache(os.path.join(tmp, "lru.sqlite"), max_entries=2)
+        assert len(reopened) == 2
+        reopened.close()
+
+    print("✓ Embedding cache works\n")
+    return True
+
+def test_async_queries():
+    """Test concurrent abatch_query with failure isolation and off-loop cache I/O"""
+    print("✓ Testing async batch queries...")
+    import asyncio
+    import threading
+    import time
+    from langchain_core.documents import Document
+    from langchain_core.language_models import FakeListChatModel
+
+    class SlowModel(FakeListChatModel):
+        def _call(self, messages, *args, **kwargs):
+            time.sleep(0.2)
+            if "broken question" in str(messages):
+                raise RuntimeError("LLM unavailable")
+            return super()._call(messages, *args, **kwargs)
+
+    chunks = [
+        Document(id=f"cv{i}.pdf::0", page_content=f"Candidate {i} knows {skill}", metadata={"source": f"cv{i}.pdf"})
+        for i, skill in enumerate(["Python", "Java", "Accounting"])
+    ]
+    questions = [f"Who knows skill number {i}?" for i in range(5)] + ["A broken question"]
+    with tempfile.TemporaryDirectory() as tmp:
+        agent = CVRAGAgent(
+            vector_store_path=tmp, conversion_cache_dir=None, answer_cache_size=0,
+            embedding_cache_path=os.path.join(tmp, "emb.sqlite"), embedding_backend="hashing"
+        )
+        agent.create_vector_store(chunks)
+        agent.llm = SlowModel(responses=["Candidate 0 knows Python"])
+
+        cache_threads = set()
+        get_many = agent.embedding_cache.get_many
+
+        def recording_get_many(keys):
+            cache_threads.add(threading.current_thread())
+            return get_many(keys)
+
+        agent.embedding_cache.get_many = recording_get_many
+
+        async def run():
+            loop_thread = threading.current_thread()
+            start = time.perf_counter()
+            results = await agent.abatch_query(questions, max_concurrency=6)
+            return results, time.perf_counter() - start, loop_thread
+
+        results, elapsed, loop_thread = asyncio.run(run())
+        agent.embedding_cache.close()
+
+    assert [r["question"] for r in results] == questions
+    assert all(r["answer"] == "Candidate 0 knows Python" for r in results[:5])
+    assert results[5]["answer"] is None and "LLM unavailable" in results[5]["error"]
+    assert elapsed < len(questions) * 0.2
+    assert cache_threads and loop_thread not in cache_threads
+
+    print("✓ Batch queries run concurrently without blocking the event loop\n")
+    return True
+
+def test_query_stream():
+    """Test the streamed event sequence and its rendering in the CLI"""
+    print("✓ Testing streaming answers...")
+    import contextlib
+    import io
+    from unittest import mock
+    from langchain_core.documents import Document
+    from langchain_core.language_models import FakeListChatModel
+    from interactive_rag import InteractiveCVRAG
+
+    chunks = [
+        Document(id=f"cv{i}.pdf::0", page_content=f"Candidate {i} knows {skill}", metadata={"source": f"cv{i}.pdf"})
+        for i, skill in enumerate(["Python", "Java", "Accounting"])
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        agent = CVRAGAgent(
+            vector_store_path=tmp, conversion_cache_dir=None, embedding_cache_path=None,
+            embedding_backend="hashing", retrieval_mode="keyword"
+        )
+        agent.create_vector_store(chunks)
+        # FakeListChatModel streams its answer one character at a time
+        agent.llm = FakeListChatModel(responses=["Candidate 0 knows Python"])
+
+        events = list(agent.query_stream("Who knows Python?"))
+        assert events[0]["type"] == "sources" and events[0]["sources"][0] == "cv0.pdf" and not events[0]["cached"]
+        assert {e["type"] for e in events[1:-1]} == {"token"} and len(events) > 3
+        assert "".join(e["content"] for e in events[1:-1]) == "Candidate 0 knows Python"
+        assert events[-1] == {"type": "done", "cached": False}
+
+        cached = list(agent.query_stream("Who knows Python?"))
+        assert [e["type"] for e in cached] == ["sources", "token", "done"] and cached[0]["cached"]
+
+        cli = InteractiveCVRAG()
+        cli.agent, cli.initialized = agent, True
+        output = io.StringIO()
+        with mock.patch("builtins.input", return_value="Who knows Java?"), contextlib.redirect_stdout(output):
+            cli.ask_question()
+        lines = output.getvalue().splitlines()
+        assert any(line.startswith("Sources: cv1.pdf") for line in lines)
+        assert lines[lines.index("Response:") + 2] == "Candidate 0 knows Python"
+        assert lines[-1] == "-" * 80
+
+    print("✓ Sources, tokens and done are streamed and rendered\n")
+    return True
+
+def test_answer_cache():
+    """Test exact, semantic, TTL and LRU behaviour of the answer cache"""
+    print("✓ Testing semantic answer cache...")
+    from answer_cache import SemanticAnswerCache
+
+    now = [0.0]
+    cache = SemanticAnswerCache(max_entries=2, ttl_seconds=10,
+                                similarity_threshold=0.9, clock=lambda: now[0])
+    cache.put("Which candidates know Python?", [1.0, 0.0], "Alice")
+    assert cache.get_exact("which candidates know python") == "Alice"
+    assert cache.get_similar([0.99, 0.05]) == "Alice"
+    assert cache.get_similar([0.0, 1.0]) is None
+
+    cache.put("q2", [0.0, 1.0], "Bob")
+    cache.put("q3", [0.7, 0.7], "Carol")
+    assert cache.get_exact("Which candidates know Python?") is None  # evicted
+
+    now[0] = 11.0
+    assert cache.get_exact("q3") is None  # expired
+
+    cache.put("q4", [1.0, 1.0], "Dan")
+    cache.invalidate()
+    assert len(cache) == 0
+
+    print("✓ Answer cache works\n")
+    return True
+
+def test_hashing_backend():
+    """Test an offline index build with the local hashing embedding backend"""
+    print("✓ Testing local hashing embedding backend...")
+    cv_folder = Path(__file__).parent / "cv"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        agent = CVRAGAgent(
+            cv_folder=str(cv_folder),
+            vector_store_path=os.path.join(tmp, "store"),
+            conversion_cache_dir=os.path.join(tmp, "markdown"),
+            embedding_cache_path=None,
+            embedding_backend="hashing"
+        )
+        assert agent.initialize_pipeline(rebuild=True)
+        assert agent.vector_store.index.d == 1024
+
+        mapped = CVRAGAgent(
+            cv_folder=str(cv_folder),
+            vector_store_path=os.path.join(tmp, "store"),
+            embedding_cache_path=None,
+            embedding_backend="hashing",
+            load_mode="mmap"
+        )
+        assert mapped.load_vector_store()
+        # The keyword index is read on the first hybrid retrieval, not at startup
+        assert mapped._keyword_index is None and mapped._keyword_index_loader is not None
+        question = "python experience"
+        query = agent.embeddings.embed_query(question)
+        assert [d.page_content for d in mapped._retrieve(question, query)] == \
+            [d.page_content for d in agent._retrieve(question, query)]
+        assert len(mapped._keyword_index) == agent.vector_store.index.ntotal
+
+        # Without a saved keyword index, mmap mode searches vectors only
+        # instead of rebuilding BM25 from every chunk
+        Path(tmp, "store", "bm25.json").unlink()
+        assert mapped.load_vector_store()
+        assert mapped.keyword_index is None
+        assert mapped._retrieve(question, query)
+
+        mismatched = CVRAGAgent(
+            cv_folder=str(cv_folder),
+            vector_store_path=os.path.join(tmp, "store"),
+            embedding_cache_path=None,
+            embedding_backend="hashing",
+            embedding_dimension=256
+        )
+        try:
+            mismatched.load_vector_store()
+            raise AssertionError("Expected a backend mismatch error")
+        except ValueError as e:
+            assert "built with backend" in str(e)
+
+    print("✓ Hashing backend builds and guards its index\n")
+    return True
+
+def test_index_factory():
+    """Test approximate index types against exact search"""
+    print("✓ Testing FAISS index factory...")
+    import numpy as np
+    from index_factory import recall_report
+
+    vectors = np.random.default_rng(0).normal(size=(2000, 16)).astype(np.float32)
+    rows = recall_report(vectors, {
+        "hnsw": {"index_type": "hnsw", "ef_search": 128},
+        "ivf_flat all lists": {"index_type": "ivf_flat", "nlist": 8, "nprobe": 8},
+    }, k=5, n_queries=20)
+
+    recalls = {row["config"]: row["recall_at_k"] for row in rows}
+    assert recalls["exact (flat)"] == 1.0
+    assert recalls["ivf_flat all lists"] == 1.0
+    assert recalls["hnsw"] > 0.9
+
+    # Corpora smaller than the PQ codebook or the requested nlist still build
+    from index_factory import build_index
+    for n_vectors in (1, 40, 100):
+        small = vectors[:n_vectors]
+        for index_type in ("ivf_flat", "ivf_pq"):
+            index = build_index(index_type, small, {"nlist": 64})
+            index.add(small)
+            assert index.search(small[:1], 1)[1][0][0] == 0, (index_type, n_vectors)
+
+    print("✓ Index factory builds searchable indexes\n")
+    return True
+
+def test_keyword_index():
+    """Test BM25 keyword search, persistence and rank fusion"""
+    print("✓ Testing BM25 keyword index...")
+    from keyword_index import BM25Index, reciprocal_rank_fusion
+
+    index = BM25Index()
+    index.add(
+        ["a::0", "b::0", "c::0"],
+        ["Senior Python developer, Django and AWS", "Accountant with Excel and SAP", "C++ and Python engineer"]
+    )
+    assert [doc_id for doc_id, _ in index.search("python aws", 3)] == ["a::0", "c::0"]
+    assert index.search("c++")[0][0] == "c::0"
+
+    index.remove(["a::0"])
+    with tempfile.TemporaryDirectory() as tmp:
+        index.save(tmp)
+        loaded = BM25Index.load(tmp)
+    assert len(loaded) == 2
+    assert [doc_id for doc_id, _ in loaded.search("python")] == ["c::0"]
+
+    fused = reciprocal_rank_fusion([["x", "y", "z"], ["y", "x"]])
+    assert {doc_id for doc_id, _ in fused[:2]} == {"x", "y"} and fused[2][0] == "z"
+
+    print("✓ Keyword index ranks, persists and fuses results\n")
+    return True
+
+def test_metadata_filter():
+    """Test metadata pre-filtering and filtered vector search"""
+    print("✓ Testing metadata filters...")
+    import numpy as np
+    from index_factory import build_index, filtered_search
+    from langchain_core.documents import Document
+    from metadata_index import MetadataIndex
+
+    sources = [f"cv{i % 10}.pdf" for i in range(1000)]
+    docstore = {f"id{i}": Document(page_content="", metadata={"source": source, "start_index": i})
+                for i, source in enumerate(sources)}
+    metadata_index = MetadataIndex.build(
+        {i: f"id{i}" for i in range(len(sources))},
+        type("Store", (), {"search": staticmethod(docstore.get)})
+    )
+    positions = metadata_index.select({"source": ["cv3.pdf", "cv7.pdf"]})
+    assert len(positions) == 200 and all(sources[p] in ("cv3.pdf", "cv7.pdf") for p in positions)
+    assert metadata_index.fields() == ["source"]
+
+    vectors = np.random.default_rng(0).normal(size=(1000, 16)).astype(np.float32)
+    query = vectors[:1] + 0.01
+    distances = ((vectors[positions] - query) ** 2).sum(axis=1)
+    expected = set(positions[np.argsort(distances)[:5]])
+    for index_type in ("flat", "hnsw", "ivf_flat"):
+        index = build_index(index_type, vectors, {"nlist": 16, "nprobe": 1})
+        index.add(vectors)
+        _, found = filtered_search(index, query, 5, positions)
+        assert set(found[0]) == expected, index_type
+
+    print("✓ Filters restrict the search to the selected chunks\n")
+    return True
+
+def test_analysis_cache():
+    """Test that repeated CV analyses are served without an LLM call"""
+    print("✓ Testing CV analysis cache...")
+    from unittest import mock
+    from langchain_core.language_models import FakeListChatModel
+
+    with tempfile.TemporaryDirectory() as tmp, mock.patch.dict(os.environ, {"GOOGLE_API_KEY": "test"}):
+        from cv_analyzer import CVAnalyzer
+
+        analyzer = CVAnalyzer(conversion_cache_dir=None, analysis_cache_path=os.path.join(tmp, "analysis.sqlite"))
+        analyzer.llm = FakeListChatModel(responses=['{"Full Name": "Jane"}', '{"Full Name": "John"}'])
+
+        first = analyzer.analyze_cv("Jane's CV", "jane")
+        again = analyzer.analyze_cv("Jane's CV", "jane")
+        other = analyzer.analyze_cv("John's CV", "john")
+
+    assert first == again == {"Full Name": "Jane", "cv_text": "Jane's CV"}
+    assert other["Full Name"] == "John"
+    assert analyzer.analysis_cache.stats()["hits"] == 1
+
+    print("✓ Cached analyses skip the LLM call\n")
+    return True
+
+def test_collect_cvs_pipeline():
+    """Test concurrent CV analysis with failure isolation and stable order"""
+    print("✓ Testing pipelined CV collection...")
+    import time
+    from unittest import mock
+    from langchain_core.language_models import FakeListChatModel
+
+    class SlowModel(FakeListChatModel):
+        def _call(self, messages, *args, **kwargs):
+            time.sleep(0.2)
+            if "Candidate 2" in str(messages):
+                raise RuntimeError("LLM unavailable")
+            return super()._call(messages, *args, **kwargs)
+
+    with tempfile.TemporaryDirectory() as tmp, mock.patch.dict(os.environ, {"GOOGLE_API_KEY": "test"}):
+        from cv_analyzer import CVAnalyzer
+
+        for i in range(6):
+            Path(tmp, f"cv{i}.md").write_text(f"Candidate {i}")
+        analyzer = CVAnalyzer(conversion_cache_dir=None, analysis_cache_path=None)
+        analyzer.llm = SlowModel(responses=['{"score": 1}'])
+
+        start = time.perf_counter()
+        analyzer.collect_cvs(tmp, analysis_concurrency=6)
+        elapsed = time.perf_counter() - start
+
+    assert [c["cv_text"].strip() for c in analyzer.candidates] == [f"Candidate {i}" for i in (0, 1, 3, 4, 5)]
+    assert elapsed < 6 * 0.2
+
+    print("✓ CVs are analyzed concurrently in stable order\n")
+    return True
+
+def test_candidate_ranking():
+    """Test local shortlisting and tournament ranking of candidates"""
+    print("✓ Testing two-stage candidate ranking...")
+    import json
+    from candidate_ranking import CandidateRanker
+
+    candidates = [{
+        "Full Name": f"Candidate {i}",
+        "Years of Experience": i % 10,
+        "Top 5 Key Skills": ["Python", "Django", "AWS"] if i % 3 == 0 else ["Excel", "Accounting"],
+        "cv_text": "full CV text " * 500,
+    } for i in range(30)]
+
+    prompts = []
+    def python_first(requirements, candidates_data):
+        prompts.append(candidates_data)
+        rows = [json.loads(line) for line in candidates_data.splitlines()]
+        rows.sort(key=lambda row: "Python" not in row["skills"])
+        return "```json\n" + json.dumps([{"candidate_name": row["candidate_name"]} for row in rows]) + "\n```"
+
+    ranker = CandidateRanker(python_first, top_k=12, group_size=4)
+    rankings = ranker.rank(candidates, "Python developer with 5+ years of Django and AWS")
+
+    assert len(rankings) == 12 and [r["rank"] for r in rankings] == list(range(1, 13))
+    assert all(int(r["candidate_name"].split()[-1]) % 3 == 0 for r in rankings[:6])
+    assert len(prompts) > 1 and all("full CV text" not in p for p in prompts)
+    assert max(len(p.splitlines()) for p in prompts) <= 4
+
+    # Skill overlap counts the required skills covered, not the share of the
+    # candidate's own skills that were asked for
+    narrow = {"Full Name": "Narrow", "Top 5 Key Skills": ["Python"]}
+    broad = {"Full Name": "Broad", "Top 5 Key Skills": ["Python", "Django", "AWS", "Excel", "Accounting", "Sales"]}
+    narrow_score, broad_score = ranker.local_scores([narrow, broad], "Python developer with Django and AWS")
+    assert broad_score > narrow_score
+
+    print("✓ Only a compact top-K shortlist reaches the LLM\n")
+    return True
+
+def test_context_packing():
+    """Test merging of overlapping chunks and packing to a token budget"""
+    print("✓ Testing context packing...")
+    from langchain_core.documents import Document
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from context_packing import estimate_tokens, format_passage, pack_context
+
+    text = " ".join(f"word{i}" for i in range(600))
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100, add_start_index=True)
+    chunks = splitter.create_documents([text], metadatas=[{"source": "jane.pdf"}])
+    other = Document(page_content="Accountant with SAP", metadata={"source": "john.pdf", "start_index": 0})
+
+    # Chunks 2, 0, 1 overlap and merge back into the original text once
+    packed = pack_context([chunks[2], other, chunks[0], chunks[1], chunks[0]])
+    assert [doc.metadata["source"] for doc in packed] == ["jane.pdf", "john.pdf"]
+    assert text.startswith(packed[0].page_content) and packed[0].metadata["merged_chunks"] == 3
+    assert packed[0].page_content.count("word10 ") == 1
+
+    # Non-adjacent chunks stay separate; the budget cuts the last passage
+    packed = pack_context([chunks[0], chunks[4], other], token_budget=200)
+    assert len(packed) == 2 and packed[1].metadata.get("truncated")
+    assert sum(estimate_tokens(format_passage(doc)) for doc in packed) <= 200
+
+    print("✓ Overlapping chunks merged and packed to the budget\n")
+    return True
+
+def test_adaptive_retrieval():
+    """Test relevance cutoffs, the min/max k range and MMR source diversity"""
+    print("✓ Testing adaptive retrieval...")
+    from langchain_core.documents import Document
+
+    skills = ["Python Django", "Java Spring", "Accounting SAP Excel", "Nursing patient care", "Kubernetes AWS"]
+    chunks = [
+        Document(
+            id=f"cv{c}.pdf::{j}",
+            page_content=f"Candidate {c} section {j}: experience with {skills[(c + j) % 5]} and teamwork across projects.",
+            metadata={"source": f"cv{c}.pdf", "start_index": j * 200}
+        )
+        for c in range(6) for j in range(5)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        agent = CVRAGAgent(
+            vector_store_path=tmp, conversion_cache_dir=None, embedding_cache_path=None, embedding_backend="hashing"
+        )
+        agent.create_vector_store(chunks)
+        # Narrow question: only the six nursing chunks pass the cutoff
+        narrow = agent._retrieve("Nursing patient care")
+        assert {doc.page_content.split(": ")[1][:27] for doc in narrow} == {"experience with Nursing pat"}
+        assert len(agent._retrieve("experience and teamwork across projects")) == agent.retrieval_max_k
+        assert len(agent._retrieve("Nursing", k=5)) == 5
+
+        agent.retrieval_mmr_lambda = 0.5
+        broad = agent._retrieve("experience and teamwork across projects")
+        assert len({doc.metadata["source"] for doc in broad[:6]}) == 6
+
+    # Hybrid mode keeps chunks only BM25 found, even when vector search
+    # prefers look-alike chunks sharing no term with the question, and looks
+    # their vectors up without scanning the docstore
+    certified = [
+        Document(id=f"pmp{c}.pdf::0", page_content=f"Credentials: PMP, renewed in 201{c}", metadata={"source": f"pmp{c}.pdf"})
+        for c in range(3)
+    ]
+    lookalikes = [
+        Document(id=f"faq{c}.pdf::0", page_content="Whose holdings and certifications?", metadata={"source": f"faq{c}.pdf"})
+        for c in range(3)
+    ]
+    for load_mode in ("memory", "mmap"):
+        with tempfile.TemporaryDirectory() as tmp:
+            agent = CVRAGAgent(
+                vector_store_path=tmp, conversion_cache_dir=None, embedding_cache_path=None,
+                embedding_backend="hashing", load_mode=load_mode
+            )
+            agent.create_vector_store(chunks + certified + lookalikes)
+            agent.save_vector_store()
+            assert agent.load_vector_store()
+            dense_search = agent._dense_search
+            agent._dense_search = lambda *args: [
+                (position, doc_id) for position, doc_id in dense_search(*args) if not doc_id.startswith("pmp")
+            ]
+            found = {doc.id for doc in agent._retrieve("Who holds a PMP certification?")}
+            assert {doc.id for doc in certified} <= found, found
+            assert agent._metadata_index is None
+
+    print("✓ Retrieval depth adapts to the question\n")
+    return True
+
+def test_ingest_pipeline():
+    """Test bounded queues, error propagation and streaming index builds"""
+    print("✓ Testing streaming ingestion pipeline...")
+    import time
+    from langchain_core.embeddings import Embeddings
+    from benchmark import generate_corpus
+    from ingest_pipeline import IngestPipeline
+
+    produced = []
+    in_flight = []
+
+    def source(_):
+        for i in range(200):
+            produced.append(i)
+            yield i
+
+    def sink(items):
+        for consumed, item in enumerate(items, 1):
+            in_flight.append(len(produced) - consumed)
+            time.sleep(0.001)
+
+    pipeline = IngestPipeline(queue_size=4)
+    pipeline.add_stage("source", source).add_stage("double", lambda items: (2 * item for item in items))
+    stats = pipeline.run("sink", sink)
+    assert [s.items for s in stats] == [200, 200, 200]
+    # Two queues of 4, plus one item held by each stage
+    assert max(in_flight) <= 2 * 4 + 2
+    assert stats[-1].busy_seconds > 0 and "items/s" in pipeline.report()
+
+    def failing(items):
+        for item in items:
+            if item == 50:
+                raise RuntimeError("bad document")
+            yield item
+
+    try:
+        IngestPipeline(queue_size=4).add_stage("source", source).add_stage("fail", failing).run("sink", sink)
+        raise AssertionError("Expected the stage error to propagate")
+    except RuntimeError as e:
+        assert str(e) == "bad document"
+
+    cv_folder = Path(__file__).parent / "cv"
+    with tempfile.TemporaryDirectory() as tmp:
+        agent = CVRAGAgent(
+            cv_folder=str(cv_folder),
+            vector_store_path=os.path.join(tmp, "store"),
+            conversion_cache_dir=os.path.join(tmp, "markdown"),
+            embedding_cache_path=None,
+            embedding_backend="hashing",
+            ingest_batch_size=3
+        )
+        assert agent.build_vector_store_streaming()
+        expected = agent.chunk_documents(agent.load_documents())
+        assert agent.vector_store.index.ntotal == len(expected) == len(agent.keyword_index)
+        assert sorted(agent.vector_store.index_to_docstore_id.values()) == sorted(chunk.id for chunk in expected)
+        assert (Path(tmp) / "store" / "manifest.json").exists()
+
+        # A failed rebuild keeps the loaded index and checkpoints what it embedded
+        class FailingEmbeddings(Embeddings):
+            def __init__(self, base, fail_after=None):
+                self.base, self.fail_after, self.embedded = base, fail_after, []
+
+            def embed_documents(self, texts):
+                if self.fail_after is not None and len(self.embedded) >= self.fail_after:
+                    raise RuntimeError("embedding service down")
+                self.embedded.extend(texts)
+                return self.base.embed_documents(texts)
+
+            def embed_query(self, text):
+                return self.base.embed_query(text)
+
+        generate_corpus(Path(tmp, "generated"), 4)
+        agent = CVRAGAgent(
+            cv_folder=os.path.join(tmp, "generated"),
+            vector_store_path=os.path.join(tmp, "generated_store"),
+            conversion_cache_dir=None,
+            embedding_cache_path=None,
+            embedding_backend="hashing",
+            ingest_batch_size=1
+        )
+        assert agent.build_vector_store_streaming()
+        expected = agent.chunk_documents(agent.load_documents())
+        loaded, base = agent.vector_store, agent.embeddings
+        agent.embeddings = FailingEmbeddings(base, fail_after=1)
+        try:
+            agent.build_vector_store_streaming()
+            raise AssertionError("Expected the embedding failure to propagate")
+        except RuntimeError as e:
+            assert str(e) == "embedding service down"
+        assert agent.vector_store is loaded and loaded.index.ntotal == len(expected)
+        assert list(agent.embedding_checkpoint_dir.glob("*.npz"))
+
+        agent.embeddings = FailingEmbeddings(base)
+        assert agent.build_vector_store_streaming()
+        assert 0 < len(agent.embeddings.embedded) < len(expected)
+        assert agent.vector_store.index.ntotal == len(expected)
+        assert not agent.embedding_checkpoint_dir.exists()
+
+    print("✓ Pipeline stages stream through bounded queues\n")
+    return True
+
+def test_benchmark_suite():
+    """Test the offline benchmark on a tiny synthetic corpus"""
+    print("✓ Testing offline benchmark suite...")
+    import json
+    from benchmark import compare, run_benchmark
+
+    report = run_benchmark([3], n_queries=4, dimension=64)
+    stages = {row["stage"]: row for row in report["results"]}
+    for stage in ("load_documents_cold", "chunk_documents", "create_vector_store",
+                  "load_vector_store_memory", "load_vector_store_mmap", "query_simple"):
+        assert stages[stage]["p50_ms"] > 0, stage
+    assert stages["query_simple"]["runs"] == 4 and stages["corpus"]["documents"] == 3
+    json.dumps(report)
+
+    slower = json.loads(json.dumps(report))
+    for row in slower["results"]:
+        if row["stage"] == "query_simple":
+            row["p50_ms"] = row["p50_ms"] * 3 + 5
+    assert [row["stage"] for row in compare(report, slower)] == ["query_simple"]
+    assert compare(report, report) == []
+
+    print("✓ Benchmark runs offline and detects regressions\n")
+    return True
+
+def test_metrics():
+    """Test stage spans, LLM usage counters and the metric exports"""
+    print("✓ Testing pipeline metrics...")
+    import json
+    from langchain_core.documents import Document
+    from langchain_core.language_models import FakeListChatModel
+    from metrics import MetricsRegistry
+
+    registry = MetricsRegistry()
+    with registry.span("outer") as outer:
+        with registry.span("inner"):
+            pass
+    try:
+        with registry.span("failing"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    inner, = registry.spans("inner")
+    assert inner["parent_id"] == outer["span_id"] and inner["trace_id"] == outer["trace_id"]
+    assert registry.spans("failing")[0]["error"] == "ValueError: boom"
+    registry.record_llm_usage("query", prompt_chars=400, response_chars=40)
+    assert registry.counter_value("rag_llm_prompt_tokens_total", operation="query") == 100
+
+    chunks = [
+        Document(id=f"cv{i}.pdf::0", page_content=f"Candidate {i} knows {skill}", metadata={"source": f"cv{i}.pdf"})
+        for i, skill in enumerate(["Python", "Java", "Accounting"])
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = MetricsRegistry()
+        agent = CVRAGAgent(
+            vector_store_path=tmp, conversion_cache_dir=None, embedding_cache_path=None,
+            embedding_backend="hashing", metrics=registry
+        )
+        agent.create_vector_store(chunks)
+        agent.llm = FakeListChatModel(responses=["Candidate 0 knows Python"])
+        agent.query_simple("Who knows Python?")
+        agent.query_simple("Who knows Python?")
+
+        # The async and streaming paths used by the service and the CLI are
+        # timed the same way, even when every step of the stream is resumed
+        # in another thread as the service does
+        import asyncio
+
+        async def serve():
+            answer = await agent.aquery("Who knows Java?")
+            stream = agent.query_stream("Who knows Accounting?")
+            events = []
+            while (event := await asyncio.to_thread(next, stream, None)) is not None:
+                events.append(event)
+            return answer, events
+
+        agent.llm = FakeListChatModel(responses=["Candidate 1", "Candidate 2"])
+        answer, events = asyncio.run(serve())
+        assert answer == "Candidate 1" and events[-1] == {"type": "done", "cached": False}
+        assert list(agent.query_stream("Who knows Accounting?"))[-1] == {"type": "done", "cached": True}
+
+    query = registry.spans("query")
+    assert [span["attributes"]["cache"] for span in query] == ["miss", "exact", "miss", "miss", "exact"]
+    for span in (query[0], query[2], query[3]):
+        children = {child["name"] for child in registry.spans() if child["parent_id"] == span["span_id"]}
+        assert {"embed_query", "retrieve", "build_prompt", "llm_generate"} <= children
+    assert registry.counter_value("rag_queries_total", cache="miss") == 3
+    assert registry.counter_value("rag_queries_total", cache="exact") == 2
+    assert registry.counter_value("rag_llm_calls_total", operation="query") == 1
+    assert registry.counter_value("rag_llm_response_characters_total", operation="query") == 24
+
+    text = registry.to_prometheus()
+    assert 'rag_stage_duration_seconds_count{stage="llm_generate"} 3' in text
+    assert 'rag_llm_calls_total{operation="query"} 1' in text
+    assert json.loads(registry.to_json())["counters"]["rag_queries_total"]
+
+    print("✓ Stages are timed and LLM usage is counted\n")
+    return True
+
+def test_profiling():
+    """Test CPU, sampled-stack and per-stage memory profiles of a build"""
+    print("✓ Testing profiling mode...")
+    import json
+    import metrics
+    from profiling import Profiler, profile_run
+
+    cv_folder = Path(__file__).parent / "cv"
+    with tempfile.TemporaryDirectory() as tmp:
+        agent = CVRAGAgent(
+            cv_folder=str(cv_folder),
+            vector_store_path=os.path.join(tmp, "store"),
+            conversion_cache_dir=os.path.join(tmp, "markdown"),
+            embedding_cache_path=None,
+            embedding_backend="hashing",
+            metrics=metrics.MetricsRegistry()
+        )
+        profiler = Profiler(os.path.join(tmp, "profile"), "build", sample_interval=0.001)
+        with profiler:
+            assert agent.initialize_pipeline(rebuild=True)
+
+        assert metrics._span_listeners == ()
+        paths = profiler.paths
+        assert "initialize_pipeline" in Path(paths["text"]).read_text(encoding="utf-8")
+        stacks = Path(paths["collapsed"]).read_text(encoding="utf-8").splitlines()
+        assert stacks and all(line.rsplit(" ", 1)[1].isdigit() for line in stacks)
+        memory = json.loads(Path(paths["memory"]).read_text(encoding="utf-8"))
+        assert memory["initialize_pipeline"]["peak_bytes"] >= memory["ingest"]["peak_bytes"] > 0
+        assert memory["ingest"]["top_allocations"]
+
+        with profile_run(None, "off"):
+            pass
+        assert not (Path(tmp) / "off").exists()
+
+    print("✓ Profiles and stage peaks are written\n")
+    return True
+
+def test_query_service():
+    """Test the ASGI service: readiness, queries, streaming, backpressure, ingest"""
+    print("✓ Testing HTTP query service...")
+    import asyncio
+    import json
+    import time
+    import httpx
+    from langchain_core.language_models import FakeListChatModel
+    from benchmark import generate_corpus, write_docx
+    from metrics import MetricsRegistry
+    from rag_service import RAGService
+
+    class SlowModel(FakeListChatModel):
+        def _call(self, messages, *args, **kwargs):
+            time.sleep(0.2)
+            return super()._call(messages, *args, **kwargs)
+
+    async def exercise(service: RAGService, tmp: str):
+        transport = httpx.ASGITransport(app=service)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            assert (await client.get("/health/live")).status_code == 200
+            assert (await client.get("/health/ready")).status_code == 503
+            assert (await client.post("/query", json={"question": "Python?"})).status_code == 503
+
+            await service.startup()
+            await service.loading
+            assert (await client.get("/health/ready")).json()["ready"]
+
+            response = await client.post("/query", json={"question": "Who knows Python?"})
+            assert response.status_code == 200 and response.json()["answer"] == "Jane knows Python"
+            assert (await client.post("/query", json={"question": ""})).status_code == 400
+
+            response = await client.post("/query/stream", json={"question": "Who knows Java?"})
+            events = [json.loads(line) for line in response.text.splitlines()]
+            assert events[0]["type"] == "sources" and events[0]["sources"]
+            assert "".join(e["content"] for e in events[1:-1]) == "Jane knows Python"
+            assert events[-1] == {"type": "done", "cached": False}
+
+            # 2 running + 1 queued are admitted, the rest are turned away
+            responses = await asyncio.gather(*(
+                client.post("/query", json={"question": f"Question {i}"}) for i in range(5)
+            ))
+            statuses = sorted(r.status_code for r in responses)
+            assert statuses == [200, 200, 200, 429, 429], statuses
+            assert "Retry-After" in [r for r in responses if r.status_code == 429][0].headers
+
+            service.query_timeout = 0.05
+            assert (await client.post("/query", json={"question": "Slow question"})).status_code == 504
+            service.query_timeout = 5
+            await asyncio.sleep(0.4)
+            assert (await client.get("/health/ready")).json()["queries_pending"] == 0
+
+            new_cv = Path(tmp, "upload", "new_hire.docx")
+            new_cv.parent.mkdir()
+            write_docx(new_cv, ["New Hire", "Rust and embedded firmware engineer"])
+            response = await client.post("/ingest?filename=new_hire.docx", content=new_cv.read_bytes())
+            assert response.status_code == 200 and response.json()["chunks"] > 0, response.text
+            response = await client.post("/ingest?filename=new_hire.docx", content=new_cv.read_bytes())
+            assert response.status_code == 400
+
+            # Server-side paths only from the configured ingest directory
+            path_ingest = {"path": "new_hire.docx", "replace": True}
+            assert (await client.post("/ingest", json=path_ingest)).status_code == 403
+            service.ingest_dir = str(new_cv.parent)
+            for outside in ("../cv/cv_000000.docx", str(Path(tmp, "cv", "cv_000000.docx")), "/etc/passwd"):
+                assert (await client.post("/ingest", json={"path": outside})).status_code == 403
+            response = await client.post("/ingest", json=path_ingest)
+            assert response.status_code == 200 and response.json()["source"] == "new_hire.docx", response.text
+            response = await client.post(
+                "/query", json={"question": "Who knows Rust?", "filter": {"source": "new_hire.docx"}}
+            )
+            assert response.status_code == 200
+
+            assert (await client.get("/nowhere")).status_code == 404
+            assert (await client.get("/query")).status_code == 405
+            metrics_text = (await client.get("/metrics")).text
+            assert 'rag_http_requests_total{endpoint="/query",status="429"} 2' in metrics_text
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generate_corpus(Path(tmp, "cv"), 5)
+        agent = CVRAGAgent(
+            cv_folder=os.path.join(tmp, "cv"),
+            vector_store_path=os.path.join(tmp, "store"),
+            conversion_cache_dir=None,
+            embedding_cache_path=None,
+            embedding_backend="hashing",
+            answer_cache_size=0,
+            metrics=MetricsRegistry()
+        )
+        agent.llm = SlowModel(responses=["Jane knows Python"])
+        service = RAGService(agent, max_concurrency=2, max_queue=1, query_timeout=5)
+        asyncio.run(exercise(service, tmp))
+
+    print("✓ The service answers, streams, ingests and sheds load\n")
+    return True
+
+def test_lazy_imports():
+    """Test that importing the agent does not load the heavy dependencies"""
+    print("✓ Testing lazy imports...")
+    import subprocess
+    import sys
+
+    heavy = ["markitdown", "langchain_google_genai", "langchain_text_splitters", "faiss"]
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, rag_agent; print([m for m in {heavy!r} if m in sys.modules])"],
+        capture_output=True, text=True, cwd=Path(__file__).parent
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]", result.stdout
+
+    print("✓ Heavy dependencies are imported on first use\n")
+    return True
+
 def main():
     """Run all tests"""
     print("\n" + "="*70)
@@ -73,6 +1213,31 @@ def main():
         ("Agent Creation", test_agent_creation),
         ("Environment", test_environment),
         ("CV Folder", test_cv_folder),
+        ("Ingestion Manifest", test_ingest_manifest),
+        ("Incremental Refresh", test_incremental_refresh),
+        ("CV Updates", test_cv_updates),
+        ("Conversion Cache", test_conversion_cache),
+        ("Parallel Conversion", test_parallel_conversion),
+        ("Batch Embedder", test_batch_embedder),
+        ("Embedding Cache", test_embedding_cache),
+        ("Async Queries", test_async_queries),
+        ("Query Stream", test_query_stream),
+        ("Answer Cache", test_answer_cache),
+        ("Hashing Backend", test_hashing_backend),
+        ("Index Factory", test_index_factory),
+        ("Keyword Index", test_keyword_index),
+        ("Metadata Filter", test_metadata_filter),
+        ("Analysis Cache", test_analysis_cache),
+        ("Pipelined CV Collection", test_collect_cvs_pipeline),
+        ("Candidate Ranking", test_candidate_ranking),
+        ("Context Packing", test_context_packing),
+        ("Adaptive Retrieval", test_adaptive_retrieval),
+        ("Streaming Ingestion", test_ingest_pipeline),
+        ("Benchmark Suite", test_benchmark_suite),
+        ("Metrics", test_metrics),
+        ("Profiling", test_profiling),
+        ("Query Service", test_query_service),
+        ("Lazy Imports", test_lazy_imports),
     ]
     
     results = []